@@ -0,0 +1,468 @@
+"""
+Cache of access control lists computed by :mod:`magpie.services` for requests to protected services.
+
+Entries are keyed on the user, the service, the resolved chain of resources under it and the requested permission.
+The cache is bounded in size (least recently used entries are evicted first) and entries can expire after a delay,
+but any modification of permissions, group memberships or resources is expected to explicitly invalidate affected
+entries with :func:`invalidate_acl_cache`. Invalidations are applied once the corresponding transaction is committed,
+and are also broadcast with PostgreSQL notifications to every other process (workers and `Twitcher` adapter) so that
+long expiration delays can be employed without risking to apply outdated permissions.
+"""
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import EVERYONE, asbool
+from magpie.definitions.sqlalchemy_definitions import sa, Session
+from magpie.definitions.ziggurat_definitions import UserService, permission_to_pyramid_acls
+from magpie.notifications import notify, start_listener, subscribe
+from magpie.utils import get_logger, get_settings
+from magpie import models
+from collections import OrderedDict, namedtuple
+from typing import TYPE_CHECKING
+import threading
+import time
+if TYPE_CHECKING:
+    from magpie.definitions.typedefs import (  # noqa: F401
+        AccessControlListType, AnySettingsContainer, Dict, Iterable, List, Optional, Set, Str, Tuple, Union
+    )
+    from magpie.resource_index import ResourceNode  # noqa: F401
+    from magpie.definitions.pyramid_definitions import Request  # noqa: F401
+LOGGER = get_logger(__name__)
+
+ACL_CACHE_NOTIFY_CHANNEL = "magpie_acl"
+ACL_CACHE_INVALIDATIONS_KEY = "magpie.acl_cache_invalidations"
+
+ACLCacheKey = namedtuple("ACLCacheKey", ["user_id", "anonymous", "service_id", "resource_ids", "permission"])
+"""
+Identifier of cached ACL entries.
+
+- ``user_id``: user for which the ACL was computed (anonymous user if ``anonymous``)
+- ``anonymous``: indicates if permissions were attributed to everyone for an unauthenticated request
+- ``service_id``: service resource under which the ACL was requested
+- ``resource_ids``: ordered chain of resource ids resolved from the request (starting with the service)
+- ``permission``: name of the permission requested to the service
+"""
+
+
+class ACLCache(object):
+    """
+    Least recently used cache of ACL entries with optional expiration and invalidation by user or resource.
+    """
+
+    def __init__(self, max_size=10000, expire=None):
+        # type: (int, Optional[float]) -> None
+        self.enabled = False
+        self.max_size = max_size
+        self.expire = expire
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # type: Dict[ACLCacheKey, Tuple[Optional[float], List[AccessControlListType]]]
+        self._user_keys = dict()        # type: Dict[int, Set[ACLCacheKey]]
+        self._resource_keys = dict()    # type: Dict[int, Set[ACLCacheKey]]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        # type: (ACLCacheKey) -> Optional[List[AccessControlListType]]
+        """
+        Obtains the ACL entries of every resource of the key chain, or ``None`` if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or (entry[0] is not None and entry[0] < time.time()):
+                if entry is not None:
+                    self._unlink(key)
+                self.misses += 1
+                return None
+            self._entries[key] = entry  # reinsert as most recently used
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, resources_acl, generation=None):
+        # type: (ACLCacheKey, List[AccessControlListType], Optional[int]) -> None
+        """
+        Stores the ACL entries of every resource of the key chain.
+
+        When ``generation`` (value of :attr:`generation` before the ACL was computed) is provided, the entry is not
+        stored if any invalidation occurred in the meantime, since the ACL could have been computed from outdated data.
+        """
+        expire = time.time() + self.expire if self.expire else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self._entries.pop(key, None) is None:
+                self._user_keys.setdefault(key.user_id, set()).add(key)
+                for res_id in key.resource_ids:
+                    self._resource_keys.setdefault(res_id, set()).add(key)
+            self._entries[key] = (expire, resources_acl)
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                self._unlink(old_key)
+                self.evictions += 1
+
+    def invalidate(self, user_id=None, resource_id=None):
+        # type: (Optional[int], Optional[int]) -> None
+        """
+        Removes cached entries of the user and/or involving the resource, or every entry if none is specified.
+        """
+        with self._lock:
+            self.generation += 1
+            if user_id is None and resource_id is None:
+                keys = set(self._entries)
+            elif resource_id is None:
+                keys = set(self._user_keys.get(user_id, set()))
+            elif user_id is None:
+                keys = set(self._resource_keys.get(resource_id, set()))
+            else:
+                keys = self._user_keys.get(user_id, set()) & self._resource_keys.get(resource_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+                self._unlink(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        # type: () -> None
+        """
+        Removes every cached entry.
+        """
+        self.invalidate()
+
+    def stats(self):
+        # type: () -> Dict[Str, int]
+        """
+        Counters of cache operations since the process started.
+        """
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+    def _unlink(self, key):
+        # type: (ACLCacheKey) -> None
+        user_keys = self._user_keys.get(key.user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                self._user_keys.pop(key.user_id)
+        for res_id in key.resource_ids:
+            res_keys = self._resource_keys.get(res_id)
+            if res_keys is not None:
+                res_keys.discard(key)
+                if not res_keys:
+                    self._resource_keys.pop(res_id)
+
+
+ACL_CACHE = ACLCache()
+
+
+def get_acl_cache():
+    # type: () -> Optional[ACLCache]
+    """
+    Obtains the ACL cache of the process if it was enabled, ``None`` otherwise.
+    """
+    if not ACL_CACHE.enabled:
+        return None
+    start_listener()
+    return ACL_CACHE
+
+
+PrincipalGroup = namedtuple("PrincipalGroup", ["id", "group_name"])
+PrincipalUser = namedtuple("PrincipalUser", ["id", "user_name", "groups"])
+"""
+Lightweight detached representation of a user and its groups, sufficient to compute its permissions.
+"""
+
+
+def compute_resources_acl(resources, user, db_session, everyone=False):
+    # type: (Iterable[Union[models.Resource, ResourceNode]], Union[models.User, PrincipalUser], Session, bool) -> List[AccessControlListType]
+    """
+    Computes the ACL entries of every resource from the permissions of the user, retrieved with a single query.
+
+    :param resources: resources for which to compute ACL entries.
+    :param user: user for which to obtain the permissions.
+    :param db_session: connection to db.
+    :param everyone: attribute permissions of the user to everyone instead of to the user (for anonymous requests).
+    :return: ACL entries of each corresponding resource.
+    """
+    permissions = models.find_resources_permissions_for_user(resources, user, db_session=db_session)
+    resources_acl = []
+    for resource in resources:
+        resource_acl = list(resource.__acl__)
+        for outcome, perm_user, perm_name in permission_to_pyramid_acls(permissions[resource.resource_id]):
+            resource_acl.append((outcome, EVERYONE if everyone else perm_user, perm_name,))
+        resources_acl.append(resource_acl)
+    return resources_acl
+
+
+class AnonymousCache(object):
+    """
+    Cache of the anonymous user principals and of its ACL entries for each resource.
+
+    The anonymous user and its groups are resolved only once per process. Its ACL entries are memoized by resource
+    (only while the ACL cache is enabled, with the same expiration delay), so that anonymous requests to different
+    paths that share parent resources only need to retrieve permissions of the resources never seen before.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._principal = None          # type: Optional[PrincipalUser]
+        self._resources_acl = dict()    # type: Dict[int, Tuple[Optional[float], AccessControlListType]]
+
+    def get_principal(self, db_session):
+        # type: (Session) -> Optional[PrincipalUser]
+        """
+        Obtains the anonymous user with its groups, or ``None`` if it cannot be found.
+        """
+        principal = self._principal
+        if principal is None:
+            generation = self.generation
+            user = UserService.by_user_name(get_constant("MAGPIE_ANONYMOUS_USER"), db_session=db_session)
+            if user is None:
+                return None
+            groups = tuple(PrincipalGroup(grp.id, grp.group_name) for grp in user.groups)
+            principal = PrincipalUser(user.id, user.user_name, groups)
+            with self._lock:
+                if generation == self.generation:
+                    self._principal = principal
+        return principal
+
+    def get_resources_acl(self, resources, db_session):
+        # type: (List[Union[models.Resource, ResourceNode]], Session) -> List[AccessControlListType]
+        """
+        Obtains the ACL entries attributed to everyone for each resource, computing only those not already memoized.
+        """
+        principal = self.get_principal(db_session)
+        if principal is None:
+            raise Exception("No Anonymous user in the database")
+        now = time.time()
+        resources_acl = dict()
+        for res in resources:
+            entry = self._resources_acl.get(res.resource_id)
+            if entry is not None and (entry[0] is None or entry[0] >= now):
+                resources_acl[res.resource_id] = entry[1]
+        missing = [res for res in resources if res.resource_id not in resources_acl]
+        if missing:
+            generation = self.generation
+            expire = now + ACL_CACHE.expire if ACL_CACHE.expire else None
+            computed = compute_resources_acl(missing, principal, db_session, everyone=True)
+            with self._lock:
+                if generation == self.generation:
+                    if len(self._resources_acl) + len(missing) > ACL_CACHE.max_size:
+                        self._resources_acl = dict()
+                    for res, res_acl in zip(missing, computed):
+                        self._resources_acl[res.resource_id] = (expire, res_acl)
+            resources_acl.update((res.resource_id, res_acl) for res, res_acl in zip(missing, computed))
+        return [resources_acl[res.resource_id] for res in resources]
+
+    def invalidate(self, user_id=None, resource_id=None):
+        # type: (Optional[int], Optional[int]) -> None
+        """
+        Removes cached items affected by modifications of the user and/or the resource, or everything if none is
+        specified. Modifications of users other than anonymous are ignored.
+        """
+        with self._lock:
+            principal = self._principal
+            if user_id is not None and principal is not None and user_id != principal.id:
+                return
+            self.generation += 1
+            if resource_id is None:
+                self._principal = None
+                self._resources_acl = dict()
+            else:
+                self._resources_acl.pop(resource_id, None)
+
+
+ANONYMOUS_CACHE = AnonymousCache()
+
+
+def get_anonymous_principal(db_session):
+    # type: (Session) -> PrincipalUser
+    """
+    Obtains the anonymous user and its groups resolved once per process.
+    """
+    principal = ANONYMOUS_CACHE.get_principal(db_session)
+    if principal is None:
+        raise Exception("No Anonymous user in the database")
+    return principal
+
+
+def load_principal(user_id, db_session):
+    # type: (int, Session) -> Optional[PrincipalUser]
+    """
+    Obtains the user with its groups from a single query of lightweight rows, or ``None`` if it cannot be found.
+    """
+    # same models as resolved by 'UserService.by_id' employed by 'ziggurat' to obtain the request user
+    user_model = UserService.models_proxy.User
+    group_model = UserService.models_proxy.Group
+    user_group_model = UserService.models_proxy.UserGroup
+    query = db_session.query(user_model.id, user_model.user_name, group_model.id, group_model.group_name) \
+        .outerjoin(user_group_model, user_group_model.user_id == user_model.id) \
+        .outerjoin(group_model, group_model.id == user_group_model.group_id) \
+        .filter(user_model.id == user_id)
+    rows = query.all()
+    if not rows:
+        return None
+    groups = tuple(PrincipalGroup(grp_id, grp_name) for _, _, grp_id, grp_name in rows if grp_id is not None)
+    return PrincipalUser(rows[0][0], rows[0][1], groups)
+
+
+class PrincipalCache(object):
+    """
+    Cache of users with their groups by id, as resolved from the authentication ticket of requests.
+
+    Users are always resolved with :func:`load_principal` rather than as complete ORM instances, but they are only kept
+    for the expiration delay while the cache is enabled. Entries of a user are removed whenever its group memberships
+    are modified or it is deleted (see :func:`invalidate_acl_cache`).
+    """
+
+    def __init__(self, max_size=10000, expire=10):
+        # type: (int, Optional[float]) -> None
+        self.enabled = False
+        self.max_size = max_size
+        self.expire = expire
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._principals = dict()   # type: Dict[int, Tuple[Optional[float], PrincipalUser]]
+
+    def get_principal(self, user_id, db_session):
+        # type: (int, Session) -> Optional[PrincipalUser]
+        """
+        Obtains the user with its groups, or ``None`` if it cannot be found.
+        """
+        if not self.enabled:
+            return load_principal(user_id, db_session)
+        entry = self._principals.get(user_id)
+        if entry is not None and (entry[0] is None or entry[0] >= time.time()):
+            return entry[1]
+        generation = self.generation
+        expire = time.time() + self.expire if self.expire else None
+        principal = load_principal(user_id, db_session)
+        if principal is not None:
+            with self._lock:
+                if generation == self.generation:
+                    if len(self._principals) >= self.max_size:
+                        self._principals = dict()
+                    self._principals[user_id] = (expire, principal)
+        return principal
+
+    def invalidate(self, user_id=None):
+        # type: (Optional[int]) -> None
+        """
+        Removes the cached user, or every cached user if none is specified.
+        """
+        with self._lock:
+            self.generation += 1
+            if user_id is None:
+                self._principals = dict()
+            else:
+                self._principals.pop(user_id, None)
+
+
+PRINCIPAL_CACHE = PrincipalCache()
+
+
+def get_principal(request):
+    # type: (Request) -> Optional[PrincipalUser]
+    """
+    Obtains the user authenticated by the request with its groups, without loading the complete user.
+
+    Employed for ``request.principal`` to resolve permissions of the user instead of ``request.user`` which can then be
+    left unresolved unless a view requires the complete user.
+    """
+    user_id = request.unauthenticated_userid
+    if user_id is None:
+        return None
+    return PRINCIPAL_CACHE.get_principal(user_id, request.db)
+
+
+def invalidate_acl_cache(db_session, user_id=None, resource_id=None):
+    # type: (Session, Optional[int], Optional[int]) -> None
+    """
+    Invalidates cached ACL of the user and/or involving the resource in every process once the current transaction of
+    the session gets committed. Every cached ACL is invalidated if neither is specified.
+
+    Must be called by any operation that modifies permissions, group memberships or resources.
+    Group permission modifications should invalidate by resource, since group members are not part of cache keys.
+    """
+    db_session.info.setdefault(ACL_CACHE_INVALIDATIONS_KEY, []).append((user_id, resource_id))
+    payload = "{}:{}".format("" if user_id is None else user_id, "" if resource_id is None else resource_id)
+    notify(db_session, ACL_CACHE_NOTIFY_CHANNEL, payload)
+
+
+def _after_commit(db_session):
+    for user_id, resource_id in db_session.info.pop(ACL_CACHE_INVALIDATIONS_KEY, []):
+        # don't wait for the notification to avoid outdated ACL on immediately following requests by this worker
+        ACL_CACHE.invalidate(user_id=user_id, resource_id=resource_id)
+        ANONYMOUS_CACHE.invalidate(user_id=user_id, resource_id=resource_id)
+        if user_id is not None or resource_id is None:
+            PRINCIPAL_CACHE.invalidate(user_id=user_id)
+
+
+def _after_rollback(db_session):
+    db_session.info.pop(ACL_CACHE_INVALIDATIONS_KEY, None)
+
+
+def _on_notification(payload):
+    # type: (Optional[Str]) -> None
+    if payload is None:
+        ACL_CACHE.clear()
+        ANONYMOUS_CACHE.invalidate()
+        PRINCIPAL_CACHE.invalidate()
+        return
+    user_id, resource_id = payload.split(":")
+    user_id = int(user_id) if user_id else None
+    resource_id = int(resource_id) if resource_id else None
+    ACL_CACHE.invalidate(user_id=user_id, resource_id=resource_id)
+    ANONYMOUS_CACHE.invalidate(user_id=user_id, resource_id=resource_id)
+    if user_id is not None or resource_id is None:
+        PRINCIPAL_CACHE.invalidate(user_id=user_id)
+
+
+subscribe(ACL_CACHE_NOTIFY_CHANNEL, _on_notification)
+sa.event.listen(Session, "after_commit", _after_commit)
+sa.event.listen(Session, "after_rollback", _after_rollback)
+
+
+def setup_acl_cache(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables and configures the ACL cache of the process according to settings.
+
+    For backward compatibility, the cache is also enabled with the expiration delay of the ``acl`` `Beaker` cache
+    region if it is defined in settings.
+    """
+    def _get(name, default):
+        return get_constant(name, settings, default_value=default,
+                            raise_missing=False, raise_not_set=False, print_missing=True)
+
+    settings = get_settings(container)
+    beaker_acl = "acl" in [region.strip() for region in settings.get("cache.regions", "").split(",")]
+    expire = _get("MAGPIE_ACL_CACHE_EXPIRE", settings.get("cache.acl.expire") if beaker_acl else None)
+    ACL_CACHE.enabled = asbool(_get("MAGPIE_ACL_CACHE", beaker_acl))
+    ACL_CACHE.expire = float(expire) if expire else None
+    ACL_CACHE.max_size = int(_get("MAGPIE_ACL_CACHE_SIZE", 10000))
+    ACL_CACHE.clear()
+    ANONYMOUS_CACHE.invalidate()
+    LOGGER.info("ACL cache %s (size: %s, expire: %s).", "enabled" if ACL_CACHE.enabled else "disabled",
+                ACL_CACHE.max_size, ACL_CACHE.expire)
+
+
+def setup_principal_cache(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables and configures the cache of users resolved from authentication tickets according to settings.
+    """
+    def _get(name, default):
+        return get_constant(name, settings, default_value=default,
+                            raise_missing=False, raise_not_set=False, print_missing=True)
+
+    settings = get_settings(container)
+    expire = _get("MAGPIE_PRINCIPAL_CACHE_EXPIRE", 10)
+    PRINCIPAL_CACHE.enabled = asbool(_get("MAGPIE_PRINCIPAL_CACHE", False))
+    PRINCIPAL_CACHE.expire = float(expire) if expire else None
+    PRINCIPAL_CACHE.max_size = int(_get("MAGPIE_PRINCIPAL_CACHE_SIZE", 10000))
+    PRINCIPAL_CACHE.invalidate()
+    LOGGER.info("Principal cache %s (size: %s, expire: %s).", "enabled" if PRINCIPAL_CACHE.enabled else "disabled",
+                PRINCIPAL_CACHE.max_size, PRINCIPAL_CACHE.expire)
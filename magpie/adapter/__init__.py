@@ -3,8 +3,15 @@ from magpie.definitions.pyramid_definitions import IAuthenticationPolicy, HTTPFo
 from magpie.definitions.ziggurat_definitions import UserService
 from magpie.api.schemas import SigninAPI
 from magpie.api.exception import valid_http, raise_http
+from magpie.adapter.magpieclient import get_magpie_client, setup_magpie_client
 from magpie.adapter.magpieowssecurity import MagpieOWSSecurity
 from magpie.adapter.magpieservice import MagpieServiceStore
+from magpie.adapter.magpietoken import get_token_cache, setup_token_cache
+from magpie.acl_cache import setup_acl_cache, setup_principal_cache
+from magpie.decision_engine import setup_decision_engine
+from magpie.notifications import set_notification_engine
+from magpie.resource_index import setup_resource_tree_index
+from magpie.service_cache import setup_service_cache
 from magpie.security import get_auth_config
 from magpie.db import get_session_factory, get_tm_session, get_engine
 from magpie.utils import get_logger, get_settings, get_magpie_url, CONTENT_TYPE_JSON
@@ -12,7 +19,6 @@ from magpie import __meta__
 from pyramid_beaker import set_cache_regions_from_settings
 import time
 import logging
-import requests
 LOGGER = get_logger("TWITCHER")
 
 
@@ -86,8 +92,8 @@ def get_user(request):
 
 def verify_user(request):
     magpie_url = get_magpie_url(request)
-    resp = requests.post(magpie_url + SigninAPI.path, json=request.json,
-                         headers={"Content-Type": CONTENT_TYPE_JSON, "Accept": CONTENT_TYPE_JSON})
+    resp = get_magpie_client().post(magpie_url + SigninAPI.path, json=request.json,
+                                    headers={"Content-Type": CONTENT_TYPE_JSON, "Accept": CONTENT_TYPE_JSON})
     if resp.status_code != HTTPOk.code:
         content = {"response": resp.json()}
         return raise_http(HTTPForbidden, detail="Failed Magpie login.", content=content, nothrow=True)
@@ -124,7 +130,9 @@ class MagpieAdapter(AdapterInterface, Singleton):
         super(MagpieAdapter, self).__init__(container)
 
     def describe_adapter(self):
-        return {"name": self.name, "version": __meta__.__version__}
+        token_cache = get_token_cache()
+        return {"name": self.name, "version": __meta__.__version__, "client": get_magpie_client().stats(),
+                "token_cache": token_cache.stats() if token_cache is not None else None}
 
     def servicestore_factory(self, request, headers=None):
         if self._servicestore is None:
@@ -155,8 +163,17 @@ class MagpieAdapter(AdapterInterface, Singleton):
         # use pyramid_tm to hook the transaction lifecycle to the request
         # make request.db available for use in Pyramid
         config.include("pyramid_tm")
-        session_factory = get_session_factory(get_engine(settings))
+        engine = get_engine(settings)
+        session_factory = get_session_factory(engine)
         config.registry["dbsession_factory"] = session_factory
+        set_notification_engine(engine)
+        setup_resource_tree_index(settings)
+        setup_acl_cache(settings)
+        setup_principal_cache(settings)
+        setup_decision_engine(settings)
+        setup_service_cache(settings)
+        setup_magpie_client(settings)
+        setup_token_cache(settings)
         config.add_request_method(
             # r.tm is the transaction manager used by pyramid_tm
             lambda r: get_tm_session(session_factory, r.tm),
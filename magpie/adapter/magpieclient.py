@@ -0,0 +1,165 @@
+"""
+HTTP client employed by the `Twitcher` adapter for its calls back to `Magpie`.
+
+All requests share a single :class:`requests.Session` per process so that connections to `Magpie` are kept alive and
+reused from a pool instead of establishing a new TCP/TLS connection for every call. The session never retains cookies
+between requests, since calls are done on behalf of different users. Cookies must be provided explicitly on each
+request, and those received are only available from the corresponding response.
+
+Pool sizes, retries with backoff and timeouts are configured with settings (or corresponding environment variables):
+
+- ``magpie.client_pool_connections``: number of pools of distinct hosts kept (default: 10)
+- ``magpie.client_pool_maxsize``: connections kept alive in the pool of each host (default: 10)
+- ``magpie.client_pool_block``: wait for an available connection instead of opening a temporary one (default: false)
+- ``magpie.client_keep_alive``: reuse connections between requests (default: true)
+- ``magpie.client_max_retries``: retries of failed connections and idempotent requests (default: 3)
+- ``magpie.client_backoff_factor``: delay factor between successive retries in seconds (default: 0.1)
+- ``magpie.client_connect_timeout``: timeout to establish connections in seconds (default: 5)
+- ``magpie.client_read_timeout``: timeout to receive responses in seconds (default: 30)
+"""
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import asbool
+from magpie.utils import get_logger, get_settings
+from requests.adapters import HTTPAdapter
+from six.moves.http_cookiejar import DefaultCookiePolicy
+from typing import TYPE_CHECKING
+from urllib3.util.retry import Retry
+import requests
+import threading
+if TYPE_CHECKING:
+    from magpie.definitions.typedefs import Any, AnySettingsContainer, Dict, Optional, Str, Tuple  # noqa: F401
+LOGGER = get_logger("TWITCHER")
+
+
+class MagpieClient(object):
+    """
+    Pooled and keep-alive HTTP client with default timeouts and retries, sharing a session between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool_connections = 10
+        self.pool_maxsize = 10
+        self.pool_block = False
+        self.keep_alive = True
+        self.max_retries = 3
+        self.backoff_factor = 0.1
+        self.timeout = (5., 30.)    # type: Tuple[float, float]
+        self._session = None        # type: Optional[requests.Session]
+
+    @property
+    def session(self):
+        # type: () -> requests.Session
+        """
+        Session of the client, created on first use with the current configuration.
+        """
+        session = self._session
+        if session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+                session = self._session
+        return session
+
+    def _create_session(self):
+        # type: () -> requests.Session
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))  # never retain any cookie
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        retries = Retry(total=self.max_retries, connect=self.max_retries, read=self.max_retries,
+                        backoff_factor=self.backoff_factor, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes all pooled connections. A new session is created on next request.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def request(self, method, url, **kwargs):
+        # type: (Str, Str, Any) -> requests.Response
+        """
+        Sends the request with the pooled session, using the configured timeouts unless specified.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        # type: (Str, Any) -> requests.Response
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        # type: (Str, Any) -> requests.Response
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        # type: () -> Dict[Str, Any]
+        """
+        Statistics of the connection pools of every host contacted by the client.
+        """
+        pools = dict()
+        session = self._session
+        adapter = session.get_adapter("http://") if session is not None else None
+        if adapter is not None:
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                pools["{}://{}:{}".format(pool.scheme, pool.host, pool.port)] = {
+                    "connections": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle": len([conn for conn in list(pool.pool.queue) if conn is not None]) if pool.pool else 0,
+                    "maxsize": pool.pool.maxsize if pool.pool is not None else self.pool_maxsize,
+                }
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "keep_alive": self.keep_alive,
+            "max_retries": self.max_retries,
+            "timeout": list(self.timeout),
+            "pools": pools,
+        }
+
+
+MAGPIE_CLIENT = MagpieClient()
+
+
+def get_magpie_client():
+    # type: () -> MagpieClient
+    """
+    Obtains the HTTP client of the process employed for calls to `Magpie`.
+    """
+    return MAGPIE_CLIENT
+
+
+def setup_magpie_client(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Configures the HTTP client of the process according to settings.
+    """
+    def _get(name, default):
+        return get_constant(name, settings, default_value=default,
+                            raise_missing=False, raise_not_set=False, print_missing=True)
+
+    settings = get_settings(container)
+    MAGPIE_CLIENT.close()
+    MAGPIE_CLIENT.pool_connections = int(_get("MAGPIE_CLIENT_POOL_CONNECTIONS", 10))
+    MAGPIE_CLIENT.pool_maxsize = int(_get("MAGPIE_CLIENT_POOL_MAXSIZE", 10))
+    MAGPIE_CLIENT.pool_block = asbool(_get("MAGPIE_CLIENT_POOL_BLOCK", False))
+    MAGPIE_CLIENT.keep_alive = asbool(_get("MAGPIE_CLIENT_KEEP_ALIVE", True))
+    MAGPIE_CLIENT.max_retries = int(_get("MAGPIE_CLIENT_MAX_RETRIES", 3))
+    MAGPIE_CLIENT.backoff_factor = float(_get("MAGPIE_CLIENT_BACKOFF_FACTOR", 0.1))
+    MAGPIE_CLIENT.timeout = (float(_get("MAGPIE_CLIENT_CONNECT_TIMEOUT", 5)),
+                             float(_get("MAGPIE_CLIENT_READ_TIMEOUT", 30)))
+    LOGGER.info("Magpie client configured (pool connections: %s, pool size: %s, keep-alive: %s, retries: %s, "
+                "timeout: %s).", MAGPIE_CLIENT.pool_connections, MAGPIE_CLIENT.pool_maxsize,
+                MAGPIE_CLIENT.keep_alive, MAGPIE_CLIENT.max_retries, MAGPIE_CLIENT.timeout)
@@ -1,6 +1,9 @@
+from magpie.adapter.magpieclient import get_magpie_client
+from magpie.adapter.magpietoken import get_token_cache
 from magpie.api.exception import evaluate_call, verify_param
 from magpie.api.schemas import ProviderSigninAPI
 from magpie.constants import get_constant
+from magpie.decision_engine import get_decision_engine
 from magpie.definitions.pyramid_definitions import (
     HTTPOk,
     HTTPNotFound,
@@ -14,13 +17,12 @@ from magpie.definitions.twitcher_definitions import (
     OWSAccessForbidden,
     parse_service_name,
 )
-from magpie.models import Service
 from magpie.permissions import Permission
+from magpie.service_cache import find_service_by_name
 from magpie.services import service_factory
 from magpie.utils import get_magpie_url, get_settings, get_logger, CONTENT_TYPE_JSON
 from requests.cookies import RequestsCookieJar
 from six.moves.urllib.parse import urlparse
-import requests
 LOGGER = get_logger("TWITCHER")
 
 
@@ -36,7 +38,7 @@ class MagpieOWSSecurity(OWSSecurityInterface):
     def check_request(self, request):
         if request.path.startswith(self.twitcher_protected_path):
             service_name = parse_service_name(request.path, self.twitcher_protected_path)
-            service = evaluate_call(lambda: Service.by_service_name(service_name, db_session=request.db),
+            service = evaluate_call(lambda: find_service_by_name(service_name, db_session=request.db),
                                     fallback=lambda: request.db.rollback(),
                                     httpError=HTTPForbidden, msgOnFail="Service query by name refused by db.")
             verify_param(service, notNone=True, httpError=HTTPNotFound, msgOnFail="Service name not found in db.")
@@ -50,12 +52,16 @@ class MagpieOWSSecurity(OWSSecurityInterface):
             permission_requested = Permission.get(permission_requested).value if permission_requested else None
 
             if permission_requested:
-                LOGGER.info('"{0}" request "{1}" permission on "{2}"'.format(request.user, permission_requested, request.path))
+                user_name = request.principal.user_name if request.principal else None
+                LOGGER.info('"{0}" request "{1}" permission on "{2}"'.format(user_name, permission_requested, request.path))
                 self.update_request_cookies(request)
                 authn_policy = request.registry.queryUtility(IAuthenticationPolicy)
                 authz_policy = request.registry.queryUtility(IAuthorizationPolicy)
-                principals = authn_policy.effective_principals(request)
-                has_permission = authz_policy.permits(service_specific, principals, permission_requested)
+                if get_decision_engine() is not None:
+                    has_permission = service_specific.permits(permission_requested)
+                else:
+                    principals = authn_policy.effective_principals(request)
+                    has_permission = authz_policy.permits(service_specific, principals, permission_requested)
 
                 LOGGER.debug("{} - AUTHN policy configurations:".format(type(self).__name__))
                 base_attr = [attr for attr in dir(authn_policy.cookie) if not attr.startswith("_")]
@@ -76,23 +82,36 @@ class MagpieOWSSecurity(OWSSecurityInterface):
         token_name = get_constant("MAGPIE_COOKIE_NAME", settings_name=request.registry.settings)
         if "Authorization" in request.headers and token_name not in request.cookies:
             magpie_prov = request.params.get("provider", "WSO2")
-            magpie_path = ProviderSigninAPI.path.format(provider_name=magpie_prov)
-            magpie_auth = "{}{}".format(self.magpie_url, magpie_path)
-            headers = dict(request.headers)
-            headers.update({"Homepage-Route": "/session", "Accept": CONTENT_TYPE_JSON})
-            session_resp = requests.get(magpie_auth, headers=headers, verify=self.twitcher_ssl_verify)
-            if session_resp.status_code != HTTPOk.code:
-                raise OWSAccessForbidden("Not authorized to access this resource. " +
-                                         "Provider login failed with following reason: [{}]."
-                                         .format(session_resp.reason))
-
-            # use specific domain to differentiate between `.{hostname}` and `{hostname}` variations if applicable
-            # noinspection PyProtectedMember
-            request_cookies = session_resp.request._cookies
-            magpie_cookies = list(filter(lambda cookie: cookie.name == token_name, request_cookies))
-            magpie_domain = urlparse(self.magpie_url).hostname if len(magpie_cookies) > 1 else None
-            session_cookies = RequestsCookieJar.get(request_cookies, token_name, domain=magpie_domain)
-            if not session_resp.json().get("authenticated") or not session_cookies:
-                raise OWSAccessForbidden("Not authorized to access this resource. " +
-                                         "Session authentication could not be verified.")
+            token_cache = get_token_cache()
+            if token_cache is None:
+                session_cookies = self._exchange_token(request, magpie_prov, token_name)
+            else:
+                token_key = token_cache.key(magpie_prov, request.headers["Authorization"])
+                session_cookies = token_cache.get_ticket(
+                    token_key, lambda: self._exchange_token(request, magpie_prov, token_name))
             request.cookies.update({token_name: session_cookies})
+
+    def _exchange_token(self, request, provider_name, token_name):
+        """
+        Logs in with the provider using the ``Authorization`` header of the request and obtains the `Magpie` ticket.
+        """
+        magpie_path = ProviderSigninAPI.path.format(provider_name=provider_name)
+        magpie_auth = "{}{}".format(self.magpie_url, magpie_path)
+        headers = dict(request.headers)
+        headers.update({"Homepage-Route": "/session", "Accept": CONTENT_TYPE_JSON})
+        session_resp = get_magpie_client().get(magpie_auth, headers=headers, verify=self.twitcher_ssl_verify)
+        if session_resp.status_code != HTTPOk.code:
+            raise OWSAccessForbidden("Not authorized to access this resource. " +
+                                     "Provider login failed with following reason: [{}]."
+                                     .format(session_resp.reason))
+
+        # use specific domain to differentiate between `.{hostname}` and `{hostname}` variations if applicable
+        # noinspection PyProtectedMember
+        request_cookies = session_resp.request._cookies
+        magpie_cookies = list(filter(lambda cookie: cookie.name == token_name, request_cookies))
+        magpie_domain = urlparse(self.magpie_url).hostname if len(magpie_cookies) > 1 else None
+        session_cookies = RequestsCookieJar.get(request_cookies, token_name, domain=magpie_domain)
+        if not session_resp.json().get("authenticated") or not session_cookies:
+            raise OWSAccessForbidden("Not authorized to access this resource. " +
+                                     "Session authentication could not be verified.")
+        return session_cookies
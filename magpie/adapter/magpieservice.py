@@ -1,14 +1,16 @@
 """
 Store adapters to read data from magpie.
 """
-from magpie.models import Service as MagpieService
+from magpie.constants import get_constant
+from magpie.models import get_services_info
+from magpie.service_cache import find_service_by_name
 from magpie.definitions.twitcher_definitions import ServiceStoreInterface, Service, ServiceNotFound
-from magpie.definitions.pyramid_definitions import HTTPOk, asbool
-from magpie.api.schemas import ServicesAPI
-from magpie.utils import get_admin_cookies, get_magpie_url, get_settings, get_logger, CONTENT_TYPE_JSON
+from magpie.utils import get_settings, get_logger
 from typing import TYPE_CHECKING
-import requests
+import threading
+import time
 if TYPE_CHECKING:
+    from magpie.definitions.typedefs import Dict, Optional, Str, Tuple  # noqa: F401
     from pyramid.request import Request  # noqa: F401
 LOGGER = get_logger("TWITCHER")
 
@@ -18,7 +20,11 @@ class MagpieServiceStore(ServiceStoreInterface):
     """
     Registry for OWS services.
 
-    Uses magpie to fetch service url and attributes.
+    Uses magpie database to fetch service url and attributes.
+
+    Services listed or looked up by URL are loaded all at once from the database and kept in memory for
+    ``magpie.service_store_expire`` seconds (setting or ``MAGPIE_SERVICE_STORE_EXPIRE``, default 60).
+    Services fetched by name are obtained from the :mod:`magpie.service_cache` when it is enabled.
     """
 
     def __init__(self, request):
@@ -26,9 +32,45 @@ class MagpieServiceStore(ServiceStoreInterface):
         super(MagpieServiceStore, self).__init__(request)
         self.settings = get_settings(request)
         self.session_factory = request.registry["dbsession_factory"]
-        self.magpie_url = get_magpie_url(request)
-        self.twitcher_ssl_verify = asbool(self.settings.get("twitcher.ows_proxy_ssl_verify", True))
-        self.magpie_admin_token = get_admin_cookies(self.settings, self.twitcher_ssl_verify)
+        self.expire = float(get_constant("MAGPIE_SERVICE_STORE_EXPIRE", self.settings, default_value=60,
+                                         raise_missing=False, raise_not_set=False, print_missing=True))
+        self._lock = threading.Lock()
+        self._services = None   # type: Optional[Tuple[float, Dict[Str, Service], Dict[Str, Service]]]
+
+    def _get_services(self):
+        # type: () -> Tuple[Dict[Str, Service], Dict[Str, Service]]
+        """
+        Obtains the services by name and by URL, loading them from the database if missing or expired.
+        """
+        services = self._services
+        if services is not None and services[0] > time.time():
+            return services[1], services[2]
+        with self._lock:
+            services = self._services
+            if services is not None and services[0] > time.time():
+                return services[1], services[2]
+            session = self.session_factory()
+            try:
+                rows = get_services_info(session)
+            finally:
+                session.close()
+            by_name = dict()
+            by_url = dict()
+            for row in rows:
+                service = Service(url=row.url, name=row.resource_name, type=row.type)
+                by_name[row.resource_name] = service
+                by_url[row.url] = service
+            self._services = (time.time() + self.expire, by_name, by_url)
+            LOGGER.debug("Loaded %s services in store.", len(by_name))
+            return by_name, by_url
+
+    def clear_cache(self):
+        # type: () -> None
+        """
+        Discards loaded services so that they are reloaded from the database on next listing or lookup by URL.
+        """
+        with self._lock:
+            self._services = None
 
     def save_service(self, service, overwrite=True, request=None):
         """
@@ -46,20 +88,8 @@ class MagpieServiceStore(ServiceStoreInterface):
         """
         Lists all services registered in magpie.
         """
-        # obtain admin access since 'service_url' is only provided on admin routes
-        services = []
-        path = "{}{}".format(self.magpie_url, ServicesAPI.path)
-        resp = requests.get(path, cookies=self.magpie_admin_token, headers={"Accept": CONTENT_TYPE_JSON},
-                            verify=self.twitcher_ssl_verify)
-        if resp.status_code != HTTPOk.code:
-            raise resp.raise_for_status()
-        json_body = resp.json()
-        for service_type in json_body["services"]:
-            for key, service in json_body["services"][service_type].items():
-                services.append(Service(url=service["service_url"],
-                                        name=service["service_name"],
-                                        type=service["service_type"]))
-        return services
+        # copies since services are mutable dictionaries
+        return [Service(service) for service in self._get_services()[0].values()]
 
     def fetch_by_name(self, name, visibility=None, request=None):
         """
@@ -69,7 +99,7 @@ class MagpieServiceStore(ServiceStoreInterface):
         session = self.session_factory()
 
         try:
-            service = MagpieService.by_service_name(name, db_session=session)
+            service = find_service_by_name(name, db_session=session)
             if service is None:
                 raise ServiceNotFound("Service name not found.")
 
@@ -81,13 +111,12 @@ class MagpieServiceStore(ServiceStoreInterface):
 
     def fetch_by_url(self, url, request=None):
         """
-        Gets service for given ``url`` from mongodb storage.
+        Gets service for given ``url`` from magpie.
         """
-        services = self.list_services(request=request)
-        for service in services:
-            if service.url == url:
-                return service
-        raise ServiceNotFound
+        service = self._get_services()[1].get(url)
+        if service is None:
+            raise ServiceNotFound
+        return Service(service)
 
     def clear_services(self, request=None):
         """
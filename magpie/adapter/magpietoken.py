@@ -0,0 +1,159 @@
+"""
+Cache of `Magpie` authentication tickets obtained by the `Twitcher` adapter in exchange of provider bearer tokens.
+
+Requests to protected services that provide an ``Authorization`` header instead of the `Magpie` cookie require a login
+with the external provider followed by a session verification (see
+:meth:`magpie.adapter.magpieowssecurity.MagpieOWSSecurity.update_request_cookies`). When enabled with
+``MAGPIE_TOKEN_CACHE`` (or ``magpie.token_cache`` setting), the resulting ticket is kept in memory so that following
+requests with the same token reuse it directly:
+
+- entries are keyed by a SHA-256 digest of the provider and ``Authorization`` header, tokens themselves are never kept
+- entries expire with the ticket lifetime (``magpie.cookie_expire``), and after ``magpie.token_cache_expire`` seconds
+  if defined, to limit the delay before a token revoked by the provider gets refused (default: ticket lifetime only)
+- the cache holds at most ``magpie.token_cache_size`` entries, least recently used are evicted first (default: 1000)
+- concurrent requests with the same token not yet cached wait for a single exchange instead of each doing their own
+- failed exchanges are not cached
+"""
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import asbool
+from magpie.utils import get_logger, get_settings
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+import hashlib
+import threading
+import time
+if TYPE_CHECKING:
+    from magpie.definitions.typedefs import AnySettingsContainer, Callable, Dict, Optional, Str, Tuple  # noqa: F401
+LOGGER = get_logger("TWITCHER")
+
+
+class _PendingExchange(object):
+    """
+    Token exchange in progress, awaited by concurrent requests with the same token.
+    """
+    __slots__ = ["done", "ticket", "error"]
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ticket = None  # type: Optional[Str]
+        self.error = None   # type: Optional[Exception]
+
+
+class TokenCache(object):
+    """
+    Least recently used cache of `Magpie` tickets by digest of provider bearer tokens, with coalesced exchanges.
+    """
+
+    def __init__(self, max_size=1000, expire=None):
+        # type: (int, Optional[float]) -> None
+        self.enabled = False
+        self.max_size = max_size
+        self.expire = expire
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # type: Dict[Str, Tuple[Optional[float], Str]]
+        self._pending = dict()          # type: Dict[Str, _PendingExchange]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(provider, authorization):
+        # type: (Str, Str) -> Str
+        """
+        Identifier of the cached ticket of the provider token, without retaining the token itself.
+        """
+        value = u"{}\n{}".format(provider, authorization).encode("utf-8")
+        return hashlib.sha256(value).hexdigest()
+
+    def get_ticket(self, key, exchange):
+        # type: (Str, Callable[[], Str]) -> Str
+        """
+        Obtains the cached ticket, or otherwise the one returned by ``exchange`` which is then cached.
+
+        Only one exchange is done at a time for a given key, concurrent calls wait for its result (or error).
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self._entries[key] = entry  # reinsert as most recently used
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _PendingExchange()
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.ticket
+
+        expire = time.time() + self.expire if self.expire else None  # ticket is issued after this point
+        try:
+            pending.ticket = exchange()
+        except Exception as exc:
+            pending.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                if pending.ticket is not None:
+                    self._entries[key] = (expire, pending.ticket)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            pending.done.set()
+        return pending.ticket
+
+    def clear(self):
+        # type: () -> None
+        """
+        Removes every cached ticket.
+        """
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def stats(self):
+        # type: () -> Dict[Str, int]
+        """
+        Counters of cache operations since the process started.
+        """
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+TOKEN_CACHE = TokenCache()
+
+
+def get_token_cache():
+    # type: () -> Optional[TokenCache]
+    """
+    Obtains the token cache of the process if it was enabled, ``None`` otherwise.
+    """
+    return TOKEN_CACHE if TOKEN_CACHE.enabled else None
+
+
+def setup_token_cache(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables and configures the token cache of the process according to settings.
+
+    Entries expire with the lifetime of `Magpie` tickets (``MAGPIE_COOKIE_EXPIRE``), or sooner if the cache expiration
+    delay (``MAGPIE_TOKEN_CACHE_EXPIRE``) is shorter.
+    """
+    def _get(name, default):
+        return get_constant(name, settings, default_value=default,
+                            raise_missing=False, raise_not_set=False, print_missing=True)
+
+    settings = get_settings(container)
+    delays = [_get("MAGPIE_COOKIE_EXPIRE", None), _get("MAGPIE_TOKEN_CACHE_EXPIRE", None)]
+    delays = [float(delay) for delay in delays if delay]
+    TOKEN_CACHE.enabled = asbool(_get("MAGPIE_TOKEN_CACHE", False))
+    TOKEN_CACHE.expire = min(delays) if delays else None
+    TOKEN_CACHE.max_size = int(_get("MAGPIE_TOKEN_CACHE_SIZE", 1000))
+    TOKEN_CACHE.clear()
+    LOGGER.info("Token cache %s (size: %s, expire: %s).", "enabled" if TOKEN_CACHE.enabled else "disabled",
+                TOKEN_CACHE.max_size, TOKEN_CACHE.expire)
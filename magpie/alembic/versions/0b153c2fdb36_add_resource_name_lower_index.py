@@ -0,0 +1,34 @@
+"""
+add lower() index of resource name by parent for path resolution.
+
+Revision ID: 0b153c2fdb36
+Revises: 03b54feffe45
+Create Date: 2019-10-01 10:12:45.118391
+"""
+# noinspection PyUnresolvedReferences
+from alembic.context import get_context
+from alembic import op
+from magpie.definitions.sqlalchemy_definitions import PGDialect
+
+# revision identifiers, used by Alembic.
+revision = '0b153c2fdb36'
+down_revision = '03b54feffe45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    context = get_context()
+    if isinstance(context.connection.engine.dialect, PGDialect):
+        op.execute('''
+        CREATE INDEX resources_parent_id_lower_resource_name_ix
+          ON resources
+          USING btree
+          (parent_id, lower(resource_name::text));
+        ''')
+
+
+def downgrade():
+    context = get_context()
+    if isinstance(context.connection.engine.dialect, PGDialect):
+        op.execute('DROP INDEX IF EXISTS resources_parent_id_lower_resource_name_ix;')
@@ -6,6 +6,7 @@ from magpie.definitions.pyramid_definitions import (
     HTTPSuccessful,
     HTTPRedirection,
     HTTPOk,
+    Response,
 )
 from magpie.utils import (
     islambda, isclass,
@@ -17,14 +18,86 @@ import json
 import six
 if TYPE_CHECKING:
     from magpie.definitions.typedefs import (  # noqa: F401
-        Any, Str, Callable, List, Iterable, Optional, Tuple, Union, JSON, ParamsType, PyramidResponse
+        Any, Str, Callable, Dict, List, Iterable, Optional, Tuple, Union, JSON, ParamsType, PyramidResponse
     )
+    LazyJSON = Union[JSON, Callable[[], JSON]]
 
 # control variables to avoid infinite recursion in case of
 # major programming error to avoid application hanging
 RAISE_RECURSIVE_SAFEGUARD_MAX = 5
 RAISE_RECURSIVE_SAFEGUARD_COUNT = 0
 
+# size of the body parts written at once by streamed JSON responses
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class JSONStream(object):
+    """
+    JSON object for which ``(key, value)`` items are generated lazily while writing the body of a streamed response.
+
+    Values can themselves be :class:`JSONStream` to nest lazily generated objects.
+
+    .. seealso::
+        - :func:`valid_http_stream`
+    """
+    __slots__ = ["items"]
+
+    def __init__(self, items):
+        # type: (Iterable[Tuple[Str, Any]]) -> None
+        self.items = items
+
+
+# names of verification flags of 'verify_param' in their order of evaluation
+VERIFY_PARAM_FLAGS = ("notNone", "notEmpty", "notIn", "notEqual", "isTrue", "isFalse",
+                      "isNone", "isEmpty", "isIn", "isEqual", "ofType")
+
+
+def _verify_param_flags(flag_name):
+    # type: (Str) -> Tuple[bool, ...]
+    return tuple(name == flag_name for name in VERIFY_PARAM_FLAGS)
+
+
+# fast verifications of single flag usages by flags combination, as functions of (param, paramCompare) returning
+# whether the verification is successful, or ``None`` if the complete verification must be applied to validate usage
+VERIFY_PARAM_FAST_CHECKS = {
+    _verify_param_flags("notNone"): lambda p, c: p is not None,
+    _verify_param_flags("isNone"): lambda p, c: p is None,
+    _verify_param_flags("isTrue"): lambda p, c: p is not False,
+    _verify_param_flags("isFalse"): lambda p, c: p is not True,
+    _verify_param_flags("notEmpty"): lambda p, c: p != "",
+    _verify_param_flags("isEmpty"): lambda p, c: p == "",
+    _verify_param_flags("isIn"): lambda p, c: p in c if isinstance(c, (list, tuple, set, frozenset, dict)) else None,
+    _verify_param_flags("notIn"): lambda p, c: p not in c if isinstance(c, (list, tuple, set, frozenset, dict)) else None,
+    _verify_param_flags("isEqual"): lambda p, c: p == c if c is not None and type(p) is type(c) else None,
+    _verify_param_flags("notEqual"): lambda p, c: p != c if c is not None and type(p) is type(c) else None,
+}  # type: Dict[Tuple[bool, ...], Callable[[Any, Any], Optional[bool]]]
+
+
+def get_content(content):
+    # type: (Optional[LazyJSON]) -> JSON
+    """
+    Obtains the JSON content provided to :func:`verify_param` or :func:`evaluate_call`, generating it if it was
+    specified as a function (e.g.: ``lambda: {...}``) so that it only gets built when actually needed on failure.
+    """
+    if content is None:
+        return {}
+    if callable(content):
+        return content()
+    return content
+
+
+def _get_failure_content(content):
+    # type: (Optional[LazyJSON]) -> JSON
+    """
+    Obtains the JSON content to report a failure, reporting instead the error if the content itself cannot be generated
+    (e.g.: access to objects of a database session with an aborted transaction), so that the intended HTTP error is
+    still returned.
+    """
+    try:
+        return get_content(content)
+    except Exception as exc:
+        return {u"content_error": repr(exc)}
+
 
 # noinspection PyPep8Naming
 def verify_param(   # noqa: E126
@@ -37,7 +110,7 @@ def verify_param(   # noqa: E126
                  httpError=HTTPBadRequest,          # type: HTTPError
                  httpKWArgs=None,                   # type: Optional[ParamsType]
                  msgOnFail="",                      # type: Str
-                 content=None,                      # type: Optional[JSON]
+                 content=None,                      # type: Optional[LazyJSON]
                  contentType=CONTENT_TYPE_JSON,     # type: Str
                  # --- verification flags (method) ---
                  notNone=False,                     # type: bool
@@ -65,7 +138,9 @@ def verify_param(   # noqa: E126
     :param httpError: derived exception to raise on test failure (default: `HTTPBadRequest`)
     :param httpKWArgs: additional keyword arguments to pass to `httpError` if called in case of HTTP exception
     :param msgOnFail: message details to return in HTTP exception if flag condition failed
-    :param content: json formatted additional content to provide in case of exception
+    :param content:
+        json formatted additional content to provide in case of exception, or function returning it to generate it
+        only in case of exception (e.g.: ``lambda: {"service": format_service(service)}``)
     :param contentType: format in which to return the exception (one of `magpie.common.SUPPORTED_CONTENT_TYPES`)
     :param notNone: test that `param` is None type
     :param notEmpty: test that `param` is an empty string
@@ -83,32 +158,20 @@ def verify_param(   # noqa: E126
     :raises `HTTPInternalServerError`: for evaluation error
     :return: nothing if all tests passed
     """
-    content = {} if content is None else content
+    flags = (notNone, notEmpty, notIn, notEqual, isTrue, isFalse, isNone, isEmpty, isIn, isEqual, ofType)
+
+    # fast path of common single flag verifications, failures are reported by the complete verification
+    # only when flags are exactly booleans ('1 == True' would match), other values are reported by the precondition
+    fast_check = VERIFY_PARAM_FAST_CHECKS.get(flags)
+    if fast_check is not None and all(flag is True or flag is False for flag in flags) \
+            and fast_check(param, paramCompare):
+        return
 
     # precondition evaluation of input parameters
     try:
-        if not isinstance(notNone, bool):
-            raise TypeError("'notNone' is not a 'bool'")
-        if not isinstance(notEmpty, bool):
-            raise TypeError("'notEmpty' is not a 'bool'")
-        if not isinstance(notIn, bool):
-            raise TypeError("'notIn' is not a 'bool'")
-        if not isinstance(notEqual, bool):
-            raise TypeError("'notEqual' is not a 'bool'")
-        if not isinstance(isTrue, bool):
-            raise TypeError("'isTrue' is not a 'bool'")
-        if not isinstance(isFalse, bool):
-            raise TypeError("'isFalse' is not a 'bool'")
-        if not isinstance(isNone, bool):
-            raise TypeError("'isNone' is not a 'bool'")
-        if not isinstance(isEmpty, bool):
-            raise TypeError("'isEmpty' is not a 'bool'")
-        if not isinstance(isIn, bool):
-            raise TypeError("'isIn' is not a 'bool'")
-        if not isinstance(isEqual, bool):
-            raise TypeError("'isEqual' is not a 'bool'")
-        if not isinstance(ofType, bool):
-            raise TypeError("'ofType' is not a 'bool'")
+        for flag_name, flag in zip(VERIFY_PARAM_FLAGS, flags):
+            if not isinstance(flag, bool):
+                raise TypeError("'{}' is not a 'bool'".format(flag_name))
         if paramCompare is None and (isIn or notIn or isEqual or notEqual):
             raise TypeError("'paramCompare' cannot be 'None' with specified test flags")
         if isEqual or notEqual:
@@ -119,9 +182,10 @@ def verify_param(   # noqa: E126
         if not hasattr(paramCompare, "__iter__") and (isIn or notIn):
             paramCompare = [paramCompare]
         # error if none of the flags specified
-        if not any([notNone, notEmpty, notIn, notEqual, isTrue, isFalse, isNone, isEmpty, isIn, isEqual, ofType]):
+        if not any(flags):
             raise ValueError("no comparison flag specified for verification")
     except Exception as e:
+        content = _get_failure_content(content)
         content[u"traceback"] = repr(exc_info())
         content[u"exception"] = repr(e)
         raise_http(httpError=HTTPInternalServerError, httpKWArgs=httpKWArgs,
@@ -153,6 +217,7 @@ def verify_param(   # noqa: E126
     if ofType:
         fail_verify = fail_verify or (not isinstance(param, paramCompare))
     if fail_verify:
+        content = _get_failure_content(content)
         if withParam:
             content[u"param"] = {u"value": str(param)}
             if paramName is not None:
@@ -168,7 +233,7 @@ def evaluate_call(call,                                 # type: Callable[[], Any
                   httpError=HTTPInternalServerError,    # type: HTTPError
                   httpKWArgs=None,                      # type: Optional[ParamsType]
                   msgOnFail="",                         # type: Str
-                  content=None,                         # type: Optional[JSON]
+                  content=None,                         # type: Optional[LazyJSON]
                   contentType=CONTENT_TYPE_JSON         # type: Str
                   ):                                    # type: (...) -> Any
     """
@@ -198,30 +263,36 @@ def evaluate_call(call,                                 # type: Callable[[], Any
     :param httpError: alternative exception to raise on `call` failure
     :param httpKWArgs: additional keyword arguments to pass to `httpError` if called in case of HTTP exception
     :param msgOnFail: message details to return in HTTP exception if `call` failed
-    :param content: json formatted additional content to provide in case of exception
+    :param content:
+        json formatted additional content to provide in case of exception, or function returning it to generate it
+        only in case of exception (e.g.: ``lambda: {"service": format_service(service)}``)
     :param contentType: format in which to return the exception (one of `magpie.common.SUPPORTED_CONTENT_TYPES`)
     :raises httpError: on `call` failure
     :raises `HTTPInternalServerError`: on `fallback` failure
     :return: whichever return value `call` might have if no exception occurred
     """
-    msgOnFail = repr(msgOnFail) if isinstance(msgOnFail, six.string_types) else msgOnFail
     if not islambda(call):
+        msgOnFail = repr(msgOnFail) if isinstance(msgOnFail, six.string_types) else msgOnFail
         raise_http(httpError=HTTPInternalServerError, httpKWArgs=httpKWArgs,
                    detail="Input 'call' is not a lambda expression.",
-                   content={u"call": {u"detail": msgOnFail, u"content": repr(content)}},
+                   content={u"call": {u"detail": msgOnFail, u"content": repr(_get_failure_content(content))}},
                    contentType=contentType)
 
     # preemptively check fallback to avoid possible call exception without valid recovery
     if fallback is not None:
         if not islambda(fallback):
+            msgOnFail = repr(msgOnFail) if isinstance(msgOnFail, six.string_types) else msgOnFail
             raise_http(httpError=HTTPInternalServerError, httpKWArgs=httpKWArgs,
                        detail="Input 'fallback'  is not a lambda expression, not attempting 'call'.",
-                       content={u"call": {u"detail": msgOnFail, u"content": repr(content)}},
+                       content={u"call": {u"detail": msgOnFail, u"content": repr(_get_failure_content(content))}},
                        contentType=contentType)
     try:
         return call()
     except Exception as e:
         ce = repr(e)
+    # generate the content before any fallback modifies the state of objects it could refer to
+    content = repr(_get_failure_content(content))
+    msgOnFail = repr(msgOnFail) if isinstance(msgOnFail, six.string_types) else msgOnFail
     try:
         if fallback is not None:
             fallback()
@@ -229,11 +300,11 @@ def evaluate_call(call,                                 # type: Callable[[], Any
         fe = repr(e)
         raise_http(httpError=HTTPInternalServerError, httpKWArgs=httpKWArgs,
                    detail="Exception occurred during 'fallback' called after failing 'call' exception.",
-                   content={u"call": {u"exception": ce, u"detail": msgOnFail, u"content": repr(content)},
+                   content={u"call": {u"exception": ce, u"detail": msgOnFail, u"content": content},
                             u"fallback": {u"exception": fe}},
                    contentType=contentType)
     raise_http(httpError, detail=msgOnFail, httpKWArgs=httpKWArgs,
-               content={u"call": {u"exception": ce, u"content": repr(content)}},
+               content={u"call": {u"exception": ce, u"content": content}},
                contentType=contentType)
 
 
@@ -268,6 +339,83 @@ def valid_http(httpSuccess=HTTPOk,              # type: Optional[HTTPSuccessful]
     return resp
 
 
+# noinspection PyPep8Naming
+def valid_http_stream(httpSuccess=HTTPOk,              # type: Optional[HTTPSuccessful]
+                      httpKWArgs=None,                 # type: Optional[ParamsType]
+                      detail="",                       # type: Optional[Str]
+                      content=None,                    # type: Optional[JSON]
+                      ):                               # type: (...) -> PyramidResponse
+    """
+    Returns successful HTTP with the same standardized JSON body as :func:`valid_http`, but written incrementally while
+    the response is sent instead of being dumped to a string at once.
+
+    Any :class:`JSONStream` within ``content`` is only generated while writing the corresponding part of the body,
+    so that peak memory doesn't depend on the size of the response and first bytes are sent as soon as available.
+    Since the HTTP status is already sent by then, errors raised during generation cannot be reported as error
+    responses anymore and should be validated beforehand as much as possible.
+
+    :param httpSuccess: any derived class from base `HTTPSuccessful` (default: `HTTPOk`)
+    :param httpKWArgs: additional keyword arguments to pass to the response when created
+    :param detail: additional message information (default: empty)
+    :param content: json formatted content to include, with :class:`JSONStream` for lazily generated objects
+    :return `Response`: successful response with body written from the content
+    """
+    global RAISE_RECURSIVE_SAFEGUARD_COUNT
+
+    httpCode, detail, content = validate_params(httpSuccess, [HTTPSuccessful, HTTPRedirection],
+                                                detail, content, CONTENT_TYPE_JSON)
+    content[u"code"] = httpCode
+    content[u"detail"] = detail
+    content[u"type"] = CONTENT_TYPE_JSON
+    resp = Response(status=httpCode, app_iter=iter_json(content), content_type=CONTENT_TYPE_JSON, charset="UTF-8",
+                    **(httpKWArgs or {}))
+    RAISE_RECURSIVE_SAFEGUARD_COUNT = 0  # reset counter for future calls (don't accumulate for different requests)
+    return resp
+
+
+def iter_json(content, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    # type: (JSON, int) -> Iterable[bytes]
+    """
+    Generates the UTF-8 encoded JSON string of the content by chunks of approximately ``chunk_size``.
+
+    Dictionaries and :class:`JSONStream` are written item by item without recursion, so that arbitrarily nested
+    objects can be written while only the items being generated are held in memory. Any other value is dumped at
+    once. The resulting string is the same as obtained with :func:`json.dumps`.
+    """
+    opened = []  # items iterator and first item flag of every object being written
+
+    def open_value(value):
+        if isinstance(value, (dict, JSONStream)):
+            opened.append([iter(value.items() if isinstance(value, dict) else value.items), True])
+            return u"{"
+        return json.dumps(value)
+
+    chunk = []
+    chunk_len = 0
+    text = open_value(content)
+    while True:
+        chunk.append(text)
+        chunk_len += len(text)
+        if chunk_len >= chunk_size:
+            yield u"".join(chunk).encode("utf-8")
+            chunk = []
+            chunk_len = 0
+        if not opened:
+            break
+        current = opened[-1]
+        item = next(current[0], None)
+        if item is None:
+            opened.pop()
+            text = u"}"
+            continue
+        key, value = item
+        key = key if isinstance(key, six.string_types) else str(key)
+        text = (u"" if current[1] else u", ") + json.dumps(key) + u": " + open_value(value)
+        current[1] = False
+    if chunk:
+        yield u"".join(chunk).encode("utf-8")
+
+
 # noinspection PyPep8Naming
 def raise_http(httpError=HTTPInternalServerError,   # type: HTTPError
                httpKWArgs=None,                     # type: Optional[ParamsType]
@@ -341,9 +489,13 @@ def validate_params(httpClass,      # type: HTTPException
     # cannot be done within a try/except because it would always trigger with `raise_http`
     content = dict() if content is None else content
     detail = repr(detail) if not isinstance(detail, six.string_types) else detail
-    caller = {u"content": content, u"type": contentType, u"detail": detail, u"code": 520}  # "unknown" code error
+    httpCode = 520  # "unknown" code error
+
+    def caller():
+        return {u"caller": {u"content": content, u"type": contentType, u"detail": detail, u"code": httpCode}}
+
     verify_param(isclass(httpClass), paramName="httpClass", isTrue=True,
-                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content={u"caller": caller},
+                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content=caller,
                  msgOnFail="Object specified is not a class, class derived from `HTTPException` is expected.")
     # if `httpClass` derives from `httpBase` (ex: `HTTPSuccessful` or `HTTPError`) it is of proper requested type
     # if it derives from `HTTPException`, it *could* be different than base (ex: 2xx instead of 4xx codes)
@@ -352,12 +504,11 @@ def validate_params(httpClass,      # type: HTTPException
     # noinspection PyUnresolvedReferences
     httpCode = httpClass.code if issubclass(httpClass, httpBase) else \
                httpClass.code if issubclass(httpClass, HTTPException) else 520  # noqa: F401
-    caller[u"code"] = httpCode
     verify_param(issubclass(httpClass, httpBase), paramName="httpBase", isTrue=True,
-                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content={u"caller": caller},
+                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content=caller,
                  msgOnFail="Invalid 'httpBase' derived class specified.")
     verify_param(contentType, paramName="contentType", paramCompare=SUPPORTED_CONTENT_TYPES, isIn=True,
-                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content={u"caller": caller},
+                 httpError=HTTPInternalServerError, contentType=CONTENT_TYPE_JSON, content=caller,
                  msgOnFail="Invalid 'contentType' specified for exception output.")
     return httpCode, detail, content
 
@@ -122,11 +122,11 @@ def login_failure(request, reason=None):
             http_err = HTTPBadRequest
             reason = s.Signin_POST_BadRequestResponseSchema.description
         else:
-            user_name_list = ax.evaluate_call(
-                lambda: [user.user_name for user in UserService.all(models.User, db_session=request.db)],
+            user_name_exists = ax.evaluate_call(
+                lambda: user_name is not None and models.user_name_exists(user_name, request.db),
                 fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
                 msgOnFail=s.Signin_POST_ForbiddenResponseSchema.description)
-            if user_name in user_name_list:
+            if user_name_exists:
                 http_err = HTTPInternalServerError
                 reason = s.Signin_POST_Internal_InternalServerErrorResponseSchema.description
     content = ag.get_request_info(request, default_message=s.Signin_POST_UnauthorizedResponseSchema.description)
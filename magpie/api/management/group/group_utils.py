@@ -1,8 +1,13 @@
 from magpie.services import SERVICE_TYPE_DICT
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api import exception as ax, schemas as s
-from magpie.api.management.resource.resource_utils import check_valid_service_or_resource_permission
+from magpie.api.management.resource.resource_utils import (
+    check_valid_service_or_resource_permission, get_resources_forest_permissions
+)
 from magpie.api.management.resource.resource_formats import format_resource
-from magpie.api.management.service.service_formats import format_service_resources, format_service
+from magpie.api.management.service.service_formats import (
+    format_service_resources, format_services_resources_forest, format_service
+)
 from magpie.api.management.group.group_formats import format_group
 from magpie.definitions.ziggurat_definitions import GroupService, GroupResourcePermissionService, ResourceService
 from magpie.definitions.pyramid_definitions import (
@@ -17,45 +22,62 @@ from magpie import models
 from magpie.permissions import format_permissions, convert_permission
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+    from magpie.api.exception import JSONStream  # noqa: F401
     from magpie.definitions.pyramid_definitions import HTTPException  # noqa: F401
     from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
-    from magpie.definitions.typedefs import Str, Iterable, List, Optional, JSON, ServiceOrResourceType  # noqa: F401
+    from magpie.definitions.typedefs import (  # noqa: F401
+        Str, Dict, Iterable, List, Optional, Tuple, Union, JSON, ServiceOrResourceType
+    )
     from magpie.permissions import Permission  # noqa: F401
 
 
-def get_all_group_names(db_session):
-    # type: (Session) -> List[Str]
+def get_all_group_names(db_session, prefix=None, limit=None, after=None):
+    # type: (Session, Optional[Str], Optional[int], Optional[Str]) -> List[Str]
     """
-    Get all existing group names from the database.
+    Get all existing group names from the database, ordered case-insensitively.
+
+    Listed names can be filtered by ``prefix``, and paged with ``limit`` and ``after`` (see :func:`models.find_names`).
     """
     group_names = ax.evaluate_call(
-        lambda: [grp.group_name for grp in GroupService.all(models.Group, db_session=db_session)],
+        lambda: models.find_group_names(db_session, prefix=prefix, limit=limit, after=after),
         httpError=HTTPForbidden, msgOnFail=s.Groups_GET_ForbiddenResponseSchema.description)
     return group_names
 
 
-def get_group_resources(group, db_session):
-    # type: (models.Group, Session) -> JSON
+def get_groups_member_counts(group_names, db_session):
+    # type: (Iterable[Str], Session) -> Dict[Str, int]
+    """
+    Get the number of users member of each of the groups with a single query.
+    """
+    return ax.evaluate_call(
+        lambda: models.find_groups_member_count(db_session, group_names=group_names),
+        httpError=HTTPForbidden, msgOnFail=s.Groups_GET_ForbiddenResponseSchema.description)
+
+
+def get_group_resources(group, db_session, stream=False, flat=False):
+    # type: (models.Group, Session, bool, bool) -> Union[JSON, JSONStream]
     """
     Get formatted JSON body describing all service resources the ``group`` as permissions on.
+
+    If ``stream`` is requested, services and resources are formatted lazily while writing a streamed response.
+    If ``flat`` is requested, resource trees are formatted in compact representation.
     """
-    json_response = {}
-    for svc in list(ResourceService.all(models.Service, db_session=db_session)):
-        svc_perms = get_group_service_permissions(group=group, service=svc, db_session=db_session)
-        svc_name = str(svc.resource_name)
-        svc_type = str(svc.type)
-        if svc_type not in json_response:
-            json_response[svc_type] = {}
-        res_perm_dict = get_group_service_resources_permissions_dict(group=group, service=svc, db_session=db_session)
-        json_response[svc_type][svc_name] = format_service_resources(
-            svc,
-            db_session=db_session,
-            service_perms=svc_perms,
-            resources_perms_dict=res_perm_dict,
-            show_all_children=False,
-            show_private_url=False,
-        )
-    return json_response
+    resources = models.get_all_resources(db_session)
+    svc_perms, res_perms_dict = get_group_resources_forest_permissions(group, resources, db_session)
+    return format_services_resources_forest(resources, svc_perms, res_perms_dict,
+                                            show_private_url=False, stream=stream, flat=flat)
+
+
+def get_group_resources_forest_permissions(group, resources, db_session):
+    # type: (models.Group, Iterable[ServiceOrResourceType], Session) -> Tuple[Dict[int, List[Str]], Dict[int, List[Str]]]
+    """
+    Obtains the permissions of the group on every service and on every children resource, using a single query.
+
+    Results are the same as calling :func:`get_group_service_permissions` and
+    :func:`get_group_service_resources_permissions_dict` for every service.
+    """
+    res_perms = models.find_all_resources_permissions_for_group(group, db_session)
+    return get_resources_forest_permissions(resources, res_perms, lambda res: res.owner_group_id == group.id)
 
 
 def create_group(group_name, db_session):
@@ -109,6 +131,8 @@ def create_group_resource_permission_response(group, resource, permission, db_se
     ax.evaluate_call(lambda: db_session.add(new_perm), fallback=lambda: db_session.rollback(),
                      httpError=HTTPForbidden, content=perm_content,
                      msgOnFail=s.GroupResourcePermissions_POST_ForbiddenAddResponseSchema.description)
+    # group members are not known by the cache, invalidate for any user
+    invalidate_acl_cache(db_session, resource_id=resource_id)
     return ax.valid_http(httpSuccess=HTTPCreated, content=perm_content,
                          detail=s.GroupResourcePermissions_POST_CreatedResponseSchema.description)
 
@@ -135,8 +159,8 @@ def get_group_resources_permissions_dict(group, db_session, resource_ids=None, r
                             fallback=lambda: db_session.rollback(),
                             httpError=HTTPInternalServerError,
                             msgOnFail=s.GroupResourcesPermissions_InternalServerErrorResponseSchema.description,
-                            content={u"group": repr(group), u"resource_ids": repr(resource_ids),
-                                     u"resource_types": repr(resource_types)})
+                            content=lambda: {u"group": repr(group), u"resource_ids": repr(resource_ids),
+                                             u"resource_types": repr(resource_types)})
 
 
 def get_group_resource_permissions_response(group, resource, db_session):
@@ -159,7 +183,7 @@ def get_group_resource_permissions_response(group, resource, db_session):
         lambda: format_permissions(get_grp_res_perms(group, resource, db_session)),
         httpError=HTTPInternalServerError,
         msgOnFail=s.GroupResourcePermissions_InternalServerErrorResponseSchema.description,
-        content={u"group": repr(group), u"resource": repr(resource)})
+        content=lambda: {u"group": repr(group), u"resource": repr(resource)})
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.GroupResourcePermissions_GET_OkResponseSchema.description,
                          content={u"permission_names": group_perm_names})
 
@@ -187,6 +211,7 @@ def delete_group_resource_permission_response(group, resource, permission, db_se
     ax.evaluate_call(lambda: db_session.delete(del_perm), fallback=lambda: db_session.rollback(),
                      httpError=HTTPForbidden, content=perm_content,
                      msgOnFail=s.GroupServicePermission_DELETE_ForbiddenResponseSchema.description)
+    invalidate_acl_cache(db_session, resource_id=resource_id)
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.GroupServicePermission_DELETE_OkResponseSchema.description)
 
 
@@ -241,7 +266,7 @@ def get_group_service_permissions(group, service, db_session):
     return ax.evaluate_call(lambda: get_grp_svc_perms(group, service, db_session),
                             httpError=HTTPInternalServerError,
                             msgOnFail="Failed to obtain group service permissions",
-                            content={u"group": repr(group), u"service": repr(service)})
+                            content=lambda: {u"group": repr(group), u"service": repr(service)})
 
 
 def get_group_service_permissions_response(group, service, db_session):
@@ -256,7 +281,7 @@ def get_group_service_permissions_response(group, service, db_session):
         lambda: format_permissions(get_group_service_permissions(group, service, db_session)),
         httpError=HTTPInternalServerError,
         msgOnFail=s.GroupServicePermissions_GET_InternalServerErrorResponseSchema.description,
-        content={u"group": format_group(group, basic_info=True), u"service": format_service(service)})
+        content=lambda: {u"group": format_group(group, basic_info=True), u"service": format_service(service)})
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.GroupServicePermissions_GET_OkResponseSchema.description,
                          content={u"permission_names": svc_perms_found})
 
@@ -272,11 +297,13 @@ def get_group_service_resources_permissions_dict(group, service, db_session):
     return get_group_resources_permissions_dict(group, db_session, resource_types=None, resource_ids=res_ids)
 
 
-def get_group_service_resources_response(group, service, db_session):
-    # type: (models.Group, models.Service, Session) -> HTTPException
+def get_group_service_resources_response(group, service, db_session, flat=False):
+    # type: (models.Group, models.Service, Session, bool) -> HTTPException
     """
     Get validated response of all found service resources which the group has permissions on.
 
+    If ``flat`` is requested, the resource tree is formatted in compact representation.
+
     :returns: valid HTTP response on successful operations.
     :raises HTTPException: error HTTP response of corresponding situation.
     """
@@ -289,6 +316,7 @@ def get_group_service_resources_response(group, service, db_session):
         resources_perms_dict=res_perms,
         show_all_children=False,
         show_private_url=False,
+        flat=flat,
     )
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.GroupServiceResources_GET_OkResponseSchema.description,
                          content={u"service": svc_res_json})
@@ -1,8 +1,10 @@
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api import requests as ar, exception as ax, schemas as s
 from magpie.api.management.group import group_utils as gu, group_formats as gf
 from magpie.constants import get_constant
 from magpie.definitions.ziggurat_definitions import GroupService
 from magpie.definitions.pyramid_definitions import (
+    asbool,
     view_config,
     HTTPOk,
     HTTPBadRequest,
@@ -12,15 +14,17 @@ from magpie.definitions.pyramid_definitions import (
 )
 
 
-@s.GroupsAPI.get(tags=[s.GroupsTag], response_schemas=s.Groups_GET_responses)
+@s.GroupsAPI.get(schema=s.Groups_GET_RequestSchema(), tags=[s.GroupsTag], response_schemas=s.Groups_GET_responses)
 @view_config(route_name=s.GroupsAPI.name, request_method="GET")
 def get_groups_view(request):
     """
     Get list of group names.
     """
-    group_names = gu.get_all_group_names(request.db)
-    return ax.valid_http(httpSuccess=HTTPOk, detail=s.Groups_GET_OkResponseSchema.description,
-                         content={u"group_names": group_names})
+    group_names = gu.get_all_group_names(request.db, **ar.get_names_filters_checked(request))
+    content = {u"group_names": group_names}
+    if asbool(ar.get_query_param(request, "with_counts")):
+        content[u"member_counts"] = gu.get_groups_member_counts(group_names, request.db)
+    return ax.valid_http(httpSuccess=HTTPOk, detail=s.Groups_GET_OkResponseSchema.description, content=content)
 
 
 @s.GroupsAPI.post(schema=s.Groups_POST_RequestSchema(), tags=[s.GroupsTag], response_schemas=s.Groups_POST_responses)
@@ -76,6 +80,8 @@ def delete_group_view(request):
     ax.evaluate_call(lambda: request.db.delete(group),
                      fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
                      msgOnFail=s.Group_DELETE_ForbiddenResponseSchema.description)
+    # group members are not known by the cache, invalidate everything
+    invalidate_acl_cache(request.db)
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.Group_DELETE_OkResponseSchema.description)
 
 
@@ -140,17 +146,23 @@ def delete_group_service_permission_view(request):
     return gu.delete_group_resource_permission_response(group, service, permission, db_session=request.db)
 
 
-@s.GroupResourcesAPI.get(tags=[s.GroupsTag], response_schemas=s.GroupResources_GET_responses)
+@s.GroupResourcesAPI.get(schema=s.GroupResources_GET_RequestSchema(), tags=[s.GroupsTag],
+                         response_schemas=s.GroupResources_GET_responses)
 @view_config(route_name=s.GroupResourcesAPI.name, request_method="GET")
 def get_group_resources_view(request):
     """
     List all resources a group has permission on.
     """
+    stream = asbool(ar.get_query_param(request, "stream"))
+    flat = ar.get_resources_tree_flat_checked(request)
     group = ar.get_group_matchdict_checked(request)
-    grp_res_json = ax.evaluate_call(lambda: gu.get_group_resources(group, request.db),
+    grp_res_json = ax.evaluate_call(lambda: gu.get_group_resources(group, request.db, stream=stream, flat=flat),
                                     fallback=lambda: request.db.rollback(),
                                     httpError=HTTPInternalServerError, content={u"group": repr(group)},
                                     msgOnFail=s.GroupResources_GET_InternalServerErrorResponseSchema.description)
+    if stream:
+        return ax.valid_http_stream(httpSuccess=HTTPOk, detail=s.GroupResources_GET_OkResponseSchema.description,
+                                    content={u"resources": grp_res_json})
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.GroupResources_GET_OkResponseSchema.description,
                          content={u"resources": grp_res_json})
 
@@ -192,12 +204,14 @@ def delete_group_resource_permission_view(request):
     return gu.delete_group_resource_permission_response(group, resource, permission, db_session=request.db)
 
 
-@s.GroupServiceResourcesAPI.get(tags=[s.GroupsTag], response_schemas=s.GroupServiceResources_GET_responses)
+@s.GroupServiceResourcesAPI.get(schema=s.GroupServiceResources_GET_RequestSchema(), tags=[s.GroupsTag],
+                                response_schemas=s.GroupServiceResources_GET_responses)
 @view_config(route_name=s.GroupServiceResourcesAPI.name, request_method="GET")
 def get_group_service_resources_view(request):
     """
     List all resources under a service a group has permission on.
     """
+    flat = ar.get_resources_tree_flat_checked(request)
     group = ar.get_group_matchdict_checked(request)
     service = ar.get_service_matchdict_checked(request)
-    return gu.get_group_service_resources_response(group, service, request.db)
+    return gu.get_group_service_resources_response(group, service, request.db, flat=flat)
@@ -1,102 +1,235 @@
 from magpie.definitions.pyramid_definitions import HTTPInternalServerError
-from magpie.definitions.ziggurat_definitions import ResourceService
-from magpie.models import resource_tree_service
-from magpie.permissions import format_permissions
+from magpie.models import find_children_tree, get_service_type, resource_tree_service
+from magpie.permissions import format_permissions, Permission, PermissionSet
 from magpie.services import SERVICE_TYPE_DICT
-from magpie.api.exception import evaluate_call
+from magpie.api.exception import evaluate_call, JSONStream
+from collections import OrderedDict
+
+RESOURCE_TREE_FORMAT_NESTED = u"tree"
+RESOURCE_TREE_FORMAT_FLAT = u"flat"
+RESOURCE_TREE_FORMATS = [RESOURCE_TREE_FORMAT_NESTED, RESOURCE_TREE_FORMAT_FLAT]
+
+# permission names at the index of their bit in masks of flat resource trees
+PERMISSION_NAMES_BY_BIT = [perm.value for perm in sorted(Permission, key=lambda p: p.bit)]
 
 
 def format_resource(resource, permissions=None, basic_info=False):
     """
     Formats the ``resource`` information into JSON.
     """
-    def fmt_res(res, perms, info):
-        result = {
-            u"resource_name": str(res.resource_name),
-            u"resource_display_name": str(res.resource_display_name or res.resource_name),
-            u"resource_type": str(res.resource_type),
-            u"resource_id": res.resource_id
-        }
-        if not info:
-            result.update({
-                u"parent_id": res.parent_id,
-                u"root_service_id": res.root_service_id,
-                u"children": {},
-                u"permission_names": list() if perms is None else format_permissions(perms)
-            })
-        return result
-
     return evaluate_call(
-        lambda: fmt_res(resource, permissions, basic_info),
+        lambda: _format_resource(resource, permissions, basic_info),
         httpError=HTTPInternalServerError,
         msgOnFail="Failed to format resource.",
-        content={u"resource": repr(resource), u"permissions": repr(permissions), u"basic_info": str(basic_info)}
+        content=lambda: {u"resource": repr(resource), u"permissions": repr(permissions),
+                         u"basic_info": str(basic_info)}
     )
 
 
-def format_resource_tree(children, db_session, resources_perms_dict=None, internal_svc_res_perm_dict=None):
+def _format_resource(resource, permissions, basic_info):
+    """
+    Formats the ``resource`` information into JSON without any error handling, see :func:`format_resource`.
+    """
+    result = {
+        u"resource_name": str(resource.resource_name),
+        u"resource_display_name": str(resource.resource_display_name or resource.resource_name),
+        u"resource_type": str(resource.resource_type),
+        u"resource_id": resource.resource_id
+    }
+    if not basic_info:
+        result.update({
+            u"parent_id": resource.parent_id,
+            u"root_service_id": resource.root_service_id,
+            u"children": {},
+            u"permission_names": list() if permissions is None else format_permissions(permissions)
+        })
+    return result
+
+
+def format_resource_tree(children, db_session, resources_perms_dict=None, service_types=None):
     """
-    Generates the formatted service/resource tree with all its children resources by calling :function:`format_resource`
-    recursively.
+    Generates the formatted service/resource tree with all its children resources formatted as by
+    :function:`format_resource`.
 
     Filters resource permissions with ``resources_perms_dict`` if provided.
 
     :param children: service or resource for which to generate the formatted resource tree
     :param db_session: connection to db
     :param resources_perms_dict: any pre-established user- or group-specific permissions. Only those are shown if given.
-    :param internal_svc_res_perm_dict: *for this function's use only*,
-        avoid re-fetch of already obtained permissions for corresponding resources
+    :param service_types: known service types by service id, employed to obtain allowed permissions of resources if
+        ``resources_perms_dict`` is not provided (any other service of the resources is queried once)
     :return: formatted resource tree
     """
-    internal_svc_res_perm_dict = dict() if internal_svc_res_perm_dict is None else internal_svc_res_perm_dict
-
-    fmt_res_tree = {}
-    for child_id, child_dict in children.items():
-        resource = child_dict[u'node']
-        new_children = child_dict[u'children']
-        perms = []
-
-        # case of pre-specified user/group-specific permissions
-        if resources_perms_dict is not None:
-            if resource.resource_id in resources_perms_dict.keys():
-                perms = resources_perms_dict[resource.resource_id]
-
-        # case of full fetch (permitted resource permissions)
-        else:
-            # directly access the resource if it is a service
-            if resource.root_service_id is None:
-                service = resource
-                service_id = resource.resource_id
-                # add to dict only if not already added
-                if service_id not in internal_svc_res_perm_dict:
-                    internal_svc_res_perm_dict[service_id] = SERVICE_TYPE_DICT[service.type].resource_types_permissions
-            # obtain corresponding top-level service resource if not already available
-            else:
-                service_id = resource.root_service_id
-                if service_id not in internal_svc_res_perm_dict:
-                    service = ResourceService.by_resource_id(service_id, db_session=db_session)
-                    internal_svc_res_perm_dict[service_id] = SERVICE_TYPE_DICT[service.type].resource_types_permissions
-
-            perms = internal_svc_res_perm_dict[service_id][resource.resource_type]
-
-        fmt_res_tree[child_id] = format_resource(resource, perms)
-        fmt_res_tree[child_id][u'children'] = format_resource_tree(new_children, db_session,
-                                                                   resources_perms_dict, internal_svc_res_perm_dict)
-
-    return fmt_res_tree
-
-
-def get_resource_children(resource, db_session):
-    query = resource_tree_service.from_parent_deeper(resource.resource_id, db_session=db_session)
+    def fmt_res_tree():
+        get_perms = _get_tree_resource_permissions_getter(db_session, resources_perms_dict, service_types)
+        fmt_tree = {}
+        pending = [(children, fmt_tree)]
+        while pending:
+            res_children, fmt_children = pending.pop()
+            for child_id, child_dict in res_children.items():
+                resource = child_dict[u'node']
+                fmt_res = fmt_children[child_id] = _format_resource(resource, get_perms(resource), False)
+                pending.append((child_dict[u'children'], fmt_res[u'children']))
+        return fmt_tree
+
+    return evaluate_call(
+        lambda: fmt_res_tree(),
+        httpError=HTTPInternalServerError,
+        msgOnFail="Failed to format resource tree."
+    )
+
+
+def _get_tree_resource_permissions_getter(db_session, resources_perms_dict, service_types):
+    """
+    Obtains a function returning the permissions of a resource to display in a formatted resource tree.
+
+    Employs the pre-established user- or group-specific permissions if ``resources_perms_dict`` is provided, or
+    otherwise the permissions allowed for the resource type under its service, resolved once per service and type.
+    """
+    # case of pre-specified user/group-specific permissions
+    if resources_perms_dict is not None:
+        return lambda resource: resources_perms_dict.get(resource.resource_id, [])
+
+    # case of full fetch (permitted resource permissions)
+    service_types = dict(service_types or {})
+    resource_types_perms = dict()
+
+    def get_perms(resource):
+        # directly access the resource if it is a service
+        service_id = resource.resource_id if resource.root_service_id is None else resource.root_service_id
+        perms = resource_types_perms.get((service_id, resource.resource_type))
+        if perms is None:
+            if service_id not in service_types:
+                service_types[service_id] = resource.type if resource.root_service_id is None else \
+                    get_service_type(service_id, db_session)
+            perms = SERVICE_TYPE_DICT[service_types[service_id]].get_resource_permissions(resource.resource_type)
+            resource_types_perms[(service_id, resource.resource_type)] = perms
+        return perms
+
+    return get_perms
+
+
+class FlatResourceTree(object):
+    """
+    Compact representation of a resource tree with every attribute of the resources in a separate array.
+
+    Resources are listed in depth-first order, so that parents always precede their children. Resource types are
+    indices in the ``resource_types`` table, and permissions are bitmasks for which each set bit ``1 << i`` indicates
+    the permission ``permission_names[i]``.
+    """
+    __slots__ = ["resource_ids", "parent_ids", "resource_names", "resource_display_names",
+                 "resource_types", "permissions", "_type_indices"]
+
+    def __init__(self):
+        self.resource_ids = []
+        self.parent_ids = []
+        self.resource_names = []
+        self.resource_display_names = []
+        self.resource_types = []
+        self.permissions = []
+        self._type_indices = OrderedDict()
+
+    def add(self, resource, permissions):
+        """
+        Appends the resource following its parent and any previously added sibling, with the given permissions.
+        """
+        type_index = self._type_indices.get(resource.resource_type)
+        if type_index is None:
+            type_index = self._type_indices[resource.resource_type] = len(self._type_indices)
+        self.resource_ids.append(resource.resource_id)
+        self.parent_ids.append(resource.parent_id)
+        self.resource_names.append(str(resource.resource_name))
+        self.resource_display_names.append(str(resource.resource_display_name or resource.resource_name))
+        self.resource_types.append(type_index)
+        self.permissions.append(PermissionSet(permissions).mask)
+
+    def json(self):
+        return {
+            u"resource_id": self.resource_ids,
+            u"parent_id": self.parent_ids,
+            u"resource_name": self.resource_names,
+            u"resource_display_name": self.resource_display_names,
+            u"resource_type": self.resource_types,
+            u"permissions": self.permissions,
+            u"resource_types": [str(res_type) for res_type in self._type_indices],
+            u"permission_names": PERMISSION_NAMES_BY_BIT,
+        }
+
+
+def format_resource_tree_flat(children, db_session, resources_perms_dict=None, service_types=None):
+    """
+    Generates the same resource tree as :func:`format_resource_tree` in the compact representation of
+    :class:`FlatResourceTree`.
+
+    :param children: service or resource for which to generate the formatted resource tree
+    :param db_session: connection to db
+    :param resources_perms_dict: any pre-established user- or group-specific permissions. Only those are shown if given.
+    :param service_types: known service types by service id (see :func:`format_resource_tree`)
+    :return: formatted flat resource tree
+    """
+    def fmt_res_tree_flat():
+        get_perms = _get_tree_resource_permissions_getter(db_session, resources_perms_dict, service_types)
+        flat_tree = FlatResourceTree()
+        pending = [iter(children.values())]
+        while pending:
+            child_dict = next(pending[-1], None)
+            if child_dict is None:
+                pending.pop()
+                continue
+            resource = child_dict[u'node']
+            flat_tree.add(resource, get_perms(resource))
+            pending.append(iter(child_dict[u'children'].values()))
+        return flat_tree.json()
+
+    return evaluate_call(
+        lambda: fmt_res_tree_flat(),
+        httpError=HTTPInternalServerError,
+        msgOnFail="Failed to format resource tree."
+    )
+
+
+def format_resource_tree_stream(children, resources_perms_dict):
+    """
+    Generates the same formatted resource tree as :func:`format_resource_tree` with pre-established permissions, but
+    lazily formats every resource only when it gets written in a streamed response.
+
+    :param children: service or resource for which to generate the formatted resource tree
+    :param resources_perms_dict: user- or group-specific permissions of resources to show
+    :return: formatted resource tree generated while written
+    """
+    def res_tree_items(res_children):
+        for child_id, child_dict in res_children.items():
+            resource = child_dict[u'node']
+            res_json = _format_resource(resource, resources_perms_dict.get(resource.resource_id, []), False)
+            res_json[u'children'] = JSONStream(res_tree_items(child_dict[u'children']))
+            yield child_id, res_json
+
+    return JSONStream(res_tree_items(children))
+
+
+def get_resource_children(resource, db_session, depth=None, limit=None, cursor=None):
+    """
+    Obtains the tree of children resources under the ``resource``.
+
+    :param resource: service or resource for which to retrieve children resources
+    :param db_session: connection to db
+    :param depth: maximum depth of children resources (1 for direct children only), unlimited if not specified
+    :param limit: maximum amount of direct children of the ``resource``, unlimited if not specified
+    :param cursor: direct child of the ``resource`` after which to list direct children following their ordering
+    :return: tree of nested children nodes
+    """
+    query = find_children_tree(resource.resource_id, db_session=db_session, depth=depth, limit=limit, cursor=cursor)
     tree_struct_dict = resource_tree_service.build_subtree_strut(query)
     return tree_struct_dict[u'children']
 
 
-def format_resource_with_children(resource, db_session):
+def format_resource_with_children(resource, db_session, depth=None, limit=None, cursor=None, flat=False):
     resource_formatted = format_resource(resource)
 
-    resource_formatted[u'children'] = format_resource_tree(
-        get_resource_children(resource, db_session),
-        db_session=db_session
+    fmt_res_tree = format_resource_tree_flat if flat else format_resource_tree
+    resource_formatted[u'children'] = fmt_res_tree(
+        get_resource_children(resource, db_session, depth=depth, limit=limit, cursor=cursor),
+        db_session=db_session,
+        service_types={resource.resource_id: resource.type} if resource.root_service_id is None else None
     )
     return resource_formatted
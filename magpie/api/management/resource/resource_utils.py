@@ -1,3 +1,4 @@
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api import requests as ar, exception as ax, schemas as s
 from magpie.api.management.resource.resource_formats import format_resource
 from magpie.definitions.ziggurat_definitions import ResourceService
@@ -12,14 +13,17 @@ from magpie.definitions.pyramid_definitions import (
     HTTPInternalServerError,
 )
 from magpie import models
-from magpie.permissions import Permission
+from magpie.permissions import Permission, format_permissions
 from magpie.register import sync_services_phoenix
+from magpie.resource_index import mark_resource_tree_changed
 from magpie.services import SERVICE_TYPE_DICT
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from magpie.definitions.pyramid_definitions import HTTPException  # noqa: F401
     from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
-    from magpie.definitions.typedefs import List, Str, Optional, Tuple, Type, ServiceOrResourceType  # noqa: F401
+    from magpie.definitions.typedefs import (  # noqa: F401
+        Callable, Dict, Iterable, JSON, List, Str, Optional, Tuple, Type, ServiceOrResourceType
+    )
     from magpie.services import ServiceInterface  # noqa: F401
 
 
@@ -74,14 +78,67 @@ def check_valid_service_resource(parent_resource, resource_type, db_session):
 
 
 def crop_tree_with_permission(children, resource_id_list):
-    for child_id, child_dict in list(children.items()):
-        new_children = child_dict[u"children"]
-        children_returned, resource_id_list = crop_tree_with_permission(new_children, resource_id_list)
-        if child_id not in resource_id_list and not children_returned:
-            children.pop(child_id)
-        elif child_id in resource_id_list:
-            resource_id_list.remove(child_id)
-    return dict(children), list(resource_id_list)
+    # type: (Dict[int, JSON], List[int]) -> Tuple[Dict[int, JSON], List[int]]
+    """
+    Crops the resource tree (as returned by :func:`get_resource_children`) to keep only resources listed in
+    ``resource_id_list`` and their parents. Children dictionaries of the tree are cropped in place.
+
+    Nodes are visited iteratively in post-order (children before their parent) so that a parent is removed only if it
+    is not listed and none of its children remain, without recursion limit on deep trees and in linear time.
+
+    :returns: cropped top-level children and resource ids of ``resource_id_list`` that were not found in the tree.
+    """
+    permitted_ids = set(resource_id_list)
+    found_ids = set()
+    # parents are listed before any of their children, so reversed order visits children first
+    nodes = []
+    nodes_children = [children]
+    while nodes_children:
+        current_children = nodes_children.pop()
+        for child_id, child_dict in current_children.items():
+            nodes.append((current_children, child_id, child_dict[u"children"]))
+            nodes_children.append(child_dict[u"children"])
+    for parent_children, child_id, child_children in reversed(nodes):
+        if child_id in permitted_ids:
+            found_ids.add(child_id)
+        elif not child_children:
+            parent_children.pop(child_id)
+
+    remaining_ids = []
+    for res_id in resource_id_list:
+        if res_id in found_ids:
+            found_ids.remove(res_id)  # only one occurrence is matched by each resource
+        else:
+            remaining_ids.append(res_id)
+    return dict(children), remaining_ids
+
+
+def get_resources_forest_permissions(resources, resources_perms, is_owner):
+    # type: (Iterable[ServiceOrResourceType], Dict[int, List[Str]], Callable[[ServiceOrResourceType], bool]) -> Tuple[Dict[int, List[Str]], Dict[int, List[Str]]]  # noqa: E501
+    """
+    Distributes the permissions of a user or group amongst services and children resources of the whole forest.
+
+    Owned services and resources are granted all permissions of their type, while others keep their permissions found
+    in ``resources_perms``.
+
+    :param resources: all services and children resources, as returned by :func:`models.get_all_resources`.
+    :param resources_perms: names of permissions applied to the user or group by resource id.
+    :param is_owner: predicate indicating if the user or group is the owner of the service or resource.
+    :returns: permissions by service id, and permissions by children resource id (only resources with permissions).
+    """
+    services_perms = dict()
+    children_perms = dict()
+    for res in resources:
+        if res.resource_type == models.Service.resource_type_name:
+            if is_owner(res):
+                services_perms[res.resource_id] = format_permissions(SERVICE_TYPE_DICT[res.type].permissions)
+            else:
+                services_perms[res.resource_id] = resources_perms.get(res.resource_id, [])
+        elif is_owner(res):
+            children_perms[res.resource_id] = format_permissions(models.RESOURCE_TYPE_DICT[res.resource_type].permissions)
+        elif res.resource_id in resources_perms:
+            children_perms[res.resource_id] = resources_perms[res.resource_id]
+    return services_perms, children_perms
 
 
 def get_resource_path(resource_id, db_session):
@@ -195,6 +252,9 @@ def delete_resource(request):
     resource = ar.get_resource_matchdict_checked(request)
     service_push = asbool(ar.get_multiformat_post(request, "service_push"))
     res_content = {u"resource": format_resource(resource, basic_info=True)}
+    # branch deletion is done with raw SQL, not detected by the session events
+    mark_resource_tree_changed(request.db)
+    invalidate_acl_cache(request.db, resource_id=resource.resource_id)
     ax.evaluate_call(
         lambda: models.resource_tree_service.delete_branch(resource_id=resource.resource_id, db_session=request.db),
         fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
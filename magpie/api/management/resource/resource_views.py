@@ -1,6 +1,6 @@
 from magpie.api import requests as ar, exception as ax, schemas as s
 from magpie.api.management.service.service_utils import get_services_by_type
-from magpie.api.management.service.service_formats import format_service_resources
+from magpie.api.management.service.service_formats import format_service_resources, format_services_resources_stream
 from magpie.api.management.resource import resource_utils as ru, resource_formats as rf
 from magpie.definitions.pyramid_definitions import (
     asbool,
@@ -16,31 +16,47 @@ from magpie.services import SERVICE_TYPE_DICT
 from magpie import models
 
 
-@s.ResourcesAPI.get(tags=[s.ResourcesTag], response_schemas=s.Resources_GET_responses)
+@s.ResourcesAPI.get(schema=s.Resources_GET_RequestSchema(), tags=[s.ResourcesTag],
+                    response_schemas=s.Resources_GET_responses)
 @view_config(route_name=s.ResourcesAPI.name, request_method="GET")
 def get_resources_view(request):
     """
     List all registered resources.
     """
+    depth = ar.get_query_param_int_checked(request, "depth", min_value=0,
+                                           msgOnFail=s.ResourcesTree_BadRequestResponseSchema.description)
+    flat = ar.get_resources_tree_flat_checked(request)
+    if asbool(ar.get_query_param(request, "stream")):
+        svc_types = list(SERVICE_TYPE_DICT.keys())
+        res_json = ax.evaluate_call(
+            lambda: format_services_resources_stream(
+                models.iter_services_resources_tree(svc_types, request.db, depth=depth), svc_types, flat=flat),
+            httpError=HTTPInternalServerError, msgOnFail=s.InternalServerErrorResponseSchema.description)
+        return ax.valid_http_stream(httpSuccess=HTTPOk, detail=s.Resources_GET_OkResponseSchema.description,
+                                    content={u"resources": res_json})
     res_json = {}
     for svc_type in SERVICE_TYPE_DICT.keys():
         services = get_services_by_type(svc_type, db_session=request.db)
         res_json[svc_type] = {}
         for svc in services:
             res_json[svc_type][svc.resource_name] = format_service_resources(
-                svc, request.db, show_all_children=True, show_private_url=False)
+                svc, request.db, show_all_children=True, show_private_url=False, depth=depth, flat=flat)
     res_json = {u"resources": res_json}
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.Resources_GET_OkResponseSchema.description, content=res_json)
 
 
-@s.ResourceAPI.get(tags=[s.ResourcesTag], response_schemas=s.Resource_GET_responses)
+@s.ResourceAPI.get(schema=s.Resource_GET_RequestSchema(), tags=[s.ResourcesTag],
+                   response_schemas=s.Resource_GET_responses)
 @view_config(route_name=s.ResourceAPI.name, request_method="GET")
 def get_resource_view(request):
     """
     Get resource information.
     """
     resource = ar.get_resource_matchdict_checked(request)
-    res_json = ax.evaluate_call(lambda: rf.format_resource_with_children(resource, db_session=request.db),
+    tree_params = ar.get_resources_tree_params_checked(request)
+    flat = ar.get_resources_tree_flat_checked(request)
+    res_json = ax.evaluate_call(lambda: rf.format_resource_with_children(resource, db_session=request.db,
+                                                                         flat=flat, **tree_params),
                                 fallback=lambda: request.db.rollback(), httpError=HTTPInternalServerError,
                                 msgOnFail=s.Resource_GET_InternalServerErrorResponseSchema.description,
                                 content={u"resource": rf.format_resource(resource, basic_info=True)})
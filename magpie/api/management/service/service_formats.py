@@ -1,15 +1,26 @@
-from magpie.api.exception import evaluate_call
+from magpie.api.exception import evaluate_call, JSONStream
 from magpie.api.management.resource.resource_utils import crop_tree_with_permission
-from magpie.api.management.resource.resource_formats import get_resource_children, format_resource_tree
+from magpie.api.management.resource.resource_formats import (
+    get_resource_children,
+    format_resource,
+    format_resource_tree,
+    format_resource_tree_flat,
+    format_resource_tree_stream,
+    FlatResourceTree,
+)
 from magpie.definitions.pyramid_definitions import HTTPInternalServerError
+from magpie.models import Service
 from magpie.permissions import format_permissions
 from magpie.utils import get_twitcher_protected_service_url
 from magpie.services import SERVICE_TYPE_DICT
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from magpie.definitions.typedefs import Optional, JSON, Str, Dict, List, Type  # noqa: F401
+    from magpie.definitions.typedefs import (  # noqa: F401
+        Any, Optional, JSON, Str, Dict, Iterable, List, Type, Union, ServiceOrResourceType
+    )
     from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
-    from magpie.models import Resource, Service  # noqa: F401
+    from magpie.models import Resource  # noqa: F401
     from magpie.permissions import Permission  # noqa: F401
     from magpie.services import ServiceInterface  # noqa: F401
 
@@ -47,7 +58,7 @@ def format_service(service, permissions=None, show_private_url=False, show_resou
         lambda: fmt_svc(service, permissions),
         httpError=HTTPInternalServerError,
         msgOnFail="Failed to format service.",
-        content={u"service": repr(service), u"permissions": repr(permissions)}
+        content=lambda: {u"service": repr(service), u"permissions": repr(permissions)}
     )
 
 
@@ -57,6 +68,11 @@ def format_service_resources(service,                       # type: Service
                              resources_perms_dict=None,     # type: Optional[Dict[Str, List[Str]]]
                              show_all_children=False,       # type: bool
                              show_private_url=True,         # type: bool
+                             parent=None,                   # type: Optional[Resource]
+                             depth=None,                    # type: Optional[int]
+                             limit=None,                    # type: Optional[int]
+                             cursor=None,                   # type: Optional[int]
+                             flat=False,                    # type: bool
                              ):                             # type: (...) -> JSON
     """
     Formats the service and its resource tree as a JSON body.
@@ -67,26 +83,170 @@ def format_service_resources(service,                       # type: Service
     :param resources_perms_dict: permission(s) of resource(s) id(s) to *preserve* if ``resources_perms_dict = False``
     :param show_all_children: display all children resources recursively, or only ones matching ``resources_perms_dict``
     :param show_private_url: displays the
+    :param parent: resource under the service from which to display the children resource tree instead of the service
+    :param depth: maximum depth of displayed children resources (1 for direct children only), unlimited if not specified
+    :param limit: maximum amount of displayed direct children resources, unlimited if not specified
+    :param cursor: direct child resource after which to display direct children resources following their ordering
+    :param flat: display the resource tree in the compact representation of :class:`FlatResourceTree`
     :return: JSON body representation of the service resource tree
     """
     def fmt_svc_res(svc, db, svc_perms, res_perms, show_all):
-        tree = get_resource_children(svc, db)
+        tree = get_resource_children(parent or svc, db, depth=depth, limit=limit, cursor=cursor)
         if not show_all:
             tree, resource_id_list_remain = crop_tree_with_permission(tree, list(res_perms.keys()))
 
         svc_perms = SERVICE_TYPE_DICT[svc.type].permissions if svc_perms is None else svc_perms
         svc_res = format_service(svc, svc_perms, show_private_url=show_private_url)
-        svc_res[u"resources"] = format_resource_tree(tree, resources_perms_dict=res_perms, db_session=db)
+        fmt_res_tree = format_resource_tree_flat if flat else format_resource_tree
+        svc_res[u"resources"] = fmt_res_tree(tree, resources_perms_dict=res_perms, db_session=db,
+                                             service_types={svc.resource_id: svc.type})
         return svc_res
 
     return evaluate_call(
         lambda: fmt_svc_res(service, db_session, service_perms, resources_perms_dict or {}, show_all_children),
         fallback=lambda: db_session.rollback(), httpError=HTTPInternalServerError,
         msgOnFail="Failed to format service resources tree",
-        content=format_service(service, service_perms, show_private_url=show_private_url)
+        content=lambda: format_service(service, service_perms, show_private_url=show_private_url)
     )
 
 
+def format_services_resources_forest(resources,                  # type: Iterable[ServiceOrResourceType]
+                                     services_perms,             # type: Dict[int, List[Str]]
+                                     resources_perms_dict,       # type: Dict[int, List[Str]]
+                                     show_private_url=False,     # type: bool
+                                     stream=False,               # type: bool
+                                     flat=False,                 # type: bool
+                                     ):                          # type: (...) -> Union[JSON, JSONStream]
+    """
+    Formats every service with its resource tree as JSON body, grouped by service type and service name.
+
+    Resource trees are assembled in memory from the provided resources instead of querying them for each service,
+    and are cropped to resources found in ``resources_perms_dict`` as well as their parents, as when calling
+    :func:`format_service_resources` with ``show_all_children=False`` for each service.
+
+    :param resources: all services and children resources, ordered by parent and ordering amongst siblings
+    :param services_perms: permissions to display by service id (none if missing)
+    :param resources_perms_dict: permissions to display by children resource id, only those and their parents are kept
+    :param show_private_url: displays the private URL of services
+    :param stream: only format services and resources lazily while writing a streamed response
+    :param flat: display resource trees in the compact representation of :class:`FlatResourceTree`
+    :return: JSON body representation of services resource trees
+    """
+    def fmt_svc_res(svc, tree):
+        svc_res = format_service(svc, services_perms.get(svc.resource_id, []), show_private_url=show_private_url)
+        if flat:
+            svc_res[u"resources"] = format_resource_tree_flat(tree, db_session=None,
+                                                              resources_perms_dict=resources_perms_dict)
+        elif stream:
+            svc_res[u"resources"] = format_resource_tree_stream(tree, resources_perms_dict)
+        else:
+            svc_res[u"resources"] = format_resource_tree(tree, db_session=None,
+                                                         resources_perms_dict=resources_perms_dict)
+        return svc_res
+
+    def fmt_svc_res_forest():
+        services = []
+        children_resources = dict()
+        for res in resources:
+            if res.resource_type == Service.resource_type_name:
+                services.append(res)
+            else:
+                children_resources[res.resource_id] = res
+
+        # keep resources with permissions and all their parents up to the service
+        kept_ids = set()
+        for res_id in resources_perms_dict:
+            while res_id in children_resources and res_id not in kept_ids:
+                kept_ids.add(res_id)
+                res_id = children_resources[res_id].parent_id
+
+        # nodes in the same format as returned by 'get_resource_children', attached following resources ordering
+        nodes = dict((res_id, {u"node": children_resources[res_id], u"children": OrderedDict()}) for res_id in kept_ids)
+        services_trees = dict((svc.resource_id, OrderedDict()) for svc in services)
+        for res in resources:
+            if res.resource_id in nodes:
+                parent = nodes.get(res.parent_id)
+                parent_children = parent[u"children"] if parent else services_trees.get(res.parent_id)
+                if parent_children is not None:
+                    parent_children[res.resource_id] = nodes[res.resource_id]
+
+        if stream:
+            services_by_type = OrderedDict()
+            for svc in services:
+                services_by_type.setdefault(svc.type, OrderedDict())[svc.resource_name] = svc
+            return JSONStream(
+                (svc_type, JSONStream((svc_name, fmt_svc_res(svc, services_trees[svc.resource_id]))
+                                      for svc_name, svc in svc_type_services.items()))
+                for svc_type, svc_type_services in services_by_type.items()
+            )
+        svc_res_forest = dict()
+        for svc in services:
+            svc_res_forest.setdefault(svc.type, dict())[svc.resource_name] = \
+                fmt_svc_res(svc, services_trees[svc.resource_id])
+        return svc_res_forest
+
+    return evaluate_call(
+        lambda: fmt_svc_res_forest(),
+        httpError=HTTPInternalServerError,
+        msgOnFail="Failed to format services resources trees."
+    )
+
+
+def format_services_resources_stream(rows, service_types, flat=False):
+    # type: (Iterable[Any], List[Str], bool) -> JSONStream
+    """
+    Formats every service with its complete resource tree as JSON body, grouped by service type and service name, as
+    when calling :func:`format_service_resources` with ``show_all_children=True`` for each service.
+
+    Services and resources are formatted lazily while writing a streamed response, as the rows of the services and
+    their resources are iterated in depth-first order, so that neither of them is held in memory.
+
+    :param rows: services and resources with their depth, as generated by
+        :func:`magpie.models.iter_services_resources_tree` for the same ``service_types``
+    :param service_types: service types for which to group services, in the same order as ``rows``
+    :param flat: display resource trees in the compact representation of :class:`FlatResourceTree`, for which resources
+        of each service are formatted at once
+    :return: JSON body representation of services resource trees generated while written
+    """
+    rows = iter(rows)
+    pending = [next(rows, None)]  # next row to format, 'None' when all rows were iterated
+
+    def next_items(depth, svc_type=None):
+        # skip any remaining sub-resource if items of the previous sibling were not all generated
+        while pending[0] is not None and pending[0].depth > depth:
+            pending[0] = next(rows, None)
+        if pending[0] is None or pending[0].depth < depth or (svc_type and pending[0].type != svc_type):
+            return None
+        row = pending[0]
+        pending[0] = next(rows, None)
+        return row
+
+    def res_items(depth):
+        res = next_items(depth)
+        while res is not None:
+            res_json = format_resource(res, [])
+            res_json[u"children"] = JSONStream(res_items(depth + 1))
+            yield res.resource_id, res_json
+            res = next_items(depth)
+
+    def flat_res_tree():
+        flat_tree = FlatResourceTree()
+        while pending[0] is not None and pending[0].depth > 0:
+            flat_tree.add(pending[0], [])
+            pending[0] = next(rows, None)
+        return flat_tree.json()
+
+    def svc_items(svc_type):
+        svc = next_items(0, svc_type)
+        while svc is not None:
+            svc_json = format_service(svc, show_private_url=False)
+            svc_json[u"resources"] = flat_res_tree() if flat else JSONStream(res_items(1))
+            yield svc.resource_name, svc_json
+            svc = next_items(0, svc_type)
+
+    return JSONStream((svc_type, JSONStream(svc_items(svc_type))) for svc_type in service_types)
+
+
 def format_service_resource_type(resource_class, service_class):
     # type: (Type[Resource], Type[ServiceInterface]) -> JSON
     return {
@@ -1,6 +1,8 @@
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api.management.resource.resource_utils import create_resource, delete_resource
 from magpie.api.management.service import service_formats as sf, service_utils as su
 from magpie.api import requests as ar, exception as ax, schemas as s
+from magpie.definitions.ziggurat_definitions import ResourceService
 from magpie.definitions.pyramid_definitions import (
     asbool,
     view_config,
@@ -12,6 +14,7 @@ from magpie.definitions.pyramid_definitions import (
 )
 from magpie.permissions import Permission, format_permissions
 from magpie.register import sync_services_phoenix, SERVICES_PHOENIX_ALLOWED
+from magpie.resource_index import mark_resource_tree_changed
 from magpie.services import SERVICE_TYPE_DICT
 from magpie.utils import CONTENT_TYPE_JSON
 from magpie import models
@@ -160,6 +163,9 @@ def unregister_service_view(request):
     service_push = asbool(ar.get_multiformat_delete(request, "service_push", default=False))
     svc_content = sf.format_service(service, show_private_url=True)
     svc_res_id = service.resource_id
+    # branch deletion is done with raw SQL, not detected by the session events
+    mark_resource_tree_changed(request.db)
+    invalidate_acl_cache(request.db, resource_id=svc_res_id)
     ax.evaluate_call(lambda: models.resource_tree_service.delete_branch(resource_id=svc_res_id, db_session=request.db),
                      fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
                      msgOnFail="Delete service from resource tree failed.", content=svc_content)
@@ -200,15 +206,29 @@ def delete_service_resource_view(request):
     return delete_resource(request)
 
 
-@s.ServiceResourcesAPI.get(tags=[s.ServicesTag], response_schemas=s.ServiceResources_GET_responses)
+@s.ServiceResourcesAPI.get(schema=s.ServiceResources_GET_RequestSchema(), tags=[s.ServicesTag],
+                           response_schemas=s.ServiceResources_GET_responses)
 @view_config(route_name=s.ServiceResourcesAPI.name, request_method="GET")
 def get_service_resources_view(request):
     """
     List all resources registered under a service.
     """
     service = ar.get_service_matchdict_checked(request)
-    svc_res_json = sf.format_service_resources(service, db_session=request.db,
-                                               show_all_children=True, show_private_url=True)
+    tree_params = ar.get_resources_tree_params_checked(request)
+    flat = ar.get_resources_tree_flat_checked(request)
+    parent_id = ar.get_query_param_int_checked(request, "parent",
+                                               msgOnFail=s.ResourcesTree_BadRequestResponseSchema.description)
+    parent = None
+    if parent_id is not None and parent_id != service.resource_id:
+        parent = ax.evaluate_call(lambda: ResourceService.by_resource_id(parent_id, db_session=request.db),
+                                  fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
+                                  msgOnFail=s.Resource_MatchDictCheck_ForbiddenResponseSchema.description)
+        ax.verify_param(parent is not None and parent.root_service_id == service.resource_id, isTrue=True,
+                        withParam=False, httpError=HTTPBadRequest,
+                        content={u"param": {u"name": u"parent", u"value": parent_id}},
+                        msgOnFail=s.ResourcesTree_BadRequestResponseSchema.description)
+    svc_res_json = sf.format_service_resources(service, db_session=request.db, parent=parent, flat=flat,
+                                               show_all_children=True, show_private_url=True, **tree_params)
     return ax.valid_http(httpSuccess=HTTPOk, content={svc_res_json["service_name"]: svc_res_json},
                          detail=s.ServiceResources_GET_OkResponseSchema.description)
 
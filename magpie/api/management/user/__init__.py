@@ -15,6 +15,7 @@ def includeme(config):
     config.add_route(**s.service_api_route_info(s.UserServicePermissionsAPI))
     config.add_route(**s.service_api_route_info(s.UserServicePermissionAPI))
     config.add_route(**s.service_api_route_info(s.UserServiceInheritedPermissionsAPI))
+    config.add_route(**s.service_api_route_info(s.UserServiceEffectivePermissionsAPI))
     config.add_route(**s.service_api_route_info(s.UserServiceResourcesAPI))
     config.add_route(**s.service_api_route_info(s.UserServiceInheritedResourcesAPI))
     config.add_route(**s.service_api_route_info(s.UserResourcesAPI))
@@ -32,6 +33,7 @@ def includeme(config):
     config.add_route(**s.service_api_route_info(s.LoggedUserServicePermissionsAPI))
     config.add_route(**s.service_api_route_info(s.LoggedUserServicePermissionAPI))
     config.add_route(**s.service_api_route_info(s.LoggedUserServiceInheritedPermissionsAPI))
+    config.add_route(**s.service_api_route_info(s.LoggedUserServiceEffectivePermissionsAPI))
     config.add_route(**s.service_api_route_info(s.LoggedUserServiceResourcesAPI))
     config.add_route(**s.service_api_route_info(s.LoggedUserServiceInheritedResourcesAPI))
     config.add_route(**s.service_api_route_info(s.LoggedUserResourcesAPI))
@@ -1,6 +1,9 @@
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api import exception as ax, schemas as s
 from magpie.api.management.service.service_formats import format_service
-from magpie.api.management.resource.resource_utils import check_valid_service_or_resource_permission
+from magpie.api.management.resource.resource_utils import (
+    check_valid_service_or_resource_permission, get_resources_forest_permissions
+)
 from magpie.api.management.user import user_formats as uf
 from magpie.constants import get_constant
 from magpie.definitions.ziggurat_definitions import (
@@ -9,6 +12,7 @@ from magpie.definitions.ziggurat_definitions import (
     ResourceService,
     UserResourcePermissionService,
 )
+from magpie.definitions.sqlalchemy_definitions import sa
 from magpie.definitions.pyramid_definitions import (
     HTTPOk,
     HTTPCreated,
@@ -27,7 +31,8 @@ if TYPE_CHECKING:
     from magpie.definitions.pyramid_definitions import Request, HTTPException  # noqa: F401
     from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
     from magpie.definitions.typedefs import (  # noqa: F401
-        Any, Str, Dict, Iterable, List, Optional, ResourcePermissionType, UserServicesType, ServiceOrResourceType
+        Any, Str, Dict, Iterable, List, Optional, Tuple, ResourcePermissionType, UserServicesType,
+        ServiceOrResourceType
     )
     from magpie.permissions import Permission  # noqa: F401
 
@@ -119,6 +124,7 @@ def create_user_resource_permission_response(user, resource, permission, db_sess
     ax.evaluate_call(lambda: db_session.add(new_perm), fallback=lambda: db_session.rollback(),
                      httpError=HTTPForbidden, content=usr_res_data,
                      msgOnFail=s.UserResourcePermissions_POST_ForbiddenResponseSchema.description)
+    invalidate_acl_cache(db_session, user_id=user.id, resource_id=resource_id)
     return ax.valid_http(httpSuccess=HTTPCreated, content=usr_res_data,
                          detail=s.UserResourcePermissions_POST_CreatedResponseSchema.description)
 
@@ -138,6 +144,7 @@ def delete_user_resource_permission_response(user, resource, permission, db_sess
                      httpError=HTTPNotFound,
                      msgOnFail=s.UserResourcePermissions_DELETE_NotFoundResponseSchema.description,
                      content={u"resource_id": resource_id, u"user_id": user.id, u"permission_name": permission.value})
+    invalidate_acl_cache(db_session, user_id=user.id, resource_id=resource_id)
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.UserResourcePermissions_DELETE_OkResponseSchema.description)
 
 
@@ -198,6 +205,87 @@ def get_user_resource_permissions_response(user, resource, request,
                          detail=s.UserResourcePermissions_GET_OkResponseSchema.description)
 
 
+def get_user_service_effective_permissions_response(user, service, permission, request,
+                                                    resource_paths=None, resource_ids=None):
+    # type: (models.User, models.Service, Permission, Request, Optional[List[Str]], Optional[List[int]]) -> HTTPException
+    """
+    Resolves if the user is effectively granted the permission on each of the specified resources of the service.
+
+    Effective permissions are the same as returned for each resource individually by
+    :func:`get_user_resource_permissions_response` with ``effective_permissions=True``, but the resources tree of the
+    service and the permissions of all their parents are retrieved only once for the whole batch.
+
+    :param user: user for which to resolve effective permissions.
+    :param service: service under which requested resources are located.
+    :param permission: permission to resolve on every requested resource.
+    :param request: request with database session connection.
+    :param resource_paths: paths of children resource names under the service (case-insensitive, separated by '/').
+    :param resource_ids: identifiers of the service or of its children resources.
+    :returns: valid HTTP response on successful operations.
+    :raises HTTPException: error HTTP response of corresponding situation.
+    """
+    db_session = request.db
+    resource_paths = resource_paths or []
+    resource_ids = resource_ids or []
+
+    def get_usr_svc_effective_perms():
+        query = db_session.query(
+            models.Resource.resource_id,
+            models.Resource.parent_id,
+            models.Resource.resource_name,
+            models.Resource.resource_type,
+            models.Resource.owner_user_id,
+            models.Resource.owner_group_id,
+        ).filter(
+            sa.or_(models.Resource.resource_id == service.resource_id,
+                   models.Resource.root_service_id == service.resource_id)
+        ).order_by(models.Resource.parent_id, models.Resource.ordering)
+        resources = dict()
+        children = dict()
+        for res in query:
+            resources[res.resource_id] = res
+            if res.resource_id != service.resource_id:
+                # retain the last match amongst siblings in case of names that only differ by case
+                children.setdefault(res.parent_id, dict())[res.resource_name.lower()] = res.resource_id
+
+        paths_ids = dict()
+        for res_path in resource_paths:
+            res_id = service.resource_id
+            for res_name in filter(None, res_path.split("/")):
+                res_id = children.get(res_id, {}).get(res_name.lower())
+                if res_id is None:
+                    break
+            paths_ids[res_path] = res_id
+
+        svc = service_factory(service, request)
+        requested_ids = set(res_id for res_id in list(paths_ids.values()) + resource_ids if res_id in resources)
+        res_perms = svc.effective_permissions_tree(requested_ids, resources, user)
+        for res_id in requested_ids:
+            res = resources[res_id]
+            if res.owner_user_id == user.id:
+                if res_id == service.resource_id:
+                    res_perms[res_id] = svc.permissions
+                else:
+                    res_perms[res_id] = type(svc).get_resource_permissions(res.resource_type)
+
+        def is_permitted(res_id):
+            return res_id in res_perms and permission in res_perms[res_id]
+
+        return {
+            u"permission_name": permission.value,
+            u"resource_paths": dict((res_path, is_permitted(res_id)) for res_path, res_id in paths_ids.items()),
+            u"resource_ids": dict((str(res_id), is_permitted(res_id)) for res_id in resource_ids),
+        }
+
+    content = ax.evaluate_call(
+        lambda: get_usr_svc_effective_perms(),
+        fallback=lambda: db_session.rollback(), httpError=HTTPInternalServerError,
+        msgOnFail=s.UserServicePermissions_GET_NotFoundResponseSchema.description,
+        content={u"service_name": str(service.resource_name), u"user_name": str(user.user_name)})
+    return ax.valid_http(httpSuccess=HTTPOk, content=content,
+                         detail=s.UserServiceEffectivePermissions_POST_OkResponseSchema.description)
+
+
 def get_user_services(user, request, cascade_resources=False,
                       inherit_groups_permissions=False, format_as_list=False):
     # type: (models.User, Request, bool, bool, bool) -> UserServicesType
@@ -300,6 +388,33 @@ def get_user_service_resources_permissions_dict(user, service, request, inherit_
                                                inherit_groups_permissions=inherit_groups_permissions)
 
 
+def get_user_resources_forest_permissions(user, resources, request, inherit_groups_permissions=True):
+    # type: (models.User, Iterable[ServiceOrResourceType], Request, bool) -> Tuple[Dict[int, List[Str]], Dict[int, List[Str]]]
+    """
+    Obtains the permissions of the user on every service and on every children resource, using a single query.
+
+    Results are the same as calling :func:`get_user_service_permissions` and
+    :func:`get_user_service_resources_permissions_dict` for every service.
+
+    :param user: user for which to find permissions.
+    :param resources: all services and children resources, as returned by :func:`models.get_all_resources`.
+    :param request: request with database session connection.
+    :param inherit_groups_permissions:
+        If `False`, return only user-specific service/sub-resources permissions.
+        Otherwise, resolve inherited permissions using all groups the user is member of.
+    :returns: permissions by service id, and permissions by children resource id (only resources with permissions).
+    """
+    res_perms = models.find_all_resources_permissions_for_user(user, request.db, inherit_groups_permissions)
+    group_ids = set(grp.id for grp in user.groups) if inherit_groups_permissions else set()
+
+    def is_owner(res):
+        if res.resource_type == models.Service.resource_type_name:
+            return res.owner_user_id == user.id
+        return res.owner_user_id == user.id or res.owner_group_id in group_ids
+
+    return get_resources_forest_permissions(resources, res_perms, is_owner)
+
+
 def check_user_info(user_name, email, password, group_name):
     # type: (Str, Str, Str, Str) -> None
     ax.verify_param(user_name, notNone=True, notEmpty=True, httpError=HTTPBadRequest,
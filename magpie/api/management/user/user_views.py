@@ -1,6 +1,10 @@
+from magpie.acl_cache import invalidate_acl_cache
 from magpie.api import exception as ax, requests as ar, schemas as s
+from magpie.api.management.group import group_utils as gu
 from magpie.api.management.user import user_utils as uu, user_formats as uf
-from magpie.api.management.service.service_formats import format_service_resources
+from magpie.api.management.service.service_formats import (
+    format_service_resources, format_services_resources_forest
+)
 from magpie.constants import get_constant
 from magpie.definitions.pyramid_definitions import (
     asbool,
@@ -14,23 +18,25 @@ from magpie.definitions.pyramid_definitions import (
     HTTPConflict,
     NO_PERMISSION_REQUIRED,
 )
-from magpie.definitions.ziggurat_definitions import UserService, GroupService, ResourceService
+from magpie.definitions.ziggurat_definitions import UserService, GroupService
+from magpie.permissions import Permission
 from magpie.utils import get_logger
 from magpie import models
+import six
 LOGGER = get_logger(__name__)
 
 
-@s.UsersAPI.get(tags=[s.UsersTag], response_schemas=s.Users_GET_responses)
+@s.UsersAPI.get(schema=s.Users_GET_RequestSchema(), tags=[s.UsersTag], response_schemas=s.Users_GET_responses)
 @view_config(route_name=s.UsersAPI.name, request_method="GET")
 def get_users_view(request):
     """
     List all registered user names.
     """
-    user_name_list = ax.evaluate_call(lambda: [user.user_name for user in
-                                               UserService.all(models.User, db_session=request.db)],
+    filters = ar.get_names_filters_checked(request)
+    user_name_list = ax.evaluate_call(lambda: models.find_user_names(request.db, **filters),
                                       fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
                                       msgOnFail=s.Users_GET_ForbiddenResponseSchema.description)
-    return ax.valid_http(httpSuccess=HTTPOk, content={u"user_names": sorted(user_name_list)},
+    return ax.valid_http(httpSuccess=HTTPOk, content={u"user_names": user_name_list},
                          detail=s.Users_GET_OkResponseSchema.description)
 
 
@@ -115,12 +121,14 @@ def delete_user_view(request):
     user = ar.get_user_matchdict_checked_or_logged(request)
     ax.evaluate_call(lambda: request.db.delete(user), fallback=lambda: request.db.rollback(),
                      httpError=HTTPForbidden, msgOnFail=s.User_DELETE_ForbiddenResponseSchema.description)
+    invalidate_acl_cache(request.db, user_id=user.id)
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.User_DELETE_OkResponseSchema.description)
 
 
-@s.UserGroupsAPI.get(tags=[s.UsersTag], api_security=s.SecurityEveryoneAPI, response_schemas=s.UserGroups_GET_responses)
-@s.LoggedUserGroupsAPI.get(tags=[s.LoggedUserTag], api_security=s.SecurityEveryoneAPI,
-                           response_schemas=s.LoggedUserGroups_GET_responses)
+@s.UserGroupsAPI.get(schema=s.UserGroups_GET_RequestSchema(), tags=[s.UsersTag], api_security=s.SecurityEveryoneAPI,
+                     response_schemas=s.UserGroups_GET_responses)
+@s.LoggedUserGroupsAPI.get(schema=s.UserGroups_GET_RequestSchema(), tags=[s.LoggedUserTag],
+                           api_security=s.SecurityEveryoneAPI, response_schemas=s.LoggedUserGroups_GET_responses)
 @view_config(route_name=s.UserGroupsAPI.name, request_method="GET", permission=NO_PERMISSION_REQUIRED)
 def get_user_groups_view(request):
     """
@@ -128,8 +136,10 @@ def get_user_groups_view(request):
     """
     user = ar.get_user_matchdict_checked_or_logged(request)
     group_names = uu.get_user_groups_checked(request, user)
-    return ax.valid_http(httpSuccess=HTTPOk, content={u"group_names": group_names},
-                         detail=s.UserGroups_GET_OkResponseSchema.description)
+    content = {u"group_names": group_names}
+    if asbool(ar.get_query_param(request, "with_counts")):
+        content[u"member_counts"] = gu.get_groups_member_counts(group_names, request.db)
+    return ax.valid_http(httpSuccess=HTTPOk, content=content, detail=s.UserGroups_GET_OkResponseSchema.description)
 
 
 @s.UserGroupsAPI.post(schema=s.UserGroups_POST_RequestSchema(), tags=[s.UsersTag],
@@ -157,6 +167,7 @@ def assign_user_group_view(request):
                      fallback=lambda: request.db.rollback(), httpError=HTTPForbidden,
                      msgOnFail=s.UserGroups_POST_RelationshipForbiddenResponseSchema.description,
                      content={u"user_name": user.user_name, u"group_name": group.group_name})
+    invalidate_acl_cache(request.db, user_id=user.id)
     return ax.valid_http(httpSuccess=HTTPCreated, detail=s.UserGroups_POST_CreatedResponseSchema.description,
                          content={u"user_name": user.user_name, u"group_name": group.group_name})
 
@@ -183,6 +194,7 @@ def delete_user_group_view(request):
     ax.evaluate_call(lambda: del_usr_grp(user, group), fallback=lambda: db.rollback(),
                      httpError=HTTPNotFound, msgOnFail=s.UserGroup_DELETE_NotFoundResponseSchema.description,
                      content={u"user_name": user.user_name, u"group_name": group.group_name})
+    invalidate_acl_cache(db, user_id=user.id)
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.UserGroup_DELETE_OkResponseSchema.description)
 
 
@@ -198,34 +210,26 @@ def get_user_resources_view(request):
     List all resources a user has permissions on.
     """
     inherit_groups_perms = asbool(ar.get_query_param(request, "inherit"))
+    stream = asbool(ar.get_query_param(request, "stream"))
+    flat = ar.get_resources_tree_flat_checked(request)
     user = ar.get_user_matchdict_checked_or_logged(request)
     db = request.db
 
     def build_json_user_resource_tree(usr):
-        json_res = {}
-        services = ResourceService.all(models.Service, db_session=db)
-        for svc in services:
-            svc_perms = uu.get_user_service_permissions(
-                user=usr, service=svc, request=request, inherit_groups_permissions=inherit_groups_perms)
-            if svc.type not in json_res:
-                json_res[svc.type] = {}
-            res_perms_dict = uu.get_user_service_resources_permissions_dict(
-                user=usr, service=svc, request=request, inherit_groups_permissions=inherit_groups_perms)
-            json_res[svc.type][svc.resource_name] = format_service_resources(
-                svc,
-                db_session=db,
-                service_perms=svc_perms,
-                resources_perms_dict=res_perms_dict,
-                show_all_children=False,
-                show_private_url=False,
-            )
-        return json_res
+        resources = models.get_all_resources(db)
+        svc_perms, res_perms_dict = uu.get_user_resources_forest_permissions(
+            usr, resources, request=request, inherit_groups_permissions=inherit_groups_perms)
+        return format_services_resources_forest(resources, svc_perms, res_perms_dict,
+                                                show_private_url=False, stream=stream, flat=flat)
 
     usr_res_dict = ax.evaluate_call(lambda: build_json_user_resource_tree(user),
                                     fallback=lambda: db.rollback(), httpError=HTTPNotFound,
                                     msgOnFail=s.UserResources_GET_NotFoundResponseSchema.description,
                                     content={u"user_name": user.user_name,
                                              u"resource_types": [models.Service.resource_type_name]})
+    if stream:
+        return ax.valid_http_stream(httpSuccess=HTTPOk, content={u"resources": usr_res_dict},
+                                    detail=s.UserResources_GET_OkResponseSchema.description)
     return ax.valid_http(httpSuccess=HTTPOk, content={u"resources": usr_res_dict},
                          detail=s.UserResources_GET_OkResponseSchema.description)
 
@@ -399,6 +403,35 @@ def create_user_service_permission_view(request):
     return uu.create_user_resource_permission_response(user, service, permission, request.db)
 
 
+@s.UserServiceEffectivePermissionsAPI.post(schema=s.UserServiceEffectivePermissions_POST_RequestSchema(),
+                                           tags=[s.UsersTag], api_security=s.SecurityEveryoneAPI,
+                                           response_schemas=s.UserServiceEffectivePermissions_POST_responses)
+@s.LoggedUserServiceEffectivePermissionsAPI.post(schema=s.UserServiceEffectivePermissions_POST_RequestSchema(),
+                                                 tags=[s.LoggedUserTag], api_security=s.SecurityEveryoneAPI,
+                                                 response_schemas=s.LoggedUserServiceEffectivePermissions_POST_responses)
+@view_config(route_name=s.UserServiceEffectivePermissionsAPI.name, request_method="POST",
+             permission=NO_PERMISSION_REQUIRED)
+def get_user_service_effective_permissions_view(request):
+    """
+    Resolve if a user is effectively granted a permission on each of many resources of a service at once.
+    """
+    user = ar.get_user_matchdict_checked_or_logged(request)
+    service = ar.get_service_matchdict_checked(request)
+    perm_name = ar.get_value_multiformat_post_checked(request, "permission_name")
+    permission = Permission.get(perm_name)
+    ax.verify_param(permission, notNone=True, httpError=HTTPBadRequest, paramName=u"permission_name",
+                    msgOnFail=s.UserServiceEffectivePermissions_POST_BadRequestResponseSchema.description)
+    res_paths = ar.get_multiformat_post(request, "resource_paths", default=[])
+    res_ids = ar.get_multiformat_post(request, "resource_ids", default=[])
+    for param_name, param_values, param_type in [(u"resource_paths", res_paths, six.string_types),
+                                                 (u"resource_ids", res_ids, six.integer_types)]:
+        ax.verify_param(isinstance(param_values, list) and all(isinstance(v, param_type) for v in param_values),
+                        isTrue=True, httpError=HTTPBadRequest, paramName=param_name,
+                        msgOnFail=s.UserServiceEffectivePermissions_POST_BadRequestResponseSchema.description)
+    return uu.get_user_service_effective_permissions_response(user, service, permission, request,
+                                                              resource_paths=res_paths, resource_ids=res_ids)
+
+
 @s.UserServicePermissionAPI.delete(schema=s.UserServicePermission_DELETE_RequestSchema, tags=[s.UsersTag],
                                    response_schemas=s.UserServicePermission_DELETE_responses)
 @s.LoggedUserServicePermissionAPI.delete(schema=s.UserServicePermission_DELETE_RequestSchema, tags=[s.LoggedUserTag],
@@ -426,6 +459,7 @@ def get_user_service_resources_view(request):
     List all resources under a service a user has permission on.
     """
     inherit_groups_perms = asbool(ar.get_query_param(request, "inherit"))
+    flat = ar.get_resources_tree_flat_checked(request)
     user = ar.get_user_matchdict_checked_or_logged(request)
     service = ar.get_service_matchdict_checked(request)
     service_perms = uu.get_user_service_permissions(
@@ -439,6 +473,7 @@ def get_user_service_resources_view(request):
         resources_perms_dict=resources_perms_dict,
         show_all_children=False,
         show_private_url=False,
+        flat=flat,
     )
     return ax.valid_http(httpSuccess=HTTPOk, detail=s.UserServiceResources_GET_OkResponseSchema.description,
                          content={u"service": user_svc_res_json})
@@ -15,7 +15,7 @@ from magpie import models
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from magpie.definitions.pyramid_definitions import Request  # noqa: F401
-    from magpie.definitions.typedefs import Any, Str, Optional, ServiceOrResourceType  # noqa: F401
+    from magpie.definitions.typedefs import Any, Dict, Str, Optional, ServiceOrResourceType  # noqa: F401
     from magpie.permissions import Permission  # noqa: F401
 
 
@@ -183,3 +183,71 @@ def get_query_param(request, case_insensitive_key, default=None):
         if p.lower() == case_insensitive_key:
             return request.params.get(p)
     return default
+
+
+def get_query_param_int_checked(request, case_insensitive_key, min_value=None, msgOnFail=""):
+    # type: (Request, Str, Optional[int], Str) -> Optional[int]
+    """
+    Retrieves an optional integer query string value by name (case insensitive).
+
+    :returns: found integer value, or ``None`` if not present.
+    :raises HTTPBadRequest: if the value is not an integer or is lower than ``min_value``.
+    """
+    value = get_query_param(request, case_insensitive_key)
+    if value is None:
+        return None
+    content = {u"param": {u"name": case_insensitive_key, u"value": value}}
+    value = evaluate_call(lambda: int(value), httpError=HTTPBadRequest, msgOnFail=msgOnFail, content=content)
+    if min_value is not None:
+        verify_param(value >= min_value, isTrue=True, withParam=False, httpError=HTTPBadRequest,
+                     msgOnFail=msgOnFail, content=content)
+    return value
+
+
+def get_resources_tree_params_checked(request):
+    # type: (Request) -> Dict[Str, Optional[int]]
+    """
+    Retrieves the optional ``depth``, ``limit`` and ``cursor`` query string values that restrict listed children
+    resources of a tree, as keyword arguments of :func:`magpie.api.management.resource.resource_formats.get_resource_children`.
+
+    :raises HTTPBadRequest: if any value is invalid.
+    """
+    return dict(
+        (param, get_query_param_int_checked(request, param, min_value=min_value,
+                                            msgOnFail=s.ResourcesTree_BadRequestResponseSchema.description))
+        for param, min_value in [("depth", 0), ("limit", 1), ("cursor", None)]
+    )
+
+
+def get_names_filters_checked(request):
+    # type: (Request) -> Dict[Str, Any]
+    """
+    Retrieves the optional ``prefix``, ``limit`` and ``after`` query string values that filter listed user or group
+    names, as keyword arguments of :func:`magpie.models.find_names`.
+
+    :raises HTTPBadRequest: if any value is invalid.
+    """
+    return {
+        "prefix": get_query_param(request, "prefix"),
+        "limit": get_query_param_int_checked(request, "limit", min_value=1,
+                                             msgOnFail=s.NamesList_BadRequestResponseSchema.description),
+        "after": get_query_param(request, "after"),
+    }
+
+
+def get_resources_tree_flat_checked(request):
+    # type: (Request) -> bool
+    """
+    Retrieves the optional ``format`` query string value of returned resource trees.
+
+    :returns: whether the compact flat representation of resource trees is requested.
+    :raises HTTPBadRequest: if the format is unknown.
+    """
+    # import here to avoid circular import error with undefined functions between (api_request, resource_formats)
+    from magpie.api.management.resource.resource_formats import (
+        RESOURCE_TREE_FORMAT_FLAT, RESOURCE_TREE_FORMAT_NESTED, RESOURCE_TREE_FORMATS
+    )
+    tree_format = get_query_param(request, "format", default=RESOURCE_TREE_FORMAT_NESTED)
+    verify_param(tree_format, paramCompare=RESOURCE_TREE_FORMATS, isIn=True, paramName="format",
+                 httpError=HTTPBadRequest, msgOnFail=s.ResourcesTree_BadRequestResponseSchema.description)
+    return tree_format == RESOURCE_TREE_FORMAT_FLAT
@@ -132,6 +132,9 @@ UserServicePermissionsAPI = Service(
 UserServicePermissionAPI = Service(
     path="/users/{user_name}/services/{service_name}/permissions/{permission_name}",
     name="UserServicePermission")
+UserServiceEffectivePermissionsAPI = Service(
+    path="/users/{user_name}/services/{service_name}/effective_permissions",
+    name="UserServiceEffectivePermissions")
 LoggedUserAPI = Service(
     path=LoggedUserBase,
     name="LoggedUser")
@@ -180,6 +183,9 @@ LoggedUserServicePermissionsAPI = Service(
 LoggedUserServicePermissionAPI = Service(
     path=LoggedUserBase + "/services/{service_name}/permissions/{permission_name}",
     name="LoggedUserServicePermission")
+LoggedUserServiceEffectivePermissionsAPI = Service(
+    path=LoggedUserBase + "/services/{service_name}/effective_permissions",
+    name="LoggedUserServiceEffectivePermissions")
 GroupsAPI = Service(
     path="/groups",
     name="Groups")
@@ -342,6 +348,45 @@ QueryCascadeResourcesPermissions = colander.SchemaNode(
     colander.Boolean(), default=False, missing=colander.drop,
     description="Display any service that has at least one sub-resource user permission, "
                 "or only services that have user permissions directly set on them.", )
+QueryResourcesTreeDepth = colander.SchemaNode(
+    colander.Integer(), missing=colander.drop, validator=colander.Range(min=0),
+    description="Maximum depth of listed children resources (1 for direct children only, 0 for none). "
+                "All nested children resources are listed if not specified.")
+QueryResourcesTreeLimit = colander.SchemaNode(
+    colander.Integer(), missing=colander.drop, validator=colander.Range(min=1),
+    description="Maximum amount of listed direct children resources, following their ordering. "
+                "Nested children of those resources are not limited (see 'depth').")
+QueryResourcesTreeCursor = colander.SchemaNode(
+    colander.Integer(), missing=colander.drop,
+    description="Identifier of the last direct child resource returned by the previous page of listed children "
+                "resources, after which following ones are listed (see 'limit').")
+QueryResourcesTreeParent = colander.SchemaNode(
+    colander.Integer(), missing=colander.drop,
+    description="Identifier of a resource under the service from which to list children resources instead of "
+                "the service itself, allowing to expand the resources tree one level at a time.")
+QueryResourcesTreeFormat = colander.SchemaNode(
+    colander.String(), default="tree", missing=colander.drop, validator=colander.OneOf(["tree", "flat"]),
+    description="Representation of returned resource trees. With 'flat', the nested children of each tree are "
+                "replaced by arrays of resource attributes in depth-first order (parents before their children), "
+                "with resource types as indices in 'resource_types' and permissions as bitmasks where bit 'i' "
+                "indicates permission 'permission_names[i]'.")
+QueryNamesPrefix = colander.SchemaNode(
+    colander.String(), missing=colander.drop,
+    description="Only list names starting with this value (case-insensitive).")
+QueryNamesLimit = colander.SchemaNode(
+    colander.Integer(), missing=colander.drop, validator=colander.Range(min=1),
+    description="Maximum amount of listed names, following their case-insensitive ordering.")
+QueryNamesAfter = colander.SchemaNode(
+    colander.String(), missing=colander.drop,
+    description="Last name returned by the previous page of listed names, after which following ones are listed "
+                "(see 'limit').")
+QueryGroupsMemberCounts = colander.SchemaNode(
+    colander.Boolean(), default=False, missing=colander.drop,
+    description="Also return the number of users member of each listed group in 'member_counts'.")
+QueryStreamResponse = colander.SchemaNode(
+    colander.Boolean(), default=False, missing=colander.drop,
+    description="Write the response body incrementally while it is generated instead of all at once. "
+                "Reduces memory usage and delay before the first bytes are received for large listings.")
 
 
 class BaseResponseBodySchema(colander.MappingSchema):
@@ -516,6 +561,13 @@ class GroupBodySchema(colander.MappingSchema):
         example=1)
 
 
+GroupsMemberCountsSchema = colander.SchemaNode(
+    colander.Mapping(unknown="preserve"),
+    description="Number of users member of each listed group, by group name (when requested with 'with_counts').",
+    example={"administrators": 1, "users": 12},
+    missing=colander.drop)
+
+
 class GroupDetailBodySchema(GroupBodySchema):
     description = colander.SchemaNode(
         colander.String(),
@@ -674,6 +726,24 @@ class Resource_MatchDictCheck_BadRequestResponseSchema(colander.MappingSchema):
     body = BaseResponseBodySchema(code=HTTPBadRequest.code, description=description)
 
 
+class ResourcesTree_BadRequestResponseSchema(colander.MappingSchema):
+    description = "Invalid value of resources tree query parameter."
+    header = HeaderResponseSchema()
+    body = BaseResponseBodySchema(code=HTTPBadRequest.code, description=description)
+
+
+class Resource_GET_QuerySchema(colander.MappingSchema):
+    depth = QueryResourcesTreeDepth
+    limit = QueryResourcesTreeLimit
+    cursor = QueryResourcesTreeCursor
+    format = QueryResourcesTreeFormat
+
+
+class Resource_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = Resource_GET_QuerySchema()
+
+
 class Resource_GET_ResponseBodySchema(BaseResponseBodySchema):
     resource = Resource_ParentResourceWithChildrenContainerBodySchema()
 
@@ -766,6 +836,23 @@ class Resource_DELETE_ForbiddenResponseSchema(colander.MappingSchema):
     body = BaseResponseBodySchema(code=HTTPForbidden.code, description=description)
 
 
+class NamesList_BadRequestResponseSchema(colander.MappingSchema):
+    description = "Invalid value of names listing query parameter."
+    header = HeaderResponseSchema()
+    body = BaseResponseBodySchema(code=HTTPBadRequest.code, description=description)
+
+
+class Resources_GET_QuerySchema(colander.MappingSchema):
+    depth = QueryResourcesTreeDepth
+    format = QueryResourcesTreeFormat
+    stream = QueryStreamResponse
+
+
+class Resources_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = Resources_GET_QuerySchema()
+
+
 class Resources_GET_OkResponseSchema(colander.MappingSchema):
     description = "Get resources successful."
     header = HeaderResponseSchema()
@@ -1163,6 +1250,19 @@ ServiceResource_DELETE_ForbiddenResponseSchema = Resource_DELETE_ForbiddenRespon
 ServiceResource_DELETE_OkResponseSchema = Resource_DELETE_OkResponseSchema
 
 
+class ServiceResources_GET_QuerySchema(colander.MappingSchema):
+    parent = QueryResourcesTreeParent
+    depth = QueryResourcesTreeDepth
+    limit = QueryResourcesTreeLimit
+    cursor = QueryResourcesTreeCursor
+    format = QueryResourcesTreeFormat
+
+
+class ServiceResources_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = ServiceResources_GET_QuerySchema()
+
+
 class ServiceResources_GET_ResponseBodySchema(BaseResponseBodySchema):
     service_name = Resource_ServiceWithChildrenResourcesContainerBodySchema()
     service_name.name = '{service_name}'
@@ -1241,6 +1341,17 @@ class ServiceTypeResourceTypes_GET_NotFoundResponseSchema(colander.MappingSchema
     body = ServiceTypeResourceTypes_GET_FailureBodyResponseSchema(code=HTTPNotFound.code, description=description)
 
 
+class Users_GET_QuerySchema(colander.MappingSchema):
+    prefix = QueryNamesPrefix
+    limit = QueryNamesLimit
+    after = QueryNamesAfter
+
+
+class Users_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = Users_GET_QuerySchema()
+
+
 class Users_GET_ResponseBodySchema(BaseResponseBodySchema):
     user_names = UserNamesListSchema()
 
@@ -1479,8 +1590,18 @@ class UserGroup_Check_ForbiddenResponseSchema(colander.MappingSchema):
     body = BaseResponseBodySchema(code=HTTPForbidden.code, description=description)
 
 
+class UserGroups_GET_QuerySchema(colander.MappingSchema):
+    with_counts = QueryGroupsMemberCounts
+
+
+class UserGroups_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = UserGroups_GET_QuerySchema()
+
+
 class UserGroups_GET_ResponseBodySchema(BaseResponseBodySchema):
     group_names = GroupNamesListSchema()
+    member_counts = GroupsMemberCountsSchema
 
 
 class UserGroups_GET_OkResponseSchema(colander.MappingSchema):
@@ -1584,6 +1705,8 @@ class UserGroup_DELETE_NotFoundResponseSchema(colander.MappingSchema):
 
 class UserResources_GET_QuerySchema(colander.MappingSchema):
     inherit = QueryInheritGroupsPermissions
+    format = QueryResourcesTreeFormat
+    stream = QueryStreamResponse
 
 
 class UserResources_GET_RequestSchema(colander.MappingSchema):
@@ -1768,6 +1891,7 @@ class UserServiceResources_GET_OkResponseSchema(colander.MappingSchema):
 
 class UserServiceResources_GET_QuerySchema(colander.MappingSchema):
     inherit = QueryInheritGroupsPermissions
+    format = QueryResourcesTreeFormat
 
 
 class UserServiceResources_GET_RequestSchema(colander.MappingSchema):
@@ -1847,6 +1971,58 @@ class UserServicePermissions_GET_NotFoundResponseSchema(colander.MappingSchema):
     body = ErrorResponseBodySchema(code=HTTPNotFound.code, description=description)
 
 
+class ResourcePathsListSchema(colander.SequenceSchema):
+    resource_path = colander.SchemaNode(
+        colander.String(),
+        description="Path of child resource names under the service, separated by '/'.",
+        example="dataset/file.nc"
+    )
+
+
+class ResourceIdsListSchema(colander.SequenceSchema):
+    resource_id = colander.SchemaNode(
+        colander.Integer(),
+        description="Identifier of the service or one of its children resources."
+    )
+
+
+class UserServiceEffectivePermissions_POST_RequestBodySchema(colander.MappingSchema):
+    permission_name = colander.SchemaNode(colander.String(), description="Name of the permission to resolve.")
+    resource_paths = ResourcePathsListSchema(missing=colander.drop)
+    resource_ids = ResourceIdsListSchema(missing=colander.drop)
+
+
+class UserServiceEffectivePermissions_POST_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    body = UserServiceEffectivePermissions_POST_RequestBodySchema()
+    user_name = UserNameParameter
+    service_name = ServiceNameParameter
+
+
+class UserServiceEffectivePermissions_POST_ResponseBodySchema(BaseResponseBodySchema):
+    permission_name = colander.SchemaNode(colander.String(), description="Name of the resolved permission.")
+    resource_paths = colander.SchemaNode(
+        colander.Mapping(unknown="preserve"),
+        description="Effective permission of the user resolved for each requested resource path.",
+        example={"dataset/file.nc": True})
+    resource_ids = colander.SchemaNode(
+        colander.Mapping(unknown="preserve"),
+        description="Effective permission of the user resolved for each requested resource id.",
+        example={"42": False})
+
+
+class UserServiceEffectivePermissions_POST_OkResponseSchema(colander.MappingSchema):
+    description = "Get user service effective permissions successful."
+    header = HeaderResponseSchema()
+    body = UserServiceEffectivePermissions_POST_ResponseBodySchema(code=HTTPOk.code, description=description)
+
+
+class UserServiceEffectivePermissions_POST_BadRequestResponseSchema(colander.MappingSchema):
+    description = "Invalid 'permission_name', 'resource_paths' or 'resource_ids' value specified."
+    header = HeaderResponseSchema()
+    body = ErrorResponseBodySchema(code=HTTPBadRequest.code, description=description)
+
+
 class Group_MatchDictCheck_ForbiddenResponseSchema(colander.MappingSchema):
     description = "Group query by name refused by db."
     header = HeaderResponseSchema()
@@ -1871,8 +2047,21 @@ class Groups_CheckInfo_ForbiddenResponseSchema(colander.MappingSchema):
     body = ErrorResponseBodySchema(code=HTTPForbidden.code, description=description)
 
 
+class Groups_GET_QuerySchema(colander.MappingSchema):
+    prefix = QueryNamesPrefix
+    limit = QueryNamesLimit
+    after = QueryNamesAfter
+    with_counts = QueryGroupsMemberCounts
+
+
+class Groups_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = Groups_GET_QuerySchema()
+
+
 class Groups_GET_ResponseBodySchema(BaseResponseBodySchema):
     group_names = GroupNamesListSchema()
+    member_counts = GroupsMemberCountsSchema
 
 
 class Groups_GET_OkResponseSchema(colander.MappingSchema):
@@ -2145,6 +2334,16 @@ class GroupResourcePermissions_InternalServerErrorResponseSchema(colander.Mappin
         code=HTTPInternalServerError.code, description=description)
 
 
+class GroupResources_GET_QuerySchema(colander.MappingSchema):
+    stream = QueryStreamResponse
+    format = QueryResourcesTreeFormat
+
+
+class GroupResources_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = GroupResources_GET_QuerySchema()
+
+
 class GroupResources_GET_ResponseBodySchema(BaseResponseBodySchema):
     resources = ResourcesSchemaNode()
 
@@ -2176,6 +2375,15 @@ class GroupResourcePermissions_GET_OkResponseSchema(colander.MappingSchema):
     body = GroupResourcePermissions_GET_ResponseBodySchema(code=HTTPOk.code, description=description)
 
 
+class GroupServiceResources_GET_QuerySchema(colander.MappingSchema):
+    format = QueryResourcesTreeFormat
+
+
+class GroupServiceResources_GET_RequestSchema(colander.MappingSchema):
+    header = HeaderRequestSchemaAPI()
+    querystring = GroupServiceResources_GET_QuerySchema()
+
+
 class GroupServiceResources_GET_ResponseBodySchema(BaseResponseBodySchema):
     service = ServiceResourcesBodySchema()
 
@@ -2446,6 +2654,7 @@ Resource_PUT_responses = {
 }
 Resources_GET_responses = {
     "200": Resources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "500": Resource_GET_InternalServerErrorResponseSchema()
@@ -2537,6 +2746,7 @@ ServicePermissions_GET_responses = {
 }
 ServiceResources_GET_responses = {
     "200": ServiceResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "403": Service_MatchDictCheck_ForbiddenResponseSchema(),
     "404": Service_MatchDictCheck_NotFoundResponseSchema(),
@@ -2580,6 +2790,7 @@ ServiceResource_DELETE_responses = {
 }
 Users_GET_responses = {
     "200": Users_GET_OkResponseSchema(),
+    "400": NamesList_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "403": Users_GET_ForbiddenResponseSchema(),
     "406": NotAcceptableResponseSchema(),
@@ -2617,6 +2828,7 @@ User_DELETE_responses = {
 }
 UserResources_GET_responses = {
     "200": UserResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "403": User_CheckAnonymous_ForbiddenResponseSchema(),
     "404": UserResources_GET_NotFoundResponseSchema(),
     "406": NotAcceptableResponseSchema(),
@@ -2687,12 +2899,21 @@ UserServicePermissions_GET_responses = {
 }
 UserServiceResources_GET_responses = {
     "200": UserServiceResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "403": User_GET_ForbiddenResponseSchema(),
     "404": Service_MatchDictCheck_NotFoundResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "422": UnprocessableEntityResponseSchema(),
 }
 UserServicePermissions_POST_responses = UserResourcePermissions_POST_responses
+UserServiceEffectivePermissions_POST_responses = {
+    "200": UserServiceEffectivePermissions_POST_OkResponseSchema(),
+    "400": UserServiceEffectivePermissions_POST_BadRequestResponseSchema(),
+    "403": User_GET_ForbiddenResponseSchema(),
+    "404": Service_MatchDictCheck_NotFoundResponseSchema(),
+    "406": NotAcceptableResponseSchema(),
+    "422": UnprocessableEntityResponseSchema(),
+}
 UserServicePermission_DELETE_responses = UserResourcePermission_DELETE_responses
 LoggedUser_GET_responses = {
     "200": User_GET_OkResponseSchema(),
@@ -2719,6 +2940,7 @@ LoggedUser_DELETE_responses = {
 }
 LoggedUserResources_GET_responses = {
     "200": UserResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "403": User_CheckAnonymous_ForbiddenResponseSchema(),
     "404": UserResources_GET_NotFoundResponseSchema(),
     "406": NotAcceptableResponseSchema(),
@@ -2788,15 +3010,18 @@ LoggedUserServicePermissions_GET_responses = {
 }
 LoggedUserServiceResources_GET_responses = {
     "200": UserServiceResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "403": User_GET_ForbiddenResponseSchema(),
     "404": Service_MatchDictCheck_NotFoundResponseSchema(),
     "406": NotAcceptableResponseSchema(),
     "422": UnprocessableEntityResponseSchema(),
 }
 LoggedUserServicePermissions_POST_responses = LoggedUserResourcePermissions_POST_responses
+LoggedUserServiceEffectivePermissions_POST_responses = UserServiceEffectivePermissions_POST_responses
 LoggedUserServicePermission_DELETE_responses = LoggedUserResourcePermission_DELETE_responses
 Groups_GET_responses = {
     "200": Groups_GET_OkResponseSchema(),
+    "400": NamesList_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "403": Groups_GET_ForbiddenResponseSchema(),
     "406": NotAcceptableResponseSchema(),
@@ -2862,6 +3087,7 @@ GroupServicePermissions_GET_responses = {
 }
 GroupServiceResources_GET_responses = {
     "200": GroupServiceResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "403": Group_MatchDictCheck_ForbiddenResponseSchema(),
     "404": Group_MatchDictCheck_NotFoundResponseSchema(),
@@ -2888,6 +3114,7 @@ GroupServicePermission_DELETE_responses = {
 }
 GroupResources_GET_responses = {
     "200": GroupResources_GET_OkResponseSchema(),
+    "400": ResourcesTree_BadRequestResponseSchema(),
     "401": UnauthorizedResponseSchema(),
     "403": Group_MatchDictCheck_ForbiddenResponseSchema(),
     "404": Group_MatchDictCheck_NotFoundResponseSchema(),
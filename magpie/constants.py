@@ -104,6 +104,11 @@ MAGPIE_LOG_PRINT = asbool(os.getenv("MAGPIE_LOG_PRINT", False))
 MAGPIE_LOG_REQUEST = asbool(os.getenv("MAGPIE_LOG_REQUEST", True))              # log detail of every incoming request
 MAGPIE_LOG_EXCEPTION = asbool(os.getenv("MAGPIE_LOG_EXCEPTION", True))          # log detail of generated exceptions
 MAGPIE_UI_ENABLED = asbool(os.getenv("MAGPIE_UI_ENABLED", True))
+MAGPIE_RESOURCE_TREE_INDEX = asbool(os.getenv("MAGPIE_RESOURCE_TREE_INDEX", False))  # in-memory resource tree index
+MAGPIE_ACL_CACHE = os.getenv("MAGPIE_ACL_CACHE", None)                  # cache service ACL (see 'docs/performance.rst')
+MAGPIE_ACL_CACHE_EXPIRE = os.getenv("MAGPIE_ACL_CACHE_EXPIRE", None)    # seconds, no expiry if not set
+MAGPIE_ACL_CACHE_SIZE = int(os.getenv("MAGPIE_ACL_CACHE_SIZE", 10000))
+MAGPIE_DECISION_ENGINE = asbool(os.getenv("MAGPIE_DECISION_ENGINE", False))  # precompiled service authorization
 PHOENIX_USER = os.getenv("PHOENIX_USER", "phoenix")
 PHOENIX_PASSWORD = os.getenv("PHOENIX_PASSWORD", "qwerty")
 PHOENIX_PORT = int(os.getenv("PHOENIX_PORT", 8443))
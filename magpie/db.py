@@ -7,6 +7,9 @@ from magpie.definitions.sqlalchemy_definitions import (
     configure_mappers, select, Inspector, Session, sa_exc
 )
 from magpie.definitions.pyramid_definitions import asbool
+from magpie.acl_cache import setup_acl_cache, setup_principal_cache
+from magpie.notifications import set_notification_engine
+from magpie.resource_index import setup_resource_tree_index
 from magpie.utils import get_settings_from_config_ini, get_settings, print_log, raise_log, get_logger
 from typing import TYPE_CHECKING
 import transaction
@@ -206,8 +209,13 @@ def set_sqlalchemy_log_level(magpie_log_level):
 def includeme(config):
     # use pyramid_tm to hook the transaction lifecycle to the request
     config.include("pyramid_tm")
-    session_factory = get_session_factory(get_engine(config))
+    engine = get_engine(config)
+    session_factory = get_session_factory(engine)
     config.registry["db_session_factory"] = session_factory
+    set_notification_engine(engine)
+    setup_resource_tree_index(config)
+    setup_acl_cache(config)
+    setup_principal_cache(config)
 
     # make `request.db` available for use in Pyramid
     config.add_request_method(
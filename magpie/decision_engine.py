@@ -0,0 +1,208 @@
+"""
+Optional precompiled authorization decision engine for requests to services.
+
+When enabled with ``MAGPIE_DECISION_ENGINE`` (or ``magpie.decision_engine`` setting), the resources and permissions
+of each service are compiled once per process into a trie of resource names holding, for every resource, the allowed
+permissions of each principal (user id or ``group:<id>``) as :class:`magpie.permissions.PermissionSet` masks. Deciding
+if a request is allowed then only requires one walk of the requested path in the trie combined with bitwise operations
+over the request principals, instead of building the complete ACL of the service and scanning it with the
+authorization policy.
+
+The decisions are identical to those obtained with :attr:`magpie.services.ServiceInterface.__acl__`: permissions are
+inherited from parent resources, resource owners are granted every permission, and ``match`` permissions of
+:class:`magpie.services.ServiceAPI` only apply to the last resource of a completely resolved route.
+
+Compiled services are discarded whenever the resource tree or any permission is modified, using the same invalidation
+events as the :mod:`magpie.resource_index` and :mod:`magpie.acl_cache`.
+"""
+from magpie.acl_cache import ACL_CACHE
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import asbool
+from magpie.definitions.sqlalchemy_definitions import sa
+from magpie.notifications import start_listener
+from magpie.permissions import Permission, PermissionSet
+from magpie.resource_index import RESOURCE_TREE_INDEX
+from magpie.utils import get_logger
+from magpie import models
+from typing import TYPE_CHECKING
+import threading
+if TYPE_CHECKING:
+    from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
+    from magpie.definitions.typedefs import (  # noqa: F401
+        AnySettingsContainer, Dict, Iterable, List, Optional, Set, Str, Tuple, Union
+    )
+    Principal = Union[int, Str]
+LOGGER = get_logger(__name__)
+
+PERMISSION_BITS = dict((perm.value, perm.bit) for perm in Permission)  # type: Dict[Str, int]
+ALL_PERMISSION_BITS = PermissionSet(Permission).mask
+MATCH_PERMISSION_BITS = [
+    (Permission.READ_MATCH.bit, Permission.READ.bit),
+    (Permission.WRITE_MATCH.bit, Permission.WRITE.bit),
+]
+
+
+class CompiledResource(object):
+    """
+    Node of the compiled trie of a service with allowed permission bitsets of each principal on the resource.
+    """
+    __slots__ = ["resource_id", "children", "permissions", "owners"]
+
+    def __init__(self, resource_id):
+        self.resource_id = resource_id
+        self.children = dict()      # type: Dict[Str, CompiledResource]
+        self.permissions = dict()   # type: Dict[Principal, int]
+        self.owners = set()         # type: Set[Principal]
+
+    def allowed(self, principals):
+        # type: (Iterable[Principal]) -> int
+        """
+        Bitset of permissions allowed on this resource to any of the principals.
+        """
+        bits = 0
+        for principal in principals:
+            if principal in self.owners:
+                return ALL_PERMISSION_BITS
+            bits |= self.permissions.get(principal, 0)
+        return bits
+
+
+class DecisionEngine(object):
+    """
+    Per-service compiled tries of resources with principal permission bitsets.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._services = dict()     # type: Dict[int, Tuple[Tuple[int, int], CompiledResource]]
+
+    @staticmethod
+    def _generation():
+        # type: () -> Tuple[int, int]
+        return RESOURCE_TREE_INDEX.generation, ACL_CACHE.generation
+
+    def clear(self):
+        # type: () -> None
+        """
+        Discards every compiled service.
+        """
+        with self._lock:
+            self._services = dict()
+
+    def compile(self, service_id, db_session):
+        # type: (int, Session) -> CompiledResource
+        """
+        Obtains the compiled trie of the service, compiling it if missing or outdated.
+        """
+        start_listener()
+        generation = self._generation()
+        compiled = self._services.get(service_id)
+        if compiled is not None and compiled[0] == generation:
+            return compiled[1]
+
+        in_service = sa.or_(models.Resource.resource_id == service_id, models.Resource.root_service_id == service_id)
+        query = db_session.query(
+            models.Resource.resource_id,
+            models.Resource.parent_id,
+            models.Resource.resource_name,
+            models.Resource.owner_user_id,
+            models.Resource.owner_group_id,
+        ).filter(in_service).order_by(models.Resource.parent_id, models.Resource.ordering)
+        nodes = dict()
+        rows = query.all()
+        for res_id, _, _, owner_user_id, owner_group_id in rows:
+            node = nodes[res_id] = CompiledResource(res_id)
+            if owner_user_id:
+                node.owners.add(owner_user_id)
+            if owner_group_id:
+                node.owners.add("group:%s" % owner_group_id)
+        for res_id, parent_id, res_name, _, _ in rows:
+            if res_id != service_id and parent_id in nodes:
+                # retain the last match amongst siblings in case of names that only differ by case
+                nodes[parent_id].children[res_name.lower()] = nodes[res_id]
+
+        user_perms = db_session.query(
+            models.UserResourcePermission.user_id,
+            models.UserResourcePermission.resource_id,
+            models.UserResourcePermission.perm_name,
+        )
+        group_perms = db_session.query(
+            models.GroupResourcePermission.group_id,
+            models.GroupResourcePermission.resource_id,
+            models.GroupResourcePermission.perm_name,
+        )
+        for perms, resource_id, principal_format in [
+            (user_perms, models.UserResourcePermission.resource_id, None),
+            (group_perms, models.GroupResourcePermission.resource_id, "group:%s"),
+        ]:
+            perms = perms.join(models.Resource, models.Resource.resource_id == resource_id).filter(in_service)
+            for principal, res_id, perm_name in perms:
+                principal = principal_format % principal if principal_format else principal
+                bit = PERMISSION_BITS.get(perm_name)
+                if bit:
+                    nodes[res_id].permissions[principal] = nodes[res_id].permissions.get(principal, 0) | bit
+
+        root = nodes.get(service_id, CompiledResource(service_id))
+        with self._lock:
+            # do not keep the compiled service if a modification was notified while it was loading
+            if generation == self._generation():
+                self._services[service_id] = (generation, root)
+        LOGGER.debug("Compiled decision trie of service [%s] with %s resources.", service_id, len(nodes))
+        return root
+
+    def permits(self, service_id, path, principals, permission, db_session, match=False):
+        # type: (int, List[Str], Iterable[Principal], Union[Permission, Str], Session, bool) -> bool
+        """
+        Decides if any of the principals is allowed the permission on the resource targeted by the path.
+
+        :param service_id: service under which the path is resolved.
+        :param path: names of successively nested child resources under the service (case-insensitive).
+        :param principals: user id and ``group:<id>`` of its groups for which to resolve permissions.
+        :param permission: requested permission.
+        :param db_session: connection to db, to compile the service if needed.
+        :param match: apply ``match`` permissions of the last resource if the complete path was resolved.
+        """
+        permission = permission.value if isinstance(permission, Permission) else permission
+        requested = PERMISSION_BITS.get(permission)
+        if not requested:
+            return False
+        principals = list(principals)
+        node = self.compile(service_id, db_session)
+        allowed = last_allowed = node.allowed(principals)
+        resolved = True
+        for name in path:
+            node = node.children.get(name.lower())
+            if node is None:
+                resolved = False
+                break
+            last_allowed = node.allowed(principals)
+            allowed |= last_allowed
+        if match and resolved:
+            for match_bit, perm_bit in MATCH_PERMISSION_BITS:
+                if last_allowed & match_bit:
+                    allowed |= perm_bit
+        return bool(allowed & requested)
+
+
+DECISION_ENGINE = DecisionEngine()
+
+
+def get_decision_engine():
+    # type: () -> Optional[DecisionEngine]
+    """
+    Obtains the decision engine of the process if it was enabled, ``None`` otherwise.
+    """
+    return DECISION_ENGINE if DECISION_ENGINE.enabled else None
+
+
+def setup_decision_engine(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables the decision engine of the process according to settings.
+    """
+    enabled = asbool(get_constant("MAGPIE_DECISION_ENGINE", container, "magpie.decision_engine",
+                                  default_value=False, raise_missing=False, raise_not_set=False, print_missing=True))
+    DECISION_ENGINE.enabled = enabled
+    DECISION_ENGINE.clear()
+    LOGGER.info("Authorization decision engine %s.", "enabled" if enabled else "disabled")
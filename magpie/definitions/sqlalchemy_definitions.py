@@ -13,6 +13,8 @@ from sqlalchemy.ext.declarative import declarative_base, declared_attr
 # noinspection PyUnresolvedReferences
 from sqlalchemy.orm import relationship, sessionmaker, configure_mappers, scoped_session        # noqa: F401
 # noinspection PyUnresolvedReferences
+from sqlalchemy.orm import with_polymorphic                                                     # noqa: F401
+# noinspection PyUnresolvedReferences
 from sqlalchemy.orm.session import Session                                                      # noqa: F401
 # noinspection PyUnresolvedReferences
 from sqlalchemy.sql import select                                                               # noqa: F401
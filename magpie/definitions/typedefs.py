@@ -7,7 +7,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     # noinspection PyUnresolvedReferences
     from typing import (  # noqa: F401
-        Any, AnyStr as _AnyStr, Callable, Dict, List, Iterable, Optional, Tuple, Type, Union
+        Any, AnyStr as _AnyStr, Callable, Dict, List, Iterable, Iterator, Optional, Set, Tuple, Type, Union
     )
     from magpie.definitions.sqlalchemy_definitions import Session
     from magpie import models
@@ -43,6 +43,8 @@ from ziggurat_foundations.models.user_resource_permission import UserResourcePer
 # noinspection PyUnresolvedReferences
 from ziggurat_foundations.permissions import permission_to_pyramid_acls                                     # noqa: F401
 # noinspection PyUnresolvedReferences
+from ziggurat_foundations.permissions import PermissionTuple                                                # noqa: F401
+# noinspection PyUnresolvedReferences
 from ziggurat_foundations.ext.pyramid.sign_in import (                                                      # noqa: F401
     ZigguratSignInBadAuth,
     ZigguratSignInSuccess,
@@ -1,10 +1,13 @@
 from magpie.api.exception import evaluate_call
 from magpie.definitions.pyramid_definitions import ALLOW, ALL_PERMISSIONS, HTTPInternalServerError
-from magpie.definitions.sqlalchemy_definitions import sa, declared_attr, relationship, declarative_base
+from magpie.definitions.sqlalchemy_definitions import (
+    sa, declared_attr, relationship, declarative_base
+)
 from magpie.definitions.ziggurat_definitions import (
     get_db_session,
     permission_to_pyramid_acls,
     ziggurat_model_init,
+    PermissionTuple,
     BaseModel,
     ExternalIdentityMixin,
     GroupMixin,
@@ -17,13 +20,14 @@ from magpie.definitions.ziggurat_definitions import (
     UserMixin,
     UserPermissionMixin,
     UserResourcePermissionMixin,
-    UserService,
     BaseService,
 )
 from magpie.permissions import Permission
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from magpie.definitions.typedefs import Str  # noqa: F401
+    from magpie.acl_cache import PrincipalUser  # noqa: F401
+    from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
+    from magpie.definitions.typedefs import Dict, Iterable, List, Optional, Str, Tuple, Union  # noqa: F401
 
 Base = declarative_base()
 
@@ -97,8 +101,8 @@ class ExternalIdentity(ExternalIdentityMixin, Base):
 class RootFactory(object):
     def __init__(self, request):
         self.__acl__ = []
-        if request.user:
-            permissions = UserService.permissions(request.user, request.db)
+        if request.principal:
+            permissions = find_permissions_for_user(request.principal, request.db)
             self.__acl__.extend(permission_to_pyramid_acls(permissions))
 
 
@@ -293,15 +297,458 @@ for res in [Service, Directory, File, Workspace, Route]:
 def resource_factory(**kwargs):
     resource_type = evaluate_call(lambda: kwargs["resource_type"], httpError=HTTPInternalServerError,
                                   msgOnFail="kwargs do not contain required 'resource_type'",
-                                  content={u"kwargs": repr(kwargs)})
+                                  content=lambda: {u"kwargs": repr(kwargs)})
     return evaluate_call(lambda: RESOURCE_TYPE_DICT[resource_type](**kwargs), httpError=HTTPInternalServerError,
                          msgOnFail="kwargs unpacking failed from specified 'resource_type' and 'RESOURCE_TYPE_DICT'",
-                         content={u"kwargs": repr(kwargs), u"RESOURCE_TYPE_DICT": repr(RESOURCE_TYPE_DICT)})
+                         content=lambda: {u"kwargs": repr(kwargs), u"RESOURCE_TYPE_DICT": repr(RESOURCE_TYPE_DICT)})
+
+
+def get_all_resources(db_session):
+    # type: (Session) -> List[sa.util.KeyedTuple]
+    """
+    Obtains every service and children resource with a single query, ordered by parent and ordering amongst siblings.
+
+    Lightweight read-only rows are returned instead of instances tracked by the session. They provide every attribute
+    of :class:`Resource` as well as the service specific ones (``type``, ``url``, ``sync_type``, ``None`` for children
+    resources), and remain available after the transaction was completed, such as while writing streamed responses.
+    """
+    db_session = get_db_session(db_session)
+    res_table = Resource.__table__
+    svc_table = Service.__table__
+    query = db_session.query(*(list(res_table.columns) + [svc_table.c.type, svc_table.c.url, svc_table.c.sync_type]))
+    query = query.select_from(res_table.outerjoin(svc_table, svc_table.c.resource_id == res_table.c.resource_id))
+    return query.order_by(res_table.c.parent_id, res_table.c.ordering).all()
+
+
+def get_service_type(service_id, db_session):
+    # type: (int, Session) -> Optional[Str]
+    """
+    Obtains the type of the service ``service_id`` without loading its complete instance.
+    """
+    svc_table = Service.__table__
+    query = get_db_session(db_session).query(svc_table.c.type).filter(svc_table.c.resource_id == service_id)
+    return query.scalar()
+
+
+def get_services_info(db_session):
+    # type: (Session) -> List[sa.util.KeyedTuple]
+    """
+    Obtains the ``resource_id``, ``resource_name``, ``type``, ``url``, ``sync_type``, ``owner_user_id`` and
+    ``owner_group_id`` of every service with a single query of lightweight rows instead of loading complete service
+    instances.
+    """
+    res_table = Resource.__table__
+    svc_table = Service.__table__
+    query = get_db_session(db_session).query(res_table.c.resource_id, res_table.c.resource_name,
+                                             svc_table.c.type, svc_table.c.url, svc_table.c.sync_type,
+                                             res_table.c.owner_user_id, res_table.c.owner_group_id)
+    query = query.select_from(svc_table.join(res_table, res_table.c.resource_id == svc_table.c.resource_id))
+    return query.all()
+
+
+def find_children_tree(parent_id, db_session, depth=None, limit=None, cursor=None):
+    # type: (int, Session, Optional[int], Optional[int], Optional[int]) -> sa.orm.Query
+    """
+    Obtains the sub-tree of children resources under ``parent_id`` with a single recursive query, optionally limited
+    in depth and paginated over the direct children of the parent.
+
+    Limits are applied within the recursive query so that resources beyond them are never walked. The query provides
+    the same ``Resource``, ``depth``, ``sorting`` and ``path`` results as
+    :meth:`ResourceTreeServicePostgreSQL.from_parent_deeper` for use with ``build_subtree_strut``.
+
+    :param parent_id: resource (or service) under which to retrieve children resources.
+    :param db_session: connection to db.
+    :param depth: maximum depth of retrieved children resources (1 for direct children only, 0 for none).
+    :param limit: maximum amount of direct children of the parent to retrieve (following their ordering).
+    :param cursor: direct child of the parent after which (by ordering) to start retrieving direct children.
+    :return: query of resources ordered by tree position.
+    """
+    raw_q = """
+        WITH RECURSIVE subtree AS (
+                (SELECT res.*, 1 AS depth, LPAD(CAST(res.ordering AS VARCHAR), 7, '0') AS sorting,
+                        CAST(res.resource_id AS VARCHAR) AS path
+                FROM {tablename} AS res
+                WHERE res.parent_id = :parent_id {cursor_clause} {depth_clause}
+                ORDER BY res.ordering {limit_clause})
+              UNION ALL
+                SELECT res_u.*, st.depth + 1 AS depth,
+                       st.sorting || '/' || LPAD(CAST(res_u.ordering AS VARCHAR), 7, '0') AS sorting,
+                       st.path || '/' || CAST(res_u.resource_id AS VARCHAR) AS path
+                FROM {tablename} res_u, subtree st
+                WHERE res_u.parent_id = st.resource_id {recursive_depth_clause}
+        )
+        SELECT * FROM subtree ORDER BY sorting;
+    """.format(
+        tablename=Resource.__table__.name,
+        cursor_clause="" if cursor is None else (
+            "AND res.ordering > (SELECT cur.ordering FROM {tablename} AS cur "
+            "WHERE cur.resource_id = :cursor AND cur.parent_id = :parent_id)".format(tablename=Resource.__table__.name)
+        ),
+        depth_clause="" if depth is None else "AND :depth > 0",
+        limit_clause="" if limit is None else "LIMIT :limit",
+        recursive_depth_clause="" if depth is None else "AND st.depth < :depth",
+    )
+    db_session = get_db_session(db_session)
+    query = db_session.query(Resource, "depth", "sorting", "path").from_statement(sa.text(raw_q))
+    return query.params(parent_id=parent_id, depth=depth, limit=limit, cursor=cursor)
+
+
+def iter_services_resources_tree(service_types, db_session, depth=None):
+    # type: (List[Str], Session, Optional[int]) -> Iterable[sa.engine.RowProxy]
+    """
+    Generates every service of the given types followed by all its children resources in depth-first order, using a
+    single recursive query.
+
+    Services are ordered by position of their type in ``service_types`` and then by name, and children resources by
+    ordering amongst siblings, so that every resource immediately follows its parent. Rows provide the columns of
+    ``resources`` with the ``depth`` under the service (0 for the service itself), and the ``type`` and ``sync_type``
+    of services (``None`` for children resources).
+
+    Rows are fetched progressively with a server-side cursor of a dedicated connection which remains open until the
+    generator is exhausted or closed. The complete tree can therefore be iterated while writing a streamed response,
+    after the transaction of the request was completed, without being held in memory.
+
+    Children resources deeper than ``depth`` under their service are not retrieved if specified.
+    """
+    raw_q = """
+        WITH RECURSIVE subtree AS (
+                SELECT res.*, CAST(svc.type AS VARCHAR) AS type, CAST(svc.sync_type AS VARCHAR) AS sync_type,
+                       0 AS depth, LPAD(CAST(ROW_NUMBER() OVER (
+                           ORDER BY ARRAY_POSITION(CAST(:types AS VARCHAR[]), CAST(svc.type AS VARCHAR)),
+                                    res.resource_name
+                       ) AS VARCHAR), 7, '0') AS sorting
+                FROM {tablename} AS res
+                JOIN {svc_tablename} AS svc ON svc.resource_id = res.resource_id
+                WHERE svc.type = ANY(CAST(:types AS VARCHAR[]))
+              UNION ALL
+                SELECT res_u.*, CAST(NULL AS VARCHAR), CAST(NULL AS VARCHAR),
+                       st.depth + 1, st.sorting || '/' || LPAD(CAST(res_u.ordering AS VARCHAR), 7, '0')
+                FROM {tablename} res_u, subtree st
+                WHERE res_u.parent_id = st.resource_id {depth_clause}
+        )
+        SELECT * FROM subtree ORDER BY sorting;
+    """.format(tablename=Resource.__table__.name, svc_tablename=Service.__table__.name,
+               depth_clause="" if depth is None else "AND st.depth < :depth")
+    connection = get_db_session(db_session).get_bind().connect()
+    try:
+        streamed = connection.execution_options(stream_results=True)
+        result = streamed.execute(sa.text(raw_q), types=list(service_types), depth=depth)
+        for row in result:
+            yield row
+    finally:
+        connection.close()
 
 
 def find_children_by_name(child_name, parent_id, db_session):
-    tree_struct = resource_tree_service.from_parent_deeper(parent_id=parent_id, limit_depth=1, db_session=db_session)
-    tree_level_entries = [node for node in tree_struct]
-    tree_level_filtered = [node.Resource for node in tree_level_entries if
-                           node.Resource.resource_name.lower() == child_name.lower()]
-    return tree_level_filtered.pop() if len(tree_level_filtered) else None
+    # type: (Str, int, Session) -> Optional[Resource]
+    """
+    Finds the direct child resource matching ``child_name`` (case-insensitive) under the resource ``parent_id``.
+    """
+    children = find_children_by_path([child_name], parent_id, db_session=db_session)
+    return children[0] if children else None
+
+
+def find_children_by_path(children_names, parent_id, db_session):
+    # type: (List[Str], int, Session) -> List[Resource]
+    """
+    Resolves the chain of nested resources matching the successive ``children_names`` (case-insensitive) under the
+    resource ``parent_id`` with a single recursive query.
+
+    Resolution stops at the first name that cannot be matched, so the returned list can be shorter than
+    ``children_names`` (empty if even the first child could not be found). When multiple children match a name only
+    by case, the last one in tree ordering is employed, as for :func:`find_children_by_name`.
+
+    :param children_names: successive resource names forming the path to resolve under the parent resource.
+    :param parent_id: resource from which to start resolving the path (typically the service's resource id).
+    :param db_session: connection to db.
+    :return: ordered resources matched from the direct child of ``parent_id`` down to the deepest resolved name.
+    """
+    children_names = [name.lower() for name in children_names]
+    if not children_names:
+        return []
+    raw_q = """
+        WITH RECURSIVE subtree AS (
+                SELECT res.*, 1 AS depth
+                FROM {tablename} AS res
+                WHERE res.parent_id = :parent_id
+                AND LOWER(res.resource_name) = (CAST(:names AS VARCHAR[]))[1]
+              UNION ALL
+                SELECT res_u.*, st.depth + 1 AS depth
+                FROM {tablename} res_u, subtree st
+                WHERE res_u.parent_id = st.resource_id
+                AND st.depth < :depth
+                AND LOWER(res_u.resource_name) = (CAST(:names AS VARCHAR[]))[st.depth + 1]
+        )
+        SELECT * FROM subtree ORDER BY depth, ordering;
+    """.format(tablename=Resource.__table__.name)
+    db_session = get_db_session(db_session)
+    query = db_session.query(Resource).from_statement(sa.text(raw_q))
+    query = query.params(parent_id=parent_id, names=children_names, depth=len(children_names))
+
+    # retain the last match amongst siblings to follow a single chain in case of names that only differ by case
+    children_by_parent_id = dict()
+    for resource in query:
+        children_by_parent_id[resource.parent_id] = resource
+    resources = []
+    child = children_by_parent_id.get(parent_id)
+    while child is not None:
+        resources.append(child)
+        child = children_by_parent_id.get(child.resource_id)
+    return resources
+
+
+def find_names(name_column, db_session, prefix=None, limit=None, after=None):
+    # type: (sa.Column, Session, Optional[Str], Optional[int], Optional[Str]) -> List[Str]
+    """
+    Lists the names of a ``name_column`` (e.g.: ``User.user_name``) ordered case-insensitively, selecting only the
+    names instead of complete instances.
+
+    Filters and ordering are applied on ``LOWER(name)`` to employ the corresponding lower-case indexes, with the name
+    itself as tie breaker to obtain a stable ordering of names that only differ by case.
+
+    :param name_column: column of names to list.
+    :param db_session: connection to db.
+    :param prefix: only list names starting with this value (case-insensitive).
+    :param limit: maximum amount of listed names.
+    :param after: only list names following this one, typically the last name of the previous page (keyset).
+    :return: ordered names.
+    """
+    lower_name = sa.func.lower(name_column)
+    query = get_db_session(db_session).query(name_column)
+    if prefix:
+        pattern = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.filter(lower_name.like(pattern, escape="\\"))
+    if after is not None:
+        query = query.filter(sa.tuple_(lower_name, name_column) > sa.tuple_(sa.func.lower(after), after))
+    query = query.order_by(lower_name, name_column)
+    if limit is not None:
+        query = query.limit(limit)
+    return [name for name, in query]
+
+
+def find_user_names(db_session, prefix=None, limit=None, after=None):
+    # type: (Session, Optional[Str], Optional[int], Optional[Str]) -> List[Str]
+    """
+    Lists user names ordered case-insensitively, see :func:`find_names`.
+    """
+    return find_names(User.user_name, db_session, prefix=prefix, limit=limit, after=after)
+
+
+def find_group_names(db_session, prefix=None, limit=None, after=None):
+    # type: (Session, Optional[Str], Optional[int], Optional[Str]) -> List[Str]
+    """
+    Lists group names ordered case-insensitively, see :func:`find_names`.
+    """
+    return find_names(Group.group_name, db_session, prefix=prefix, limit=limit, after=after)
+
+
+def find_groups_member_count(db_session, group_names=None):
+    # type: (Session, Optional[Iterable[Str]]) -> Dict[Str, int]
+    """
+    Counts the users member of every group, or only of the groups in ``group_names``, with a single grouped aggregate
+    query instead of :meth:`Group.get_member_count` for each group.
+
+    :return: number of members by group name, including groups without any member.
+    """
+    query = get_db_session(db_session).query(Group.group_name, sa.func.count(UserGroup.user_id))
+    query = query.outerjoin(UserGroup, UserGroup.group_id == Group.id)
+    if group_names is not None:
+        group_names = list(group_names)
+        if not group_names:
+            return {}
+        query = query.filter(Group.group_name.in_(group_names))
+    return dict(query.group_by(Group.id, Group.group_name))
+
+
+def user_name_exists(user_name, db_session):
+    # type: (Str, Session) -> bool
+    """
+    Verifies if a user with exactly ``user_name`` exists without loading it.
+    """
+    query = get_db_session(db_session).query(sa.exists().where(User.user_name == user_name))
+    return bool(query.scalar())
+
+
+def _user_resources_permissions_query(user, groups, resource_ids, db_session):
+    # type: (User, Iterable[int], Optional[Union[Iterable[int], sa.sql.Selectable]], Session) -> sa.sql.Selectable
+    """
+    Union of the permissions applied directly to the user or to any of the groups on the resources (all if ``None``).
+
+    Rows provide ``resource_id``, ``owner_id`` (user or group id), ``perm_name`` and ``type`` (``user`` or ``group``).
+    """
+    query = db_session.query(
+        GroupResourcePermission.resource_id.label("resource_id"),
+        GroupResourcePermission.group_id.label("owner_id"),
+        GroupResourcePermission.perm_name.label("perm_name"),
+        sa.literal("group").label("type"),
+    ).filter(
+        GroupResourcePermission.group_id.in_(list(groups)),
+    )
+    query_user = db_session.query(
+        UserResourcePermission.resource_id.label("resource_id"),
+        UserResourcePermission.user_id.label("owner_id"),
+        UserResourcePermission.perm_name.label("perm_name"),
+        sa.literal("user").label("type"),
+    ).filter(
+        UserResourcePermission.user_id == user.id,
+    )
+    if resource_ids is not None:
+        query = query.filter(GroupResourcePermission.resource_id.in_(resource_ids))
+        query_user = query_user.filter(UserResourcePermission.resource_id.in_(resource_ids))
+    return query.union(query_user)
+
+
+def _user_resource_owner_permissions(resource, user, groups):
+    # type: (Resource, User, Dict[int, Group]) -> List[PermissionTuple]
+    """
+    All permissions granted if the user or one of its groups is the owner of the resource.
+    """
+    permissions = []
+    if resource.owner_user_id == user.id:
+        permissions.append(PermissionTuple(user, ALL_PERMISSIONS, "user", None, resource, True, True))
+    if resource.owner_group_id in groups:
+        permissions.append(
+            PermissionTuple(user, ALL_PERMISSIONS, "group", groups[resource.owner_group_id], resource, True, True))
+    return permissions
+
+
+def find_permissions_for_user(user, db_session):
+    # type: (Union[User, PrincipalUser], Session) -> List[PermissionTuple]
+    """
+    Obtains all non-resource permissions that the user has from both its groups and directly applied ones.
+
+    Equivalent to :meth:`UserService.permissions`, but also applicable to a user and its groups resolved as a
+    :class:`magpie.acl_cache.PrincipalUser` since group memberships are taken from ``user.groups`` instead of queried.
+    """
+    db_session = get_db_session(db_session)
+    groups = dict((grp.id, grp) for grp in user.groups)
+    query = db_session.query(UserPermission.user_id.label("owner_id"),
+                             UserPermission.perm_name.label("perm_name"),
+                             sa.literal("user").label("type")) \
+        .filter(UserPermission.user_id == user.id)
+    if groups:
+        query_group = db_session.query(GroupPermission.group_id.label("owner_id"),
+                                       GroupPermission.perm_name.label("perm_name"),
+                                       sa.literal("group").label("type")) \
+            .filter(GroupPermission.group_id.in_(list(groups)))
+        query = query.union(query_group)
+    return [PermissionTuple(user, row.perm_name, row.type, groups.get(row.owner_id) if row.type == "group" else None,
+                            None, False, True) for row in query]
+
+
+def find_resources_permissions_for_user(resources, user, db_session):
+    # type: (Iterable[Resource], User, Session) -> Dict[int, List[PermissionTuple]]
+    """
+    Obtains all permissions that the user has on each of the specified resources, from both its groups and directly
+    applied ones, using a single query for all of them.
+
+    Equivalent to calling :meth:`ResourceService.perms_for_user` for every resource, without the per-resource query.
+
+    :param resources: resources for which to retrieve permissions (typically a chain from a service to its child).
+    :param user: user for which to retrieve permissions.
+    :param db_session: connection to db.
+    :return: permissions of the user, mapped by resource id, in the same order as returned by `ziggurat`.
+    """
+    resources = dict((res.resource_id, res) for res in resources if res is not None)
+    if not resources:
+        return dict()
+    db_session = get_db_session(db_session)
+    groups = dict((grp.id, grp) for grp in user.groups)
+    query = _user_resources_permissions_query(user, groups, list(resources), db_session)
+    permissions = dict((res_id, []) for res_id in resources)
+    for row in query:
+        group = groups.get(row.owner_id) if row.type == "group" else None
+        permissions[row.resource_id].append(
+            PermissionTuple(user, row.perm_name, row.type, group, resources[row.resource_id], False, True))
+    for res_id, res in resources.items():
+        permissions[res_id].extend(_user_resource_owner_permissions(res, user, groups))
+    return permissions
+
+
+def find_all_resources_permissions_for_user(user, db_session, inherit_groups_permissions=True):
+    # type: (User, Session, bool) -> Dict[int, List[Str]]
+    """
+    Obtains the names of permissions that the user has on every resource, using a single query.
+
+    Ownership of resources is not considered, only explicitly applied permissions are returned.
+
+    :param user: user for which to retrieve permissions.
+    :param db_session: connection to db.
+    :param inherit_groups_permissions: include permissions applied to groups of the user.
+    :return: sorted names of unique permissions of the user, mapped by resource id (only resources with permissions).
+    """
+    db_session = get_db_session(db_session)
+    groups = [grp.id for grp in user.groups] if inherit_groups_permissions else []
+    permissions = dict()
+    for row in _user_resources_permissions_query(user, groups, None, db_session):
+        permissions.setdefault(row.resource_id, set()).add(row.perm_name)
+    return dict((res_id, sorted(perms)) for res_id, perms in permissions.items())
+
+
+def find_all_resources_permissions_for_group(group, db_session):
+    # type: (Group, Session) -> Dict[int, List[Str]]
+    """
+    Obtains the names of permissions that the group has on every resource, using a single query.
+
+    Ownership of resources is not considered, only explicitly applied permissions are returned.
+
+    :param group: group for which to retrieve permissions.
+    :param db_session: connection to db.
+    :return: sorted names of permissions of the group, mapped by resource id (only resources with permissions).
+    """
+    db_session = get_db_session(db_session)
+    query = db_session.query(
+        GroupResourcePermission.resource_id,
+        GroupResourcePermission.perm_name,
+    ).filter(GroupResourcePermission.group_id == group.id)
+    permissions = dict()
+    for res_id, perm_name in query:
+        permissions.setdefault(res_id, []).append(perm_name)
+    return dict((res_id, sorted(perms)) for res_id, perms in permissions.items())
+
+
+def find_resource_ancestors_permissions_for_user(resource_id, user, db_session):
+    # type: (int, User, Session) -> List[Tuple[Resource, List[PermissionTuple]]]
+    """
+    Obtains the resource and all its parents up to the root service, each with all permissions that the user has on
+    them from both its groups and directly applied ones, using a single recursive query.
+
+    Equivalent to rewinding the tree with :meth:`ResourceService.by_resource_id` and calling
+    :meth:`ResourceService.perms_for_user` on every resource along the way, without the per-resource queries.
+
+    :param resource_id: resource from which to rewind the tree.
+    :param user: user for which to retrieve permissions.
+    :param db_session: connection to db.
+    :return:
+        pairs of resource (only with ``resource_id``, ``parent_id``, ``resource_name``, ``resource_type``,
+        ``owner_user_id`` and ``owner_group_id`` attributes) and permissions of the user on it, ordered from the
+        requested resource up to the root service (empty if the resource doesn't exist).
+    """
+    db_session = get_db_session(db_session)
+    groups = dict((grp.id, grp) for grp in user.groups)
+    res = Resource.__table__
+    res_cols = ["resource_id", "parent_id", "resource_name", "resource_type", "owner_user_id", "owner_group_id"]
+    ancestors = sa.select([res.c[col] for col in res_cols] + [sa.literal(0).label("depth")]) \
+        .where(res.c.resource_id == resource_id) \
+        .cte("ancestors", recursive=True)
+    res_up = res.alias()
+    ancestors = ancestors.union_all(
+        sa.select([res_up.c[col] for col in res_cols] + [(ancestors.c.depth + 1).label("depth")])
+        .where(res_up.c.resource_id == ancestors.c.parent_id)
+    )
+    perms = _user_resources_permissions_query(user, groups, sa.select([ancestors.c.resource_id]), db_session)
+    perms = perms.subquery()
+    query = db_session.query(
+        *([ancestors.c[col] for col in res_cols + ["depth"]] + [perms.c.owner_id, perms.c.perm_name, perms.c.type])
+    ).outerjoin(perms, perms.c.resource_id == ancestors.c.resource_id).order_by(ancestors.c.depth)
+
+    resources = []
+    for row in query:
+        if not resources or resources[-1][0].resource_id != row.resource_id:
+            resources.append((row, []))
+        if row.perm_name is not None:
+            group = groups.get(row.owner_id) if row.type == "group" else None
+            resources[-1][1].append(PermissionTuple(user, row.perm_name, row.type, group, resources[-1][0], False, True))
+    for resource, permissions in resources:
+        permissions.extend(_user_resource_owner_permissions(resource, user, groups))
+    return resources
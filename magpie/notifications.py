@@ -0,0 +1,117 @@
+"""
+Notifications between all processes employing the same database (`Magpie` workers and `Twitcher` adapter).
+
+Uses PostgreSQL ``LISTEN/NOTIFY``: notifications emitted within a transaction are only delivered to listeners once it
+is committed, and are discarded if it is rolled back. A single listener thread with a dedicated connection is started
+per process on first need, and dispatches received notifications to handlers subscribed to the channel.
+"""
+from magpie.definitions.sqlalchemy_definitions import sa, PGDialect
+from magpie.utils import get_logger
+from typing import TYPE_CHECKING
+import threading
+import select
+import time
+import os
+if TYPE_CHECKING:
+    from magpie.definitions.sqlalchemy_definitions import Engine, Session  # noqa: F401
+    from magpie.definitions.typedefs import Callable, Dict, List, Optional, Str  # noqa: F401
+LOGGER = get_logger(__name__)
+
+NOTIFICATION_HANDLERS = dict()  # type: Dict[Str, List[Callable[[Optional[Str]], None]]]
+NOTIFICATION_ENGINE = None      # type: Optional[Engine]
+_LISTENER_LOCK = threading.Lock()
+_LISTENER_PID = None            # type: Optional[int]
+
+
+def subscribe(channel, handler):
+    # type: (Str, Callable[[Optional[Str]], None]) -> None
+    """
+    Registers a handler called with the payload of every notification received on the channel.
+
+    The handler is also called with ``None`` whenever notifications could have been missed (listener connection
+    (re)established), in which case it should discard any state that depends on them.
+    Subscriptions must be done on module import, before the listener is started.
+    """
+    NOTIFICATION_HANDLERS.setdefault(channel, []).append(handler)
+
+
+def set_notification_engine(engine):
+    # type: (Engine) -> None
+    """
+    Defines the database engine used to listen for notifications.
+    """
+    global NOTIFICATION_ENGINE
+    NOTIFICATION_ENGINE = engine
+
+
+def notify(db_session, channel, payload=""):
+    # type: (Session, Str, Str) -> None
+    """
+    Emits a notification on the channel, delivered once the current transaction of the session is committed.
+    """
+    connection = db_session.connection()
+    if isinstance(connection.dialect, PGDialect):
+        connection.execute(sa.text("SELECT pg_notify(:channel, :payload);"), channel=channel, payload=payload)
+
+
+def start_listener():
+    # type: () -> None
+    """
+    Starts the notification listener thread once per process (workers can be forked after application loading).
+    """
+    global _LISTENER_PID
+    if NOTIFICATION_ENGINE is None or not isinstance(NOTIFICATION_ENGINE.dialect, PGDialect):
+        return
+    with _LISTENER_LOCK:
+        if _LISTENER_PID == os.getpid():
+            return
+        _LISTENER_PID = os.getpid()
+    listener = threading.Thread(target=_listen, args=(NOTIFICATION_ENGINE, ), name="MagpieNotificationListener")
+    listener.daemon = True
+    listener.start()
+
+
+def _dispatch(channel, payload):
+    # type: (Str, Optional[Str]) -> None
+    for handler in NOTIFICATION_HANDLERS.get(channel, []):
+        # noinspection PyBroadException
+        try:
+            handler(payload)
+        except Exception as exc:
+            LOGGER.warning("Notification handler on channel '%s' failed [%r].", channel, exc)
+
+
+def _listen(engine):
+    # type: (Engine) -> None
+    while True:
+        connection = None
+        try:
+            connection = engine.raw_connection()
+            connection.detach()  # dedicated connection, don't hold on to one of the pool
+            dbapi_connection = connection.connection
+            dbapi_connection.rollback()  # end transaction left by pool pre-ping before switching to autocommit
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            for channel in NOTIFICATION_HANDLERS:
+                cursor.execute("LISTEN {};".format(channel))
+            # notifications could have been missed while the listener was not connected
+            for channel in NOTIFICATION_HANDLERS:
+                _dispatch(channel, None)
+            while True:
+                if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    _dispatch(notification.channel, notification.payload)
+        except Exception as exc:
+            LOGGER.warning("Notification listener failed [%r], retrying...", exc)
+            for channel in NOTIFICATION_HANDLERS:
+                _dispatch(channel, None)
+            if connection is not None:
+                # noinspection PyBroadException
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            time.sleep(5)
@@ -1,9 +1,12 @@
 from magpie.utils import ExtendedEnumMeta
 from six import with_metaclass
+import six
 from enum import Enum
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from magpie.definitions.typedefs import Iterable, List, Optional, Str, AnyPermissionType  # noqa: F401
+    from magpie.definitions.typedefs import (  # noqa: F401
+        Dict, Iterable, Iterator, List, Optional, Str, Tuple, Union, AnyPermissionType
+    )
 
 
 class Permission(with_metaclass(ExtendedEnumMeta, Enum)):
@@ -26,6 +29,125 @@ class Permission(with_metaclass(ExtendedEnumMeta, Enum)):
     LOCK_FEATURE = u"lockfeature"
     TRANSACTION = u"transaction"
 
+    @property
+    def bit(self):
+        # type: () -> int
+        """
+        Bit representing the permission in :class:`PermissionSet` masks.
+
+        Bits are attributed in order of definition of the permissions, new permissions must be appended to keep them
+        stable.
+        """
+        return PERMISSION_BITS[self]
+
+
+PERMISSION_BITS = dict((perm, 1 << index) for index, perm in enumerate(Permission))  # type: Dict[Permission, int]
+_PERMISSION_VALUE_BITS = dict((perm.value, bit) for perm, bit in PERMISSION_BITS.items())
+_PERMISSIONS_CANONICAL = [(PERMISSION_BITS[perm], perm) for perm in sorted(Permission, key=lambda p: p.value)]
+_PERMISSION_SET_VALUES = dict()  # type: Dict[int, Tuple[Str, ...]]
+
+
+class PermissionSet(object):
+    """
+    Immutable set of :class:`Permission` represented by a bitmask.
+
+    Any permission representation supported by :func:`convert_permission` is accepted, while those that cannot be
+    converted are ignored. Iteration yields permissions in canonical order (sorted by value), which is also the order
+    of :meth:`values` employed for formatting responses.
+    """
+    __slots__ = ["_mask"]
+
+    def __init__(self, permissions=None):
+        # type: (Optional[Union[PermissionSet, Iterable[AnyPermissionType]]]) -> None
+        if isinstance(permissions, PermissionSet):
+            mask = permissions.mask
+        else:
+            mask = 0
+            for perm in permissions or []:
+                if isinstance(perm, Permission):
+                    mask |= PERMISSION_BITS[perm]
+                    continue
+                perm_name = getattr(perm, "perm_name", None) or perm
+                bit = _PERMISSION_VALUE_BITS.get(perm_name) if isinstance(perm_name, six.string_types) else None
+                if bit is None:
+                    perm = convert_permission(perm)
+                    bit = PERMISSION_BITS[perm] if perm is not None else 0
+                mask |= bit
+        self._mask = mask
+
+    @classmethod
+    def from_mask(cls, mask):
+        # type: (int) -> PermissionSet
+        perm_set = cls()
+        perm_set._mask = mask
+        return perm_set
+
+    @property
+    def mask(self):
+        # type: () -> int
+        return self._mask
+
+    def values(self):
+        # type: () -> List[Str]
+        """
+        Values of the permissions in canonical order.
+        """
+        values = _PERMISSION_SET_VALUES.get(self._mask)
+        if values is None:
+            values = _PERMISSION_SET_VALUES[self._mask] = tuple(perm.value for perm in self)
+        return list(values)
+
+    def __contains__(self, permission):
+        # type: (AnyPermissionType) -> bool
+        permission = convert_permission(permission)
+        return permission is not None and bool(self._mask & PERMISSION_BITS[permission])
+
+    def __iter__(self):
+        # type: () -> Iterator[Permission]
+        for bit, perm in _PERMISSIONS_CANONICAL:
+            if self._mask & bit:
+                yield perm
+
+    def __getitem__(self, index):
+        # type: (int) -> Permission
+        return list(self)[index]
+
+    def __len__(self):
+        return bin(self._mask).count("1")
+
+    def __bool__(self):
+        return self._mask != 0
+
+    __nonzero__ = __bool__  # python 2
+
+    def __or__(self, other):
+        # type: (Union[PermissionSet, Iterable[AnyPermissionType]]) -> PermissionSet
+        return PermissionSet.from_mask(self._mask | PermissionSet(other).mask)
+
+    def __and__(self, other):
+        # type: (Union[PermissionSet, Iterable[AnyPermissionType]]) -> PermissionSet
+        return PermissionSet.from_mask(self._mask & PermissionSet(other).mask)
+
+    def __sub__(self, other):
+        # type: (Union[PermissionSet, Iterable[AnyPermissionType]]) -> PermissionSet
+        return PermissionSet.from_mask(self._mask & ~PermissionSet(other).mask)
+
+    def __eq__(self, other):
+        if not isinstance(other, PermissionSet):
+            return NotImplemented
+        return self._mask == other.mask
+
+    def __ne__(self, other):
+        if not isinstance(other, PermissionSet):
+            return NotImplemented
+        return self._mask != other.mask
+
+    def __hash__(self):
+        return hash(self._mask)
+
+    def __repr__(self):
+        return "PermissionSet({!r})".format(self.values())
+
 
 def convert_permission(permission):
     # type: (AnyPermissionType) -> Optional[Permission]
@@ -34,21 +156,16 @@ def convert_permission(permission):
 
     If the permission cannot be matched to one of the enum's value, ``None`` is returned instead.
     """
-    if permission in Permission:
+    if isinstance(permission, Permission):
         return permission
     return Permission.get(getattr(permission, "perm_name", None) or permission)
 
 
 def format_permissions(permissions):
-    # type: (Iterable[AnyPermissionType]) -> List[Str]
+    # type: (Union[PermissionSet, Iterable[AnyPermissionType]]) -> List[Str]
     """
     Obtains the formatted permission representation after validation that it is a member of ``Permission`` enum.
 
     The returned list is sorted alphabetically and cleaned of any duplicate entries.
     """
-    perms = []
-    for p in permissions:
-        p_enum = convert_permission(p)
-        if p_enum:
-            perms.append(p_enum)
-    return list(sorted(set([p.value for p in perms])))  # remove any duplicates entries
+    return PermissionSet(permissions).values()
@@ -0,0 +1,203 @@
+"""
+Optional process-wide in-memory index of the complete resource tree.
+
+When enabled with ``MAGPIE_RESOURCE_TREE_INDEX`` (or ``magpie.resource_tree_index`` setting), the ``resources`` table
+is loaded once per worker process and path lookups employed by :mod:`magpie.services` to resolve the requested
+resource become pure dictionary walks.
+
+The index is invalidated whenever a transaction that modified any resource is committed. Modifications are detected
+by the database session events and broadcast with PostgreSQL ``NOTIFY`` so that every other worker (including the
+`Twitcher` adapter) listening on the channel drops its index as well. The index is then reloaded on next lookup.
+"""
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import ALLOW, ALL_PERMISSIONS, asbool
+from magpie.definitions.sqlalchemy_definitions import sa, Session
+from magpie.notifications import notify, start_listener, subscribe
+from magpie.utils import get_logger
+from magpie import models
+from typing import TYPE_CHECKING
+import itertools
+import threading
+if TYPE_CHECKING:
+    from magpie.definitions.typedefs import (  # noqa: F401
+        AccessControlListType, AnySettingsContainer, Dict, List, Optional, Str, Tuple
+    )
+LOGGER = get_logger(__name__)
+
+RESOURCE_TREE_NOTIFY_CHANNEL = "magpie_resource_tree"
+RESOURCE_TREE_CHANGED_KEY = "magpie.resource_tree_changed"
+
+
+class ResourceNode(object):
+    """
+    Lightweight read-only representation of a resource held by the :class:`ResourceTreeIndex`.
+
+    Provides the same attributes and ACL as :class:`magpie.models.Resource` required to compute service ACL.
+    """
+    __slots__ = ["resource_id", "parent_id", "root_service_id", "resource_name", "resource_type",
+                 "ordering", "owner_user_id", "owner_group_id"]
+
+    def __init__(self, resource_id, parent_id, root_service_id, resource_name, resource_type,
+                 ordering, owner_user_id, owner_group_id):
+        self.resource_id = resource_id
+        self.parent_id = parent_id
+        self.root_service_id = root_service_id
+        self.resource_name = resource_name
+        self.resource_type = resource_type
+        self.ordering = ordering
+        self.owner_user_id = owner_user_id
+        self.owner_group_id = owner_group_id
+
+    @property
+    def __acl__(self):
+        # type: () -> AccessControlListType
+        acl = []
+        if self.owner_user_id:
+            acl.extend([(ALLOW, self.owner_user_id, ALL_PERMISSIONS,), ])
+        if self.owner_group_id:
+            acl.extend([(ALLOW, "group:%s" % self.owner_group_id, ALL_PERMISSIONS,), ])
+        return acl
+
+    def __repr__(self):
+        return "<ResourceNode: {}, {}, id: {}>".format(self.resource_type, self.resource_name, self.resource_id)
+
+
+class ResourceTreeIndex(object):
+    """
+    In-memory index of resources by id and of children by lower-cased name under their parent.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._tree = None           # type: Optional[Tuple[Dict[int, ResourceNode], Dict[int, Dict[Str, ResourceNode]]]]
+
+    def invalidate(self):
+        # type: () -> None
+        """
+        Drops the loaded tree so that it gets reloaded on next lookup.
+        """
+        with self._lock:
+            self.generation += 1
+            self._tree = None
+
+    def _load(self, db_session):
+        # type: (Session) -> Tuple[Dict[int, ResourceNode], Dict[int, Dict[Str, ResourceNode]]]
+        tree = self._tree
+        if tree is not None:
+            return tree
+        start_listener()
+        generation = self.generation
+        query = db_session.query(
+            models.Resource.resource_id,
+            models.Resource.parent_id,
+            models.Resource.root_service_id,
+            models.Resource.resource_name,
+            models.Resource.resource_type,
+            models.Resource.ordering,
+            models.Resource.owner_user_id,
+            models.Resource.owner_group_id,
+        ).order_by(models.Resource.parent_id, models.Resource.ordering)
+        nodes = dict()
+        children = dict()
+        for row in query:
+            node = ResourceNode(*row)
+            nodes[node.resource_id] = node
+            # retain the last match amongst siblings in case of names that only differ by case
+            children.setdefault(node.parent_id, dict())[node.resource_name.lower()] = node
+        tree = (nodes, children)
+        with self._lock:
+            # do not keep the tree if a modification was notified while it was loading
+            if generation == self.generation:
+                self._tree = tree
+        LOGGER.debug("Loaded resource tree index with %s resources.", len(nodes))
+        return tree
+
+    def get_resource(self, resource_id, db_session):
+        # type: (int, Session) -> Optional[ResourceNode]
+        """
+        Obtains the indexed resource by id.
+        """
+        nodes, _ = self._load(db_session)
+        return nodes.get(resource_id)
+
+    def find_children_by_path(self, children_names, parent_id, db_session):
+        # type: (List[Str], int, Session) -> List[ResourceNode]
+        """
+        Resolves the chain of nested resources matching the successive ``children_names`` (case-insensitive) under the
+        resource ``parent_id``, with the same results as :func:`magpie.models.find_children_by_path`.
+        """
+        _, children = self._load(db_session)
+        resources = []
+        for child_name in children_names:
+            child = children.get(parent_id, {}).get(child_name.lower())
+            if child is None:
+                break
+            resources.append(child)
+            parent_id = child.resource_id
+        return resources
+
+
+RESOURCE_TREE_INDEX = ResourceTreeIndex()
+
+
+def get_resource_tree_index():
+    # type: () -> Optional[ResourceTreeIndex]
+    """
+    Obtains the resource tree index of the process if it was enabled, ``None`` otherwise.
+    """
+    return RESOURCE_TREE_INDEX if RESOURCE_TREE_INDEX.enabled else None
+
+
+def mark_resource_tree_changed(db_session):
+    # type: (Session) -> None
+    """
+    Flags a modification of the resource tree in the current transaction of the session.
+
+    Indexes of every process are invalidated once the transaction gets committed. Changes applied through the ORM are
+    detected automatically, but this must be called explicitly when resources are modified with raw SQL statements.
+    """
+    if db_session.info.get(RESOURCE_TREE_CHANGED_KEY):
+        return
+    db_session.info[RESOURCE_TREE_CHANGED_KEY] = True
+    notify(db_session, RESOURCE_TREE_NOTIFY_CHANNEL)
+
+
+def _after_flush(db_session, flush_context):
+    for instance in itertools.chain(db_session.new, db_session.dirty, db_session.deleted):
+        if isinstance(instance, models.Resource):
+            mark_resource_tree_changed(db_session)
+            return
+
+
+def _after_commit(db_session):
+    if db_session.info.pop(RESOURCE_TREE_CHANGED_KEY, False):
+        # don't wait for the notification to avoid stale resources on immediately following requests by this worker
+        RESOURCE_TREE_INDEX.invalidate()
+
+
+def _after_rollback(db_session):
+    db_session.info.pop(RESOURCE_TREE_CHANGED_KEY, None)
+
+
+def _on_notification(payload):
+    RESOURCE_TREE_INDEX.invalidate()
+
+
+subscribe(RESOURCE_TREE_NOTIFY_CHANNEL, _on_notification)
+sa.event.listen(Session, "after_flush", _after_flush)
+sa.event.listen(Session, "after_commit", _after_commit)
+sa.event.listen(Session, "after_rollback", _after_rollback)
+
+
+def setup_resource_tree_index(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables the resource tree index of the process according to settings.
+    """
+    enabled = asbool(get_constant("MAGPIE_RESOURCE_TREE_INDEX", container, "magpie.resource_tree_index",
+                                  default_value=False, raise_missing=False, raise_not_set=False, print_missing=True))
+    RESOURCE_TREE_INDEX.enabled = enabled
+    RESOURCE_TREE_INDEX.invalidate()
+    LOGGER.info("Resource tree index %s.", "enabled" if enabled else "disabled")
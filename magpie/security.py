@@ -1,20 +1,31 @@
+from magpie.acl_cache import get_principal
 from magpie.api.login import esgfopenid, wso2
 from magpie.constants import get_constant
 from magpie.definitions.pyramid_definitions import (
     AuthTktAuthenticationPolicy, ACLAuthorizationPolicy, Configurator, asbool
 )
-from magpie.definitions.ziggurat_definitions import groupfinder
 from magpie.utils import get_logger, get_settings
 from authomatic import Authomatic, provider_id
 from authomatic.providers import oauth2, openid
 from typing import TYPE_CHECKING
 import logging
 if TYPE_CHECKING:
-    from magpie.definitions.typedefs import JSON  # noqa: F401
+    from magpie.definitions.pyramid_definitions import Request  # noqa: F401
+    from magpie.definitions.typedefs import JSON, List, Str  # noqa: F401
 AUTHOMATIC_LOGGER = get_logger('magpie.authomatic', level=logging.DEBUG)
 LOGGER = get_logger('magpie.security')
 
 
+def groupfinder(user_id, request):
+    # type: (int, Request) -> List[Str]
+    """
+    Principals of the groups of the authenticated user, resolved without loading the complete user.
+    """
+    if user_id and request.principal:
+        return ["group:%s" % grp.id for grp in request.principal.groups]
+    return []
+
+
 def get_auth_config(container):
     settings = get_settings(container)
     magpie_secret = get_constant('MAGPIE_SECRET', settings, settings_name='magpie.secret')
@@ -53,6 +64,7 @@ def get_auth_config(container):
         authentication_policy=authn_policy,
         authorization_policy=authz_policy
     )
+    config.add_request_method(get_principal, "principal", reify=True)
     return config
 
 
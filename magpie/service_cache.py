@@ -0,0 +1,122 @@
+"""
+Optional process-wide cache of services by name for the `Twitcher` adapter.
+
+When enabled with ``MAGPIE_SERVICE_CACHE`` (or ``magpie.service_cache`` setting), the identifier, type, URL, sync type
+and owners of every service are loaded with a single query and kept in memory. Resolving the service targeted by a
+proxied request (:class:`magpie.adapter.magpieowssecurity.MagpieOWSSecurity`) and fetching it from the store
+(:class:`magpie.adapter.magpieservice.MagpieServiceStore`) then become dictionary lookups instead of a query each.
+
+Services are reloaded whenever one of them is registered, updated or unregistered, using the same invalidation events
+as the :mod:`magpie.resource_index` since services are resources.
+"""
+from magpie.constants import get_constant
+from magpie.definitions.pyramid_definitions import asbool
+from magpie.notifications import start_listener
+from magpie.resource_index import RESOURCE_TREE_INDEX, ResourceNode
+from magpie.utils import get_logger
+from magpie import models
+from typing import TYPE_CHECKING
+import threading
+if TYPE_CHECKING:
+    from magpie.definitions.sqlalchemy_definitions import Session  # noqa: F401
+    from magpie.definitions.typedefs import AnySettingsContainer, Dict, Optional, Str, Tuple, Union  # noqa: F401
+LOGGER = get_logger(__name__)
+
+
+class ServiceNode(ResourceNode):
+    """
+    Lightweight read-only representation of a service held by the :class:`ServiceCache`.
+
+    Provides the same attributes and ACL as :class:`magpie.models.Service` required to process requests to the service.
+    """
+    __slots__ = ["type", "url", "sync_type"]
+
+    def __init__(self, resource_id, resource_name, service_type, url, sync_type, owner_user_id, owner_group_id):
+        super(ServiceNode, self).__init__(resource_id, None, None, resource_name, models.Service.resource_type_name,
+                                          0, owner_user_id, owner_group_id)
+        self.type = service_type
+        self.url = url
+        self.sync_type = sync_type
+
+    def __repr__(self):
+        return "<ServiceNode: {}, {}, id: {}>".format(self.type, self.resource_name, self.resource_id)
+
+
+class ServiceCache(object):
+    """
+    In-memory mapping of every service by name.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._services = None       # type: Optional[Tuple[int, Dict[Str, ServiceNode]]]
+
+    def clear(self):
+        # type: () -> None
+        """
+        Discards loaded services so that they get reloaded on next lookup.
+        """
+        with self._lock:
+            self._services = None
+
+    def _load(self, db_session):
+        # type: (Session) -> Dict[Str, ServiceNode]
+        start_listener()
+        generation = RESOURCE_TREE_INDEX.generation
+        services = self._services
+        if services is not None and services[0] == generation:
+            return services[1]
+        by_name = dict()
+        for row in models.get_services_info(db_session):
+            by_name[row.resource_name] = ServiceNode(row.resource_id, row.resource_name, row.type, row.url,
+                                                     row.sync_type, row.owner_user_id, row.owner_group_id)
+        with self._lock:
+            # do not keep the services if a modification was notified while they were loading
+            if generation == RESOURCE_TREE_INDEX.generation:
+                self._services = (generation, by_name)
+        LOGGER.debug("Loaded service cache with %s services.", len(by_name))
+        return by_name
+
+    def get_service(self, service_name, db_session):
+        # type: (Str, Session) -> Optional[ServiceNode]
+        """
+        Obtains the cached service by name, loading all services if missing or outdated.
+
+        The session is only employed to load services, no connection is acquired when they are already cached.
+        """
+        return self._load(db_session).get(service_name)
+
+
+SERVICE_CACHE = ServiceCache()
+
+
+def get_service_cache():
+    # type: () -> Optional[ServiceCache]
+    """
+    Obtains the service cache of the process if it was enabled, ``None`` otherwise.
+    """
+    return SERVICE_CACHE if SERVICE_CACHE.enabled else None
+
+
+def find_service_by_name(service_name, db_session):
+    # type: (Str, Session) -> Optional[Union[models.Service, ServiceNode]]
+    """
+    Obtains the service by name from the cache if it was enabled, or otherwise from the database.
+    """
+    service_cache = get_service_cache()
+    if service_cache is not None:
+        return service_cache.get_service(service_name, db_session)
+    return models.Service.by_service_name(service_name, db_session=db_session)
+
+
+def setup_service_cache(container):
+    # type: (AnySettingsContainer) -> None
+    """
+    Enables the service cache of the process according to settings.
+    """
+    enabled = asbool(get_constant("MAGPIE_SERVICE_CACHE", container, "magpie.service_cache",
+                                  default_value=False, raise_missing=False, raise_not_set=False, print_missing=True))
+    SERVICE_CACHE.enabled = enabled
+    SERVICE_CACHE.clear()
+    LOGGER.info("Service cache %s.", "enabled" if enabled else "disabled")
@@ -1,5 +1,3 @@
-from magpie.constants import get_constant
-from magpie.definitions.ziggurat_definitions import UserService, ResourceService, permission_to_pyramid_acls
 from magpie.definitions.pyramid_definitions import (
     EVERYONE,
     ALLOW,
@@ -8,18 +6,25 @@ from magpie.definitions.pyramid_definitions import (
     HTTPNotImplemented,
     HTTPInternalServerError,
 )
+from magpie.acl_cache import (
+    ANONYMOUS_CACHE, ACLCacheKey, compute_resources_acl, get_acl_cache, get_anonymous_principal
+)
 from magpie.api import exception as ax
+from magpie.decision_engine import get_decision_engine
 from magpie.owsrequest import ows_parser_factory
-from magpie.permissions import Permission
+from magpie.permissions import Permission, PermissionSet
+from magpie.resource_index import get_resource_tree_index
+from magpie.service_cache import ServiceNode
 from magpie import models
-from beaker.cache import cache_region, cache_regions
 from typing import TYPE_CHECKING
 from six import with_metaclass
 if TYPE_CHECKING:
     from magpie.definitions.typedefs import (  # noqa: F401
-        AccessControlListType, Str, List, Dict, Type, ResourcePermissionType
+        AccessControlListType, Str, List, Dict, Iterable, Optional, Type, Union, ServiceOrResourceType
     )
     from magpie.definitions.pyramid_definitions import Request  # noqa: F401
+    from magpie.acl_cache import PrincipalUser  # noqa: F401
+    from magpie.resource_index import ResourceNode  # noqa: F401
 
 
 class ServiceMeta(type):
@@ -45,14 +50,14 @@ class ServiceMeta(type):
         return len(cls.resource_types) > 0
 
     def get_resource_permissions(cls, resource_type_name):
-        # type: (Type[ServiceInterface], Str) -> List[Permission]
+        # type: (Type[ServiceInterface], Str) -> PermissionSet
         """
         Obtains the allowed permissions of the service's child resource fetched by resource type name.
         """
         for res in cls.resource_types_permissions:  # type: models.Resource
             if res.resource_type_name == resource_type_name:
                 return cls.resource_types_permissions[res]
-        return []
+        return PermissionSet()
 
 
 class ServiceInterface(with_metaclass(ServiceMeta)):
@@ -61,9 +66,11 @@ class ServiceInterface(with_metaclass(ServiceMeta)):
     # required request parameters for the service
     params_expected = []                # type: List[Str]
     # global permissions allowed for the service (top-level resource)
-    permissions = []                    # type: List[Permission]
-    # dict of list for each corresponding allowed resource permissions (children resources)
-    resource_types_permissions = {}     # type: Dict[models.Resource, List[Permission]]
+    permissions = PermissionSet()       # type: PermissionSet
+    # dict of permission sets for each corresponding allowed resource permissions (children resources)
+    resource_types_permissions = {}     # type: Dict[models.Resource, PermissionSet]
+    # permissions applied only to the resource they are set on, not inherited by its children resources
+    permissions_not_inherited = PermissionSet()     # type: PermissionSet
 
     def __init__(self, service, request):
         self.service = service
@@ -78,47 +85,111 @@ class ServiceInterface(with_metaclass(ServiceMeta)):
         """
         List of access control rules defining (outcome, user/group, permission) combinations.
         """
-        if 'acl' not in cache_regions:
-            cache_regions['acl'] = {'enabled': False}
-        return self._get_acl_cached(self.service.resource_id, self.request.user)
+        self.acl = []
+        return self.get_acl()
 
-    # noinspection PyUnusedLocal
-    # parameters required to preserve caching of corresponding resource-id/user called
-    @cache_region('acl')
-    def _get_acl_cached(self, service_id, user):
-        """Beaker will cache this method based on the service id and the user.
+    def get_acl(self):
+        # type: () -> AccessControlListType
+        resources = self.find_children_by_path(self.resource_path())
+        self.expand_acl([self.service] + resources, self.request.principal)
+        return self.acl
 
-        If the cache is not hit, call the self.get_acl() method
+    def resource_path(self):
+        # type: () -> List[Str]
         """
-        return self.get_acl()
+        Names of the successively nested child resources under the service targeted by the request.
 
-    def get_acl(self):
+        An empty list targets the service itself.
+        """
         raise NotImplementedError
 
-    def expand_acl(self, resource, user):
-        # type: (models.Resource, models.User) -> None
-        if resource:
-            for ace in resource.__acl__:
-                self.acl.append(ace)
+    def permits(self, permission):
+        # type: (Union[Permission, Str]) -> bool
+        """
+        Decides if the request user (or anonymous when not logged in) is allowed the permission on the targeted resource
+        using the precompiled decision engine, with the same result as the authorization policy applied to the ACL.
+        """
+        return self._permits(self.resource_path(), permission)
+
+    def _permits(self, path, permission, match=False):
+        # type: (List[Str], Union[Permission, Str], bool) -> bool
+        user = self.request.principal or get_anonymous_principal(self.request.db)
+        principals = [user.id] + ["group:%s" % grp.id for grp in user.groups]
+        return get_decision_engine().permits(self.service.resource_id, path, principals, permission,
+                                             db_session=self.request.db, match=match)
+
+    def expand_acl(self, resources, user):
+        # type: (Union[models.Resource, Iterable[models.Resource]], Optional[Union[models.User, PrincipalUser]]) -> List[int]
+        """
+        Appends the access control entries of every resource, in the given order, to the service's ACL.
+
+        Permissions of the user (or anonymous when no user is provided) for all resources are retrieved with a single
+        query, so the whole chain of resources from the service down to the requested child should be provided at once.
 
-            if user:
-                permissions = ResourceService.perms_for_user(resource, user, db_session=self.request.db)
-                for outcome, perm_user, perm_name in permission_to_pyramid_acls(permissions):
-                    self.acl.append((outcome, perm_user, perm_name,))
+        :param resources: resource or ordered chain of resources for which to expand the ACL.
+        :param user: user for which to obtain the permissions, anonymous if ``None``.
+        :returns: index in the ACL at which the entries of each corresponding resource start.
+        """
+        if isinstance(resources, models.Resource):
+            resources = [resources]
+        resources = [res for res in resources if res]
+        if not resources:
+            return []
+
+        acl_cache = get_acl_cache()
+        if not user:
+            # anonymous entries only depend on the resource, memoize them individually when caching is enabled
+            if acl_cache is not None:
+                resources_acl = ANONYMOUS_CACHE.get_resources_acl(resources, db_session=self.request.db)
             else:
-                user = UserService.by_user_name(get_constant("MAGPIE_ANONYMOUS_USER"), db_session=self.request.db)
-                if user is None:
-                    raise Exception("No Anonymous user in the database")
-                else:
-                    permissions = ResourceService.perms_for_user(resource, user, db_session=self.request.db)
-                    for outcome, perm_user, perm_name in permission_to_pyramid_acls(permissions):
-                        self.acl.append((outcome, EVERYONE, perm_name,))
+                anonymous = get_anonymous_principal(self.request.db)
+                resources_acl = compute_resources_acl(resources, anonymous, self.request.db, everyone=True)
+        elif acl_cache is not None:
+            cache_key = ACLCacheKey(user.id, False, self.service.resource_id,
+                                    tuple(res.resource_id for res in resources), self._permission_requested_name())
+            cache_generation = acl_cache.generation
+            resources_acl = acl_cache.get(cache_key)
+            if resources_acl is None:
+                resources_acl = compute_resources_acl(resources, user, self.request.db)
+                acl_cache.set(cache_key, resources_acl, generation=cache_generation)
+        else:
+            resources_acl = compute_resources_acl(resources, user, self.request.db)
+
+        acl_indices = []
+        for resource_acl in resources_acl:
+            acl_indices.append(len(self.acl))
+            self.acl.extend(resource_acl)
+        return acl_indices
+
+    def _permission_requested_name(self):
+        # type: () -> Optional[Str]
+        try:
+            permission = self.permission_requested()
+        except NotImplementedError:
+            return None
+        return permission.value if isinstance(permission, Permission) else permission
+
+    def find_children_by_path(self, children_names):
+        # type: (List[Str]) -> List[Union[models.Resource, ResourceNode]]
+        """
+        Resolves the chain of nested resources matching the successive ``children_names`` under the service.
+
+        Uses the in-memory resource tree index when enabled, or a single database query otherwise.
+        """
+        if not children_names:
+            return []
+        tree_index = get_resource_tree_index()
+        if tree_index is not None:
+            return tree_index.find_children_by_path(children_names, parent_id=self.service.resource_id,
+                                                    db_session=self.request.db)
+        return models.find_children_by_path(children_names, parent_id=self.service.resource_id,
+                                            db_session=self.request.db)
 
     def permission_requested(self):
         # type: () -> Permission
         try:
             req = self.parser.params[u"request"]
-            perm = Permission.get(req)
+            perm = Permission.get(req, case_insensitive=True)
             if perm is None:
                 raise NotImplementedError("Undefined 'Permission' from 'request' parameter: {!s}".format(req))
             return perm
@@ -127,30 +198,69 @@ class ServiceInterface(with_metaclass(ServiceMeta)):
             raise NotImplementedError("Exception: [{!r}] for class '{}'.".format(ex, type(self)))
 
     def effective_permissions(self, resource, user):
-        # type: (models.Resource, models.User) -> List[ResourcePermissionType]
+        # type: (ServiceOrResourceType, models.User) -> PermissionSet
         """
-        Recursively rewind the resource tree from the specified resource up to the topmost parent service resource and
-        retrieve permissions along the way that should be applied to children when using resource inheritance.
+        Rewind the resource tree from the specified resource up to the topmost parent service resource and retrieve
+        permissions along the way that should be applied to children when using resource inheritance.
+
+        The resource, its parents and the user permissions on all of them are obtained with a single query.
         """
-        resource_effective_perms = list()
-        while resource is not None:
-            current_resource_perms = ResourceService.perms_for_user(resource, user, db_session=self.request.db)
-            resource_effective_perms.extend(current_resource_perms)
-            if resource.parent_id:
-                resource = ResourceService.by_resource_id(resource.parent_id, db_session=self.request.db)
-            else:
-                resource = None
-        return resource_effective_perms
+        resources = models.find_resource_ancestors_permissions_for_user(resource.resource_id, user, self.request.db)
+        effective_perms = PermissionSet()
+        for res, res_perms in resources:
+            res_perms = PermissionSet(res_perms)
+            if res.resource_id != resource.resource_id:
+                res_perms -= self.permissions_not_inherited
+            effective_perms |= res_perms
+        return effective_perms
+
+    def effective_permissions_tree(self, resource_ids, resources, user):
+        # type: (Iterable[int], Dict[int, ServiceOrResourceType], models.User) -> Dict[int, PermissionSet]
+        """
+        Resolves the effective permissions of the user on many resources of the service at once.
+
+        Results are the same as :meth:`effective_permissions` of each resource, but permissions of all their ancestors
+        are retrieved with a single query and permissions inherited from a common ancestor are resolved only once.
+
+        :param resource_ids: resources of the service for which to resolve effective permissions.
+        :param resources: resources of the service by id, including at least all parents of requested resources.
+        :param user: user for which to resolve effective permissions.
+        :returns: effective permissions of the user on each requested resource.
+        """
+        resource_ids = [res_id for res_id in resource_ids if res_id in resources]
+        ancestors = dict()
+        for res_id in resource_ids:
+            while res_id in resources and res_id not in ancestors:
+                ancestors[res_id] = resources[res_id]
+                res_id = resources[res_id].parent_id
+        resources_perms = models.find_resources_permissions_for_user(ancestors.values(), user, self.request.db)
+        direct_perms = dict((res_id, PermissionSet(perms)) for res_id, perms in resources_perms.items())
+
+        inherited_perms = dict()  # type: Dict[int, PermissionSet]
+
+        def get_inherited_perms(res_id):
+            # walk up to the closest resolved ancestor, then resolve the chain down from it
+            chain = []
+            while res_id in ancestors and res_id not in inherited_perms:
+                chain.append(res_id)
+                res_id = ancestors[res_id].parent_id
+            perms = inherited_perms.get(res_id, PermissionSet())
+            for chain_id in reversed(chain):
+                perms = inherited_perms[chain_id] = perms | (direct_perms[chain_id] - self.permissions_not_inherited)
+            return perms
+
+        return dict((res_id, direct_perms[res_id] | get_inherited_perms(resources[res_id].parent_id))
+                    for res_id in resource_ids)
 
 
 class ServiceWPS(ServiceInterface):
     service_type = u"wps"
 
-    permissions = [
+    permissions = PermissionSet([
         Permission.GET_CAPABILITIES,
         Permission.DESCRIBE_PROCESS,
         Permission.EXECUTE,
-    ]
+    ])
 
     params_expected = [
         u"service",
@@ -163,19 +273,18 @@ class ServiceWPS(ServiceInterface):
     def __init__(self, service, request):
         super(ServiceWPS, self).__init__(service, request)
 
-    def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
-        return self.acl
+    def resource_path(self):
+        return []
 
 
 class ServiceBaseWMS(ServiceInterface):
-    permissions = [
+    permissions = PermissionSet([
         Permission.GET_CAPABILITIES,
         Permission.GET_MAP,
         Permission.GET_FEATURE_INFO,
         Permission.GET_LEGEND_GRAPHIC,
         Permission.GET_METADATA,
-    ]
+    ])
 
     params_expected = [
         u"service",
@@ -187,48 +296,61 @@ class ServiceBaseWMS(ServiceInterface):
     ]
 
     resource_types_permissions = {
-        models.Workspace: [
+        models.Workspace: PermissionSet([
             Permission.GET_CAPABILITIES,
             Permission.GET_MAP,
             Permission.GET_FEATURE_INFO,
             Permission.GET_LEGEND_GRAPHIC,
             Permission.GET_METADATA,
-        ]
+        ])
     }
 
     def __init__(self, service, request):
         super(ServiceBaseWMS, self).__init__(service, request)
 
-    def get_acl(self):
-        raise NotImplementedError
-
 
 class ServiceNCWMS2(ServiceBaseWMS):
     service_type = u"ncwms"
 
     resource_types_permissions = {
-        models.File: [
+        models.File: PermissionSet([
             Permission.GET_CAPABILITIES,
             Permission.GET_MAP,
             Permission.GET_FEATURE_INFO,
             Permission.GET_LEGEND_GRAPHIC,
             Permission.GET_METADATA,
-        ],
-        models.Directory: [
+        ]),
+        models.Directory: PermissionSet([
             Permission.GET_CAPABILITIES,
             Permission.GET_MAP,
             Permission.GET_FEATURE_INFO,
             Permission.GET_LEGEND_GRAPHIC,
             Permission.GET_METADATA,
-        ]
+        ])
     }
 
+    # requests for other permissions are allowed to everyone
+    permissions_protected = PermissionSet([
+        Permission.GET_CAPABILITIES,
+        Permission.GET_MAP,
+        Permission.GET_METADATA,
+    ])
+
     def __init__(self, service, request):
         super(ServiceNCWMS2, self).__init__(service, request)
 
     def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
+        permission_requested = self.permission_requested()
+        if permission_requested not in self.permissions_protected:
+            return [(ALLOW, EVERYONE, permission_requested.value,)]
+        return super(ServiceNCWMS2, self).get_acl()
+
+    def permits(self, permission):
+        if permission not in self.permissions_protected:
+            return True
+        return super(ServiceNCWMS2, self).permits(permission)
 
+    def resource_path(self):
         # According to the permission, the resource we want to authorize is not formatted the same way
         permission_requested = self.permission_requested()
         netcdf_file = None
@@ -253,25 +375,12 @@ class ServiceNCWMS2(ServiceBaseWMS):
             if netcdf_file:
                 netcdf_file = netcdf_file.rsplit("/", 1)[0]
 
-        else:
-            return [(ALLOW, EVERYONE, permission_requested.value,)]
-
-        if netcdf_file:
-            ax.verify_param("outputs/", paramCompare=netcdf_file, httpError=HTTPNotFound,
-                            msgOnFail="'outputs/' is not in path", notIn=True)
-            netcdf_file = netcdf_file.replace("outputs/", "birdhouse/")
-
-            db_session = self.request.db
-            path_elems = netcdf_file.split("/")
-            new_child = self.service
-            while new_child and path_elems:
-                elem_name = path_elems.pop(0)
-                new_child = models.find_children_by_name(
-                    elem_name, parent_id=new_child.resource_id, db_session=db_session
-                )
-                self.expand_acl(new_child, self.request.user)
-
-        return self.acl
+        if not netcdf_file:
+            return []
+        ax.verify_param("outputs/", paramCompare=netcdf_file, httpError=HTTPNotFound,
+                        msgOnFail="'outputs/' is not in path", notIn=True)
+        netcdf_file = netcdf_file.replace("outputs/", "birdhouse/")
+        return netcdf_file.split("/")
 
 
 class ServiceGeoserverWMS(ServiceBaseWMS):
@@ -280,9 +389,7 @@ class ServiceGeoserverWMS(ServiceBaseWMS):
     def __init__(self, service, request):
         super(ServiceGeoserverWMS, self).__init__(service, request)
 
-    def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
-
+    def resource_path(self):
         # localhost:8087/geoserver/WATERSHED/wms?layers=WATERSHED:BV_1NS&request=getmap
         # localhost:8087/geoserver/wms?layers=WATERERSHED:BV1_NS&request=getmap
         # those two request lead to the same thing so, here we need to check the workspace in the layer
@@ -302,20 +409,13 @@ class ServiceGeoserverWMS(ServiceBaseWMS):
         else:
             layer_name = self.parser.params["layers"]
             workspace_name = layer_name.split(":")[0]
-
-        # load workspace resource from the database
-        workspace = models.find_children_by_name(child_name=workspace_name,
-                                                 parent_id=self.service.resource_id,
-                                                 db_session=self.request.db)
-        if workspace:
-            self.expand_acl(workspace, self.request.user)
-        return self.acl
+        return [workspace_name]
 
 
 class ServiceAccess(ServiceInterface):
     service_type = u"access"
 
-    permissions = [Permission.ACCESS]
+    permissions = PermissionSet([Permission.ACCESS])
 
     params_expected = []
 
@@ -324,9 +424,8 @@ class ServiceAccess(ServiceInterface):
     def __init__(self, service, request):
         super(ServiceAccess, self).__init__(service, request)
 
-    def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
-        return self.acl
+    def resource_path(self):
+        return []
 
     def permission_requested(self):
         return Permission.ACCESS
@@ -335,39 +434,41 @@ class ServiceAccess(ServiceInterface):
 class ServiceAPI(ServiceInterface):
     service_type = u"api"
 
-    permissions = models.Route.permissions
+    permissions = PermissionSet(models.Route.permissions)
 
     params_expected = []
 
     resource_types_permissions = {
-        models.Route: models.Route.permissions
+        models.Route: permissions,
     }
 
+    # 'match' permissions only apply to the specific route they are set on
+    permissions_not_inherited = PermissionSet([
+        Permission.READ_MATCH,
+        Permission.WRITE_MATCH,
+    ])
+
     def __init__(self, service, request):
         super(ServiceAPI, self).__init__(service, request)
 
-    def get_acl(self, sub_api_route=None):
-        self.expand_acl(self.service, self.request.user)
-
-        match_index = 0
+    def resource_path(self, sub_api_route=None):
         route_parts = self.request.path.split("/")
         route_api_base = self.service.resource_name if sub_api_route is None else sub_api_route
-
         if self.service.resource_name in route_parts and route_api_base in route_parts:
             api_idx = route_parts.index(route_api_base)
             # keep only parts after api base route to process it
             if len(route_parts) - 1 > api_idx:
-                route_parts = route_parts[api_idx + 1::]
-                route_child = self.service
-
-                # process read/write inheritance permission access
-                while route_child and route_parts:
-                    part_name = route_parts.pop(0)
-                    route_res_id = route_child.resource_id
-                    route_child = models.find_children_by_name(part_name, parent_id=route_res_id,
-                                                               db_session=self.request.db)
-                    match_index = len(self.acl)
-                    self.expand_acl(route_child, self.request.user)
+                return route_parts[api_idx + 1::]
+        return []
+
+    def get_acl(self, sub_api_route=None):
+        route_parts = self.resource_path(sub_api_route)
+        route_children = self.find_children_by_path(route_parts)
+
+        # process read/write inheritance permission access
+        acl_indices = self.expand_acl([self.service] + route_children, self.request.principal)
+        # 'match' permissions only apply if the full route could be resolved
+        match_index = acl_indices[-1] if len(route_children) == len(route_parts) else len(self.acl)
 
         # process read/write-match specific permission access
         # (convert exact route 'match' to read/write counterparts only if matching last item's permissions)
@@ -378,33 +479,26 @@ class ServiceAPI(ServiceInterface):
                 self.acl[i] = (self.acl[i][0], self.acl[i][1], Permission.WRITE.value)
         return self.acl
 
+    def permits(self, permission):
+        return self._permits(self.resource_path(), permission, match=True)
+
     def permission_requested(self):
         # only read/write are used for 'real' access control, 'match' permissions must be updated accordingly
         if self.request.method.upper() in ["GET", "HEAD"]:
             return Permission.READ
         return Permission.WRITE
 
-    def effective_permissions(self, resource, user):
-        # if 'match' permissions are on the specified 'resource', keep them
-        # otherwise, keep only the non 'match' variations from inherited parent resources permissions
-        resource_effective_perms = super(ServiceAPI, self).effective_permissions(resource, user)
-        return filter(lambda perm:
-                      (perm.perm_name in [Permission.READ.value, Permission.WRITE.value]) or
-                      (perm.perm_name in [Permission.READ_MATCH.value, Permission.WRITE_MATCH.value] and
-                       perm.resource.resource_id == resource.resource_id),
-                      resource_effective_perms)
-
 
 class ServiceWFS(ServiceInterface):
     service_type = u"wfs"
 
-    permissions = [
+    permissions = PermissionSet([
         Permission.GET_CAPABILITIES,
         Permission.DESCRIBE_FEATURE_TYPE,
         Permission.GET_FEATURE,
         Permission.LOCK_FEATURE,
         Permission.TRANSACTION,
-    ]
+    ])
 
     params_expected = [
         u"service",
@@ -418,8 +512,7 @@ class ServiceWFS(ServiceInterface):
     def __init__(self, service, request):
         super(ServiceWFS, self).__init__(service, request)
 
-    def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
+    def resource_path(self):
         request_type = self.permission_requested()
         if request_type == Permission.GET_CAPABILITIES:
             path_elem = self.request.path.split("/")
@@ -431,23 +524,16 @@ class ServiceWFS(ServiceInterface):
         else:
             layer_name = self.parser.params["typenames"]
             workspace_name = layer_name.split(":")[0]
-
-        # load workspace resource from the database
-        workspace = models.find_children_by_name(child_name=workspace_name,
-                                                 parent_id=self.service.resource_id,
-                                                 db_session=self.request.db)
-        if workspace:
-            self.expand_acl(workspace, self.request.user)
-        return self.acl
+        return [workspace_name]
 
 
 class ServiceTHREDDS(ServiceInterface):
     service_type = u"thredds"
 
-    permissions = [
+    permissions = PermissionSet([
         Permission.READ,
         Permission.WRITE,
-    ]
+    ])
 
     params_expected = [
         u"request"
@@ -461,8 +547,7 @@ class ServiceTHREDDS(ServiceInterface):
     def __init__(self, service, request):
         super(ServiceTHREDDS, self).__init__(service, request)
 
-    def get_acl(self):
-        self.expand_acl(self.service, self.request.user)
+    def resource_path(self):
         elems = self.request.path.split("/")
 
         if "fileServer" in elems:
@@ -475,19 +560,11 @@ class ServiceTHREDDS(ServiceInterface):
         elif elems[-1] == "catalog.html":
             first_idx = elems.index(self.service.resource_name) - 1
         else:
-            return self.acl
+            return []
 
         elems = elems[first_idx + 1::]
-        new_child = self.service
-        while new_child and elems:
-            elem_name = elems.pop(0)
-            if ".nc" in elem_name:
-                elem_name = elem_name.split(".nc")[0] + ".nc"  # in case there is more extension to discard such as .dds
-            parent_id = new_child.resource_id
-            new_child = models.find_children_by_name(elem_name, parent_id=parent_id, db_session=self.request.db)
-            self.expand_acl(new_child, self.request.user)
-
-        return self.acl
+        # in case there is more extension to discard such as .dds
+        return [elem.split(".nc")[0] + ".nc" if ".nc" in elem else elem for elem in elems]
 
     def permission_requested(self):
         return Permission.READ
@@ -501,12 +578,12 @@ for svc in [ServiceAccess, ServiceAPI, ServiceGeoserverWMS, ServiceNCWMS2, Servi
 
 
 def service_factory(service, request):
-    # type: (models.Service, Request) -> ServiceInterface
+    # type: (Union[models.Service, ServiceNode], Request) -> ServiceInterface
     """
-    Retrieve the specific service class from the provided database service entry.
+    Retrieve the specific service class from the provided database service entry (or its cached representation).
     """
-    ax.verify_param(service, paramCompare=models.Service, ofType=True,
-                    httpError=HTTPBadRequest, content={u"service": repr(service)},
+    ax.verify_param(service, paramCompare=(models.Service, ServiceNode), ofType=True,
+                    httpError=HTTPBadRequest, content=lambda: {u"service": repr(service)},
                     msgOnFail="Cannot process invalid service object")
     service_type = ax.evaluate_call(lambda: service.type, httpError=HTTPInternalServerError,
                                     msgOnFail="Cannot retrieve service type from object")
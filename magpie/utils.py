@@ -323,6 +323,22 @@ def log_exception_tween(handler, registry):
 
 
 class ExtendedEnumMeta(EnumMeta):
+    def __new__(mcs, *args, **kwargs):
+        cls = super(ExtendedEnumMeta, mcs).__new__(mcs, *args, **kwargs)
+        # lookup maps of members by name and value (and their case-folded variants) resolved in constant time by 'get'
+        lookup = dict()
+        lookup_folded = dict()
+        for m_key, m_val in reversed(list(cls.__members__.items())):  # first defined member wins on conflicts
+            for key in [m_key, m_val.value]:
+                try:
+                    lookup[key] = m_val
+                    lookup_folded[key.lower() if isinstance(key, six.string_types) else key] = m_val
+                except TypeError:  # unhashable value, cannot be looked up other than by name
+                    pass
+        cls._member_lookup_ = lookup
+        cls._member_lookup_folded_ = lookup_folded
+        return cls
+
     def names(cls):
         # type: () -> List[Str]
         """
@@ -337,16 +353,26 @@ class ExtendedEnumMeta(EnumMeta):
         """
         return [m.value for m in cls.__members__.values()]
 
-    def get(cls, key_or_value, default=None):
-        # type: (AnyKey, Optional[Any]) -> Optional[_TC]
+    def get(cls, key_or_value, default=None, case_insensitive=False):
+        # type: (AnyKey, Optional[Any], bool) -> Optional[_TC]
         """
         Finds an enum entry by defined name or its value.
 
         Returns the entry directly if it is already a valid enum.
+
+        :param key_or_value: name or value of the enum entry to find.
+        :param default: returned value if no entry can be found.
+        :param case_insensitive: match string names and values regardless of their case.
         """
-        if key_or_value in cls:
+        if isinstance(key_or_value, cls):
             return key_or_value
-        for m_key, m_val in cls.__members__.items():
-            if key_or_value == m_key or key_or_value == m_val.value:
-                return m_val
-        return default
+        if case_insensitive:
+            lookup = cls._member_lookup_folded_
+            if isinstance(key_or_value, six.string_types):
+                key_or_value = key_or_value.lower()
+        else:
+            lookup = cls._member_lookup_
+        try:
+            return lookup.get(key_or_value, default)
+        except TypeError:  # unhashable
+            return default
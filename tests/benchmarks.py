@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks
+----------------------------------
+
+Micro-benchmarks of operations employed on hot paths by magpie (not collected as tests).
+
+Run with::
+
+    python -m tests.benchmarks
+"""
+
+from magpie.api import exception as ax
+from magpie.api.management.resource.resource_formats import format_resource_tree, format_resource_tree_flat
+from magpie.api.management.resource.resource_utils import crop_tree_with_permission
+from magpie.permissions import Permission
+from collections import namedtuple
+from typing import TYPE_CHECKING
+import random
+import timeit
+import json
+if TYPE_CHECKING:
+    from magpie.definitions.typedefs import Any, AnyKey, Callable, Dict, JSON, List, Optional, Tuple  # noqa: F401
+
+
+def enum_get_linear(enum_cls, key_or_value, default=None):
+    # type: (Any, AnyKey, Optional[Any]) -> Any
+    """
+    Reference implementation of ``ExtendedEnumMeta.get`` scanning every member.
+    """
+    if isinstance(key_or_value, enum_cls):
+        return key_or_value
+    for m_key, m_val in enum_cls.__members__.items():
+        if key_or_value == m_key or key_or_value == m_val.value:
+            return m_val
+    return default
+
+
+def crop_tree_recursive(children, resource_id_list):
+    # type: (Dict[int, JSON], List[int]) -> Tuple[Dict[int, JSON], List[int]]
+    """
+    Reference recursive implementation of ``crop_tree_with_permission`` with list membership lookups.
+    """
+    for child_id, child_dict in list(children.items()):
+        new_children = child_dict[u"children"]
+        children_returned, resource_id_list = crop_tree_recursive(new_children, resource_id_list)
+        if child_id not in resource_id_list and not children_returned:
+            children.pop(child_id)
+        elif child_id in resource_id_list:
+            resource_id_list.remove(child_id)
+    return dict(children), list(resource_id_list)
+
+
+FakeResource = namedtuple("FakeResource", ["resource_id", "parent_id", "root_service_id", "resource_name",
+                                           "resource_display_name", "resource_type"])
+
+
+def make_tree(branching, depth, with_nodes=False):
+    # type: (int, int, bool) -> Tuple[Dict[int, JSON], int]
+    """
+    Generates a synthetic resource tree in the format of ``get_resource_children`` and its amount of nodes.
+    """
+    count = [0]
+
+    def make_children(level, parent_id=0):
+        children = {}
+        for _ in range(branching if level < depth else 0):
+            count[0] += 1
+            res_id = count[0]
+            node = None
+            if with_nodes:
+                res_name = "resource-{}".format(res_id)
+                node = FakeResource(res_id, parent_id, 0, res_name, res_name, "directory" if level < depth else "file")
+            children[res_id] = {u"node": node, u"children": make_children(level + 1, res_id)}
+        return children
+
+    return make_children(0), count[0]
+
+
+def run_benchmark(name, function, number=100000):
+    # type: (str, Callable[[], Any], int) -> float
+    duration = min(timeit.repeat(function, number=number, repeat=3))
+    print("{:<40} {:>10.3f} us/call".format(name, duration / number * 1e6))
+    return duration
+
+
+def benchmark_enum_get():
+    # last defined member is the worst case of the linear scan
+    keys = [Permission.READ.value, Permission.TRANSACTION.value, Permission.TRANSACTION.name, "unknown"]
+    for key in keys:
+        linear = run_benchmark("linear get({!r})".format(key), lambda: enum_get_linear(Permission, key))
+        lookup = run_benchmark("lookup get({!r})".format(key), lambda: Permission.get(key))
+        print("{:<40} {:>10.1f}x".format("speedup", linear / lookup))
+
+
+def benchmark_crop_tree():
+    # 10 + 10^2 + ... + 10^5 = 111110 nodes
+    branching, depth = 10, 5
+    _, count = make_tree(branching, depth)
+    random.seed(0)
+    for permitted_count in [10, 1000, 10000]:
+        permitted = random.sample(range(1, count + 1), permitted_count)
+        results = {}
+        for name, crop in [("recursive", crop_tree_recursive), ("iterative", crop_tree_with_permission)]:
+            trees = [make_tree(branching, depth)[0] for _ in range(3)]
+            duration = min(timeit.repeat(lambda: crop(trees.pop(), list(permitted)), number=1, repeat=3))
+            results[name] = duration
+            print("{:<40} {:>10.3f} ms".format("{} crop {} nodes / {} ids".format(name, count, permitted_count),
+                                               duration * 1e3))
+        print("{:<40} {:>10.1f}x".format("speedup", results["recursive"] / results["iterative"]))
+
+
+def benchmark_tree_formats():
+    # 10 + 10^2 + ... + 10^4 = 11110 nodes
+    tree, count = make_tree(10, 4, with_nodes=True)
+    perms = dict((res_id, [Permission.READ.value]) for res_id in range(1, count + 1, 3))
+    results = {}
+    for name, fmt in [("nested", format_resource_tree), ("flat", format_resource_tree_flat)]:
+        body = json.dumps(fmt(tree, db_session=None, resources_perms_dict=perms))
+        encode = min(timeit.repeat(lambda: json.dumps(fmt(tree, db_session=None, resources_perms_dict=perms)),
+                                   number=1, repeat=3))
+        decode = min(timeit.repeat(lambda: json.loads(body), number=1, repeat=3))
+        results[name] = (len(body), encode, decode)
+        print("{:<40} {:>10.1f} KB".format("{} body {} nodes".format(name, count), len(body) / 1024.))
+        print("{:<40} {:>10.3f} ms".format("{} format + encode".format(name), encode * 1e3))
+        print("{:<40} {:>10.3f} ms".format("{} decode".format(name), decode * 1e3))
+    for index, measure in enumerate(["size", "format + encode", "decode"]):
+        print("{:<40} {:>10.1f}x".format("{} reduction".format(measure), results["nested"][index] / results["flat"][index]))
+
+
+def benchmark_verify_param():
+    # representation of the resources tree is representative of content employed to report formatting errors
+    tree, _ = make_tree(10, 2, with_nodes=True)
+    eager = run_benchmark("eager content verify_param(isIn)",
+                          lambda: ax.verify_param("a", paramCompare=["a", "b"], isIn=True,
+                                                  content={u"tree": repr(tree)}))
+    lazy = run_benchmark("lazy content verify_param(isIn)",
+                         lambda: ax.verify_param("a", paramCompare=["a", "b"], isIn=True,
+                                                 content=lambda: {u"tree": repr(tree)}))
+    print("{:<40} {:>10.1f}x".format("speedup", eager / lazy))
+    run_benchmark("verify_param(notNone)", lambda: ax.verify_param("a", notNone=True))
+    run_benchmark("verify_param(ofType)", lambda: ax.verify_param("a", paramCompare=str, ofType=True))
+    run_benchmark("evaluate_call", lambda: ax.evaluate_call(lambda: None, content=lambda: {u"tree": repr(tree)}))
+
+
+if __name__ == "__main__":
+    benchmark_enum_get()
+    benchmark_crop_tree()
+    benchmark_tree_formats()
+    benchmark_verify_param()
@@ -5,7 +5,6 @@ from magpie.permissions import Permission
 from magpie.services import SERVICE_TYPE_DICT, ServiceAccess, ServiceAPI, ServiceTHREDDS
 from magpie.utils import get_twitcher_protected_service_url, CONTENT_TYPE_JSON
 from tests import utils, runner
-from copy import deepcopy
 from six.moves.urllib.parse import urlparse
 from distutils.version import LooseVersion
 import unittest
@@ -232,6 +231,33 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
         utils.check_val_is_in("anonymous", body["user_names"])       # anonymous always in users
         utils.check_val_is_in(self.usr, body["user_names"])          # current test user in users
 
+    @runner.MAGPIE_TEST_USERS
+    def test_GetUsers_NamesFilters(self):
+        def get_names(query):
+            resp = utils.test_request(self, "GET", "/users" + query, headers=self.json_headers, cookies=self.cookies)
+            return utils.check_response_basic_info(resp, 200, expected_method="GET")["user_names"]
+
+        all_names = get_names("")
+        utils.check_val_equal(all_names, sorted(all_names, key=lambda name: (name.lower(), name)))
+        anonymous = get_constant("MAGPIE_ANONYMOUS_USER")
+        prefix_names = get_names("?prefix={}".format(anonymous[:3].upper()))
+        utils.check_val_is_in(anonymous, prefix_names)
+        utils.check_val_equal(prefix_names, [name for name in all_names
+                                             if name.lower().startswith(anonymous[:3].lower())])
+        paged_names = []
+        while True:
+            query = "?limit=2&after={}".format(paged_names[-1]) if paged_names else "?limit=2"
+            page = get_names(query)
+            if not page:
+                break
+            utils.check_val_equal(len(page) <= 2, True)
+            paged_names.extend(page)
+        utils.check_val_equal(paged_names, all_names)
+
+        resp = utils.test_request(self, "GET", "/users?limit=0", headers=self.json_headers, cookies=self.cookies,
+                                  expect_errors=True)
+        utils.check_response_basic_info(resp, 400, expected_method="GET")
+
     @runner.MAGPIE_TEST_USERS
     @runner.MAGPIE_TEST_DEFAULTS
     def test_ValidateDefaultUsers(self):
@@ -351,6 +377,75 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
         body = self.check_GetUserResourcesPermissions(anonym_usr, resource_id=test_svc_res_id, query=q_effect)
         utils.check_val_equal(body["permission_names"], [perm_recur])
 
+    @runner.MAGPIE_TEST_USERS
+    def test_PostUserServiceEffectivePermissions(self):
+        # Service/Resources              | Admin-User | Admin-Group | Anonym-User | Anonym-Group
+        # ---------------------------------------------------------------------------------------
+        # test-service                   | r          | r-m         |             | r
+        #   |- test-resource (parent)    |            | r-m         |             |
+        #       |- test-resource (child) |            |             | r-m         |
+        body = utils.TestSetup.create_TestService(self, override_service_type=ServiceAPI.service_type)
+        test_svc_res_id = body["service"]["resource_id"]
+        test_res_type = Route.resource_type_name
+        body = utils.TestSetup.create_TestServiceResource(self, data_override={"resource_type": test_res_type})
+        test_parent_res_id = body["resource"]["resource_id"]
+        child_resource_name = self.test_resource_name + "-child"
+        data_override = {
+            "resource_name": child_resource_name,
+            "resource_type": test_res_type,
+            "parent_id": test_parent_res_id
+        }
+        body = utils.TestSetup.create_TestServiceResource(self, data_override)
+        test_child_res_id = body["resource"]["resource_id"]
+        anonym_usr = get_constant("MAGPIE_ANONYMOUS_USER")
+        anonym_grp = get_constant("MAGPIE_ANONYMOUS_GROUP")
+
+        perm_recur = Permission.READ.value
+        perm_match = Permission.READ_MATCH.value
+        for principal, principal_name, res_id, perm_name in [
+            ("users", self.usr, test_svc_res_id, perm_recur),
+            ("groups", self.grp, test_svc_res_id, perm_match),
+            ("groups", self.grp, test_parent_res_id, perm_match),
+            ("users", anonym_usr, test_child_res_id, perm_match),
+            ("groups", anonym_grp, test_svc_res_id, perm_recur),
+        ]:
+            path = "/{}/{}/resources/{}/permissions".format(principal, principal_name, res_id)
+            data = {u"permission_name": perm_name}
+            utils.test_request(self, "POST", path, data=data, headers=self.json_headers, cookies=self.cookies)
+
+        # bulk results must match those of the effective permissions of each resource
+        paths_ids = {
+            u"": test_svc_res_id,
+            self.test_resource_name: test_parent_res_id,
+            u"/{}/{}/".format(self.test_resource_name.upper(), child_resource_name): test_child_res_id,
+        }
+        missing_path = u"{}/does-not-exist".format(self.test_resource_name)
+        for user_name in [self.usr, anonym_usr]:
+            effective_perms = dict()
+            for res_id in paths_ids.values():
+                body = self.check_GetUserResourcesPermissions(user_name, resource_id=res_id, query="effective=true")
+                effective_perms[res_id] = body["permission_names"]
+            for perm_name in [perm_recur, perm_match]:
+                path = "/users/{}/services/{}/effective_permissions".format(user_name, self.test_service_name)
+                data = {u"permission_name": perm_name,
+                        u"resource_paths": list(paths_ids) + [missing_path],
+                        u"resource_ids": list(paths_ids.values())}
+                resp = utils.test_request(self, "POST", path, data=data, headers=self.json_headers,
+                                          cookies=self.cookies)
+                body = utils.check_response_basic_info(resp, 200, expected_method="POST")
+                utils.check_val_equal(body["permission_name"], perm_name)
+                utils.check_val_equal(body["resource_paths"][missing_path], False)
+                for res_path, res_id in paths_ids.items():
+                    expected = perm_name in effective_perms[res_id]
+                    utils.check_val_equal(body["resource_paths"][res_path], expected)
+                    utils.check_val_equal(body["resource_ids"][str(res_id)], expected)
+
+        path = "/users/{usr}/services/{svc}/effective_permissions".format(usr=self.usr, svc=self.test_service_name)
+        data = {u"permission_name": "not-a-permission", u"resource_ids": [test_svc_res_id]}
+        resp = utils.test_request(self, "POST", path, data=data, headers=self.json_headers, cookies=self.cookies,
+                                  expect_errors=True)
+        utils.check_response_basic_info(resp, 400, expected_method="POST")
+
     @runner.MAGPIE_TEST_USERS
     def test_GetUserResourcesPermissions(self):
         utils.TestSetup.create_TestService(self)
@@ -434,7 +529,7 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
         utils.TestSetup.create_TestService(self)
         body = utils.TestSetup.create_TestServiceResource(self)
         res_id = body["resource"]["resource_id"]
-        all_perms = deepcopy(self.test_service_resource_perms)
+        all_perms = list(self.test_service_resource_perms)
         # different permissions on each resource to ensure proper resolution occurs
         perm_svc_usr = all_perms.pop().value
         perm_svc_grp = all_perms.pop().value
@@ -522,6 +617,52 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
         utils.check_all_equal(test_service["resources"][str(res_id)]["permission_names"],
                               [perm_res_usr, perm_res_grp], any_order=True)
 
+    @runner.MAGPIE_TEST_USERS
+    def test_GetUserResources_MatchServiceResources(self):
+        # Service/Resources              | Test-User | Test-Group
+        # ------------------------------------------------------
+        # test-service                   |           |
+        #   |- test-resource (parent)    |           |
+        #       |- test-resource (child) | r         | w
+        #   |- test-resource (other)     |           |
+        utils.TestSetup.create_TestGroup(self)
+        utils.TestSetup.create_TestUser(self, override_data={"group_name": self.test_group_name})
+        utils.TestSetup.create_TestService(self, override_service_type=ServiceAPI.service_type)
+        test_res_type = Route.resource_type_name
+        body = utils.TestSetup.create_TestServiceResource(self, data_override={"resource_type": test_res_type})
+        parent_res_id = body["resource"]["resource_id"]
+        data_override = {"resource_name": self.test_resource_name + "-child", "resource_type": test_res_type,
+                         "parent_id": parent_res_id}
+        body = utils.TestSetup.create_TestServiceResource(self, data_override)
+        child_res_id = body["resource"]["resource_id"]
+        data_override = {"resource_name": self.test_resource_name + "-other", "resource_type": test_res_type}
+        body = utils.TestSetup.create_TestServiceResource(self, data_override)
+        other_res_id = body["resource"]["resource_id"]
+        for principal, principal_name, perm in [("users", self.test_user_name, Permission.READ),
+                                                ("groups", self.test_group_name, Permission.WRITE)]:
+            path = "/{}/{}/resources/{}/permissions".format(principal, principal_name, child_res_id)
+            data = {"permission_name": perm.value}
+            resp = utils.test_request(self, "POST", path, headers=self.json_headers, cookies=self.cookies, data=data)
+            utils.check_response_basic_info(resp, 201, expected_method="POST")
+
+        for query, child_perms in [("", [Permission.READ.value]),
+                                   ("?inherit=true", [Permission.READ.value, Permission.WRITE.value])]:
+            path = "/users/{}/resources{}".format(self.test_user_name, query)
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies, timeout=20)
+            body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            svc_body = body["resources"][ServiceAPI.service_type][self.test_service_name]
+            path = "/users/{}/services/{}/resources{}".format(self.test_user_name, self.test_service_name, query)
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies)
+            body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            utils.check_val_equal(svc_body, body["service"])
+            # parent without permission kept to display the child, other resource without permission removed
+            utils.check_all_equal(list(svc_body["resources"]), [str(parent_res_id)])
+            utils.check_val_not_in(str(other_res_id), svc_body["resources"])
+            parent_body = svc_body["resources"][str(parent_res_id)]
+            utils.check_val_equal(parent_body["permission_names"], [])
+            utils.check_all_equal(parent_body["children"][str(child_res_id)]["permission_names"], child_perms,
+                                  any_order=True)
+
     @runner.MAGPIE_TEST_USERS
     def test_GetUserInheritedResources_format(self):
         utils.TestSetup.create_TestService(self)
@@ -955,6 +1096,48 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
         ]:
             utils.check_val_is_in(group, body["group_names"])
 
+    @runner.MAGPIE_TEST_GROUPS
+    def test_GetGroups_NamesFilters(self):
+        utils.TestSetup.create_TestGroup(self)
+
+        def get_names(query):
+            resp = utils.test_request(self, "GET", "/groups" + query, headers=self.json_headers, cookies=self.cookies)
+            return utils.check_response_basic_info(resp, 200, expected_method="GET")["group_names"]
+
+        all_names = get_names("")
+        utils.check_val_equal(all_names, sorted(all_names, key=lambda name: (name.lower(), name)))
+        utils.check_val_equal(get_names("?prefix={}".format(self.test_group_name.upper())), [self.test_group_name])
+        utils.check_val_equal(get_names("?prefix=%25"), [])  # wildcards are matched literally
+        utils.check_val_equal(get_names("?limit=1"), all_names[:1])
+        utils.check_val_equal(get_names("?after={}".format(all_names[0])), all_names[1:])
+        utils.check_val_equal(get_names("?after={}&limit=1".format(all_names[-1])), [])
+
+    @runner.MAGPIE_TEST_GROUPS
+    def test_GetGroups_MemberCounts(self):
+        utils.TestSetup.create_TestGroup(self)
+        resp = utils.test_request(self, "GET", "/groups?with_counts=true",
+                                  headers=self.json_headers, cookies=self.cookies)
+        body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+        utils.check_val_equal(sorted(body["member_counts"]), sorted(body["group_names"]))
+        utils.check_val_equal(body["member_counts"][self.test_group_name], 0)
+        for group_name in [self.test_group_name, get_constant("MAGPIE_ADMIN_GROUP")]:
+            path = "/groups/{}".format(group_name)
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies)
+            group = utils.check_response_basic_info(resp, 200, expected_method="GET")["group"]
+            utils.check_val_equal(body["member_counts"][group_name], group["member_count"])
+            utils.check_val_equal(body["member_counts"][group_name], len(group["user_names"]))
+
+        path = "/users/{}/groups?with_counts=true".format(get_constant("MAGPIE_ADMIN_USER"))
+        resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies)
+        user_body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+        utils.check_val_equal(sorted(user_body["member_counts"]), sorted(user_body["group_names"]))
+        for group_name in user_body["group_names"]:
+            utils.check_val_equal(user_body["member_counts"][group_name], body["member_counts"][group_name])
+
+        resp = utils.test_request(self, "GET", "/groups", headers=self.json_headers, cookies=self.cookies)
+        body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+        utils.check_val_not_in("member_counts", body)
+
     @runner.MAGPIE_TEST_GROUPS
     def test_PostGroups(self):
         utils.TestSetup.delete_TestGroup(self)  # setup as required
@@ -1107,6 +1290,39 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
             utils.check_val_is_in("service_url", svc_dict)
             utils.check_val_type(svc_dict["service_url"], six.string_types)
 
+    @runner.MAGPIE_TEST_GROUPS
+    def test_GetGroupResources_MatchServiceResources(self):
+        utils.TestSetup.create_TestGroup(self)
+        utils.TestSetup.create_TestService(self, override_service_type=ServiceAPI.service_type)
+        test_res_type = Route.resource_type_name
+        body = utils.TestSetup.create_TestServiceResource(self, data_override={"resource_type": test_res_type})
+        parent_res_id = body["resource"]["resource_id"]
+        data_override = {"resource_name": self.test_resource_name + "-child", "resource_type": test_res_type,
+                         "parent_id": parent_res_id}
+        body = utils.TestSetup.create_TestServiceResource(self, data_override)
+        child_res_id = body["resource"]["resource_id"]
+        path = "/groups/{}/services/{}/permissions".format(self.test_group_name, self.test_service_name)
+        data = {"permission_name": Permission.WRITE.value}
+        resp = utils.test_request(self, "POST", path, headers=self.json_headers, cookies=self.cookies, data=data)
+        utils.check_response_basic_info(resp, 201, expected_method="POST")
+        path = "/groups/{}/resources/{}/permissions".format(self.test_group_name, child_res_id)
+        data = {"permission_name": Permission.READ.value}
+        resp = utils.test_request(self, "POST", path, headers=self.json_headers, cookies=self.cookies, data=data)
+        utils.check_response_basic_info(resp, 201, expected_method="POST")
+
+        path = "/groups/{}/resources".format(self.test_group_name)
+        resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies)
+        body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+        svc_body = body["resources"][ServiceAPI.service_type][self.test_service_name]
+        path = "/groups/{}/services/{}/resources".format(self.test_group_name, self.test_service_name)
+        resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies)
+        body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+        utils.check_val_equal(svc_body, body["service"])
+        utils.check_val_equal(svc_body["permission_names"], [Permission.WRITE.value])
+        parent_body = svc_body["resources"][str(parent_res_id)]
+        utils.check_val_equal(parent_body["permission_names"], [])
+        utils.check_val_equal(parent_body["children"][str(child_res_id)]["permission_names"], [Permission.READ.value])
+
     @runner.MAGPIE_TEST_SERVICES
     def test_PostService_ResponseFormat(self):
         body = utils.TestSetup.create_TestService(self)
@@ -1344,6 +1560,129 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
             utils.check_val_is_in("service_sync_type", svc_dict)
             utils.check_val_type(svc_dict["service_sync_type"], utils.OptionalStringType)
 
+    @runner.MAGPIE_TEST_SERVICES
+    def test_GetServiceResources_TreeParams(self):
+        # test-service
+        #   |- a
+        #       |- a1
+        #       |- a2
+        #           |- a2x
+        #   |- b
+        #   |- c
+        res_ids = {}
+        for res_name, parent_name in [("a", None), ("a1", "a"), ("a2", "a"), ("a2x", "a2"), ("b", None), ("c", None)]:
+            data_override = {"resource_name": res_name, "parent_id": res_ids.get(parent_name)}
+            body = utils.TestSetup.create_TestServiceResource(self, data_override)
+            res_ids[res_name] = body["resource"]["resource_id"]
+
+        def get_tree(path, query):
+            resp = utils.test_request(self, "GET", path + query, headers=self.json_headers, cookies=self.cookies)
+            body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            if path.startswith("/services"):
+                return body[self.test_service_name]["resources"]
+            if path.startswith("/resources/"):
+                return body["resource"]["children"]
+            return body["resources"][self.test_service_type][self.test_service_name]["resources"]
+
+        def names(tree):
+            return dict((res["resource_name"], names(res["children"])) for res in tree.values())
+
+        svc_path = "/services/{}/resources".format(self.test_service_name)
+        a2x = {"a2x": {}}
+        for path, query, expected in [
+            (svc_path, "", {"a": {"a1": {}, "a2": a2x}, "b": {}, "c": {}}),
+            (svc_path, "?depth=0", {}),
+            (svc_path, "?depth=1", {"a": {}, "b": {}, "c": {}}),
+            (svc_path, "?depth=2&limit=1", {"a": {"a1": {}, "a2": {}}}),
+            (svc_path, "?limit=2&cursor={}".format(res_ids["a"]), {"b": {}, "c": {}}),
+            (svc_path, "?limit=2&cursor={}".format(res_ids["c"]), {}),
+            (svc_path, "?parent={}&depth=1".format(res_ids["a"]), {"a1": {}, "a2": {}}),
+            (svc_path, "?parent={}&cursor={}".format(res_ids["a"], res_ids["a1"]), {"a2": a2x}),
+            ("/resources/{}".format(res_ids["a"]), "?limit=1", {"a1": {}}),
+            ("/resources/{}".format(res_ids["a"]), "?depth=1&cursor={}".format(res_ids["a1"]), {"a2": {}}),
+            ("/resources", "?depth=1", {"a": {}, "b": {}, "c": {}}),
+            ("/resources", "?depth=2&stream=true", {"a": {"a1": {}, "a2": {}}, "b": {}, "c": {}}),
+        ]:
+            utils.check_val_equal(names(get_tree(path, query)), expected, msg="Query: {}{}".format(path, query))
+
+        for path, query in [(svc_path, "?depth=-1"), (svc_path, "?limit=0"), (svc_path, "?cursor=abc"),
+                            (svc_path, "?parent={}".format(res_ids["a"] + 1000)), ("/resources", "?depth=x"),
+                            ("/resources/{}".format(res_ids["a"]), "?limit=-2")]:
+            resp = utils.test_request(self, "GET", path + query, headers=self.json_headers, cookies=self.cookies,
+                                      expect_errors=True)
+            utils.check_response_basic_info(resp, 400, expected_method="GET")
+
+    @runner.MAGPIE_TEST_SERVICES
+    def test_GetResourcesTrees_FlatFormat(self):
+        body = utils.TestSetup.create_TestServiceResource(self, {"resource_display_name": "parent-display"})
+        parent_id = body["resource"]["resource_id"]
+        data_override = {"resource_name": self.test_resource_name + "-child", "parent_id": parent_id}
+        body = utils.TestSetup.create_TestServiceResource(self, data_override)
+        child_id = body["resource"]["resource_id"]
+        admin_grp = get_constant("MAGPIE_ADMIN_GROUP")
+        for perm in [Permission.READ, Permission.WRITE_MATCH]:
+            path = "/groups/{}/resources/{}/permissions".format(admin_grp, child_id)
+            resp = utils.test_request(self, "POST", path, headers=self.json_headers, cookies=self.cookies,
+                                      data={"permission_name": perm.value})
+            utils.check_response_basic_info(resp, 201, expected_method="POST")
+
+        def get_trees(body):
+            if "resource" in body:
+                return [body["resource"]["children"]]
+            if "service" in body:
+                return [body["service"]["resources"]]
+            if self.test_service_name in body:
+                return [body[self.test_service_name]["resources"]]
+            return [svc["resources"] for svc_type in sorted(body["resources"])
+                    for _, svc in sorted(body["resources"][svc_type].items())]
+
+        def nested_tree(flat_tree):
+            nodes = {}
+            tree = {}
+            for i, res_id in enumerate(flat_tree["resource_id"]):
+                perms = [perm for bit, perm in enumerate(flat_tree["permission_names"])
+                         if flat_tree["permissions"][i] & (1 << bit)]
+                nodes[res_id] = {
+                    "resource_id": res_id,
+                    "parent_id": flat_tree["parent_id"][i],
+                    "resource_name": flat_tree["resource_name"][i],
+                    "resource_display_name": flat_tree["resource_display_name"][i],
+                    "resource_type": flat_tree["resource_types"][flat_tree["resource_type"][i]],
+                    "permission_names": sorted(perms),
+                    "children": {},
+                }
+                parent = nodes.get(flat_tree["parent_id"][i])
+                (parent["children"] if parent else tree)[str(res_id)] = nodes[res_id]
+            return tree
+
+        def strip_root_service(tree):
+            for res in tree.values():
+                res.pop("root_service_id")
+                strip_root_service(res["children"])
+            return tree
+
+        svc_path = "/services/{}/resources".format(self.test_service_name)
+        for path in ["/resources", "/resources?stream=true", "/resources/{}".format(parent_id), svc_path,
+                     "/users/{}/resources?inherit=true".format(self.usr),
+                     "/users/{}/resources?inherit=true&stream=true".format(self.usr),
+                     "/users/{}/services/{}/resources?inherit=true".format(self.usr, self.test_service_name),
+                     "/groups/{}/resources".format(admin_grp),
+                     "/groups/{}/services/{}/resources".format(admin_grp, self.test_service_name)]:
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies, timeout=20)
+            body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            flat_path = path + ("&" if "?" in path else "?") + "format=flat"
+            resp = utils.test_request(self, "GET", flat_path, headers=self.json_headers, cookies=self.cookies,
+                                      timeout=20)
+            flat_body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            trees = [strip_root_service(tree) for tree in get_trees(body)]
+            flat_trees = [nested_tree(tree) for tree in get_trees(flat_body)]
+            utils.check_val_equal(flat_trees, trees, msg="Path: {}".format(path))
+            utils.check_val_is_in(True, [str(child_id) in str(tree) for tree in flat_trees], msg="Path: {}".format(path))
+
+        resp = utils.test_request(self, "GET", svc_path + "?format=other", headers=self.json_headers,
+                                  cookies=self.cookies, expect_errors=True)
+        utils.check_response_basic_info(resp, 400, expected_method="GET")
+
     @runner.MAGPIE_TEST_SERVICES
     def test_GetServicePermissions(self):
         services_list = utils.TestSetup.get_RegisteredServicesList(self)
@@ -1502,6 +1841,34 @@ class Interface_MagpieAPI_AdminAuth(Base_Magpie_TestCase):
             utils.check_val_is_in(svc_name, services_body[svc_type], msg=msg)
             utils.check_val_is_in("getcapabilities", services_body[svc_type][svc_name]["permission_names"])
 
+    @runner.MAGPIE_TEST_RESOURCES
+    def test_GetResources_Stream(self):
+        body = utils.TestSetup.create_TestServiceResource(self)
+        parent_id = body["resource"]["resource_id"]
+        for _ in range(2):
+            data_override = {"resource_name": self.test_resource_name + "-child", "parent_id": parent_id}
+            body = utils.TestSetup.create_TestServiceResource(self, data_override)
+            parent_id = body["resource"]["resource_id"]
+        path = "/groups/{}/resources/{}/permissions".format(get_constant("MAGPIE_ADMIN_GROUP"), parent_id)
+        data = {"permission_name": Permission.READ.value}
+        resp = utils.test_request(self, "POST", path, headers=self.json_headers, cookies=self.cookies, data=data)
+        utils.check_response_basic_info(resp, 201, expected_method="POST")
+
+        for path in ["/resources",
+                     "/users/{}/resources?inherit=true".format(self.usr),
+                     "/groups/{}/resources".format(get_constant("MAGPIE_ADMIN_GROUP"))]:
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies, timeout=20)
+            body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            path = path + ("&" if "?" in path else "?") + "stream=true"
+            resp = utils.test_request(self, "GET", path, headers=self.json_headers, cookies=self.cookies, timeout=20)
+            stream_body = utils.check_response_basic_info(resp, 200, expected_method="GET")
+            utils.check_val_equal(stream_body, body)
+            tree = stream_body["resources"][self.test_service_type][self.test_service_name]["resources"]
+            for _ in range(3):  # every nested resource up to the one with permission is written
+                utils.check_val_equal(len(tree), 1)
+                tree = list(tree.values())[0]["children"]
+            utils.check_val_equal(tree, {})
+
     @runner.MAGPIE_TEST_RESOURCES
     def test_PostResources_DirectServiceResource(self):
         utils.TestSetup.create_TestService(self)
@@ -8,7 +8,10 @@ test_utils
 Tests for the various utility operations employed by magpie.
 """
 
+from magpie.acl_cache import ACLCache, ACLCacheKey, AnonymousCache, PrincipalUser
 from magpie.api import requests as ar, exception as ax
+from magpie.api.management.resource.resource_utils import crop_tree_with_permission
+from magpie.decision_engine import CompiledResource, DecisionEngine
 from magpie.definitions.pyramid_definitions import (  # noqa: F401
     asbool,
     Request,
@@ -18,13 +21,14 @@ from magpie.definitions.pyramid_definitions import (  # noqa: F401
     HTTPOk,
 )
 from magpie import models, __meta__
-from magpie.permissions import format_permissions, Permission
+from magpie.permissions import format_permissions, Permission, PermissionSet
 from magpie.utils import get_header, ExtendedEnumMeta, CONTENT_TYPE_JSON
 from distutils.version import LooseVersion
 from pyramid.testing import DummyRequest
 from tests import utils, runner
 from enum import Enum
 from typing import TYPE_CHECKING
+import json
 import six
 import mock
 import unittest
@@ -198,6 +202,59 @@ class TestUtils(unittest.TestCase):
         # strings cases handled correctly (no raise)
         utils.check_no_raise(lambda: ax.verify_param("1", paramCompare=u"1", isEqual=True))
 
+    def test_verify_param_lazy_content(self):
+        def fail_content():
+            raise AssertionError("content must not be generated on success")
+
+        utils.check_no_raise(lambda: ax.verify_param("x", paramCompare=["x"], isIn=True, content=fail_content))
+        utils.check_no_raise(lambda: ax.verify_param(1, paramCompare=1, isEqual=True, content=fail_content))
+        utils.check_no_raise(lambda: ax.verify_param("x", paramCompare=six.text_type, ofType=True,
+                                                     content=fail_content))
+        utils.check_no_raise(lambda: ax.evaluate_call(lambda: None, content=fail_content))
+
+        for call in [lambda: ax.verify_param("y", paramCompare=["x"], isIn=True, content=lambda: {u"extra": 1}),
+                     lambda: ax.verify_param("y", paramCompare="x", isEqual=True, content=lambda: {u"extra": 1}),
+                     lambda: ax.verify_param(None, notNone=True, content=lambda: {u"extra": 1})]:
+            try:
+                call()
+            except HTTPBadRequest as exc:
+                utils.check_val_equal(exc.json[u"extra"], 1)
+            else:
+                self.fail("verification expected to fail")
+        try:
+            ax.evaluate_call(lambda: int("x"), content=lambda: {u"extra": 1})
+        except HTTPInternalServerError as exc:
+            utils.check_val_equal(exc.json[u"call"][u"content"], repr({u"extra": 1}))
+        else:
+            self.fail("call expected to fail")
+
+    def test_verify_param_content_error(self):
+        """
+        Errors generating the content on failure must not replace the intended HTTP error nor skip the fallback.
+        """
+        def bad_content():
+            raise ValueError("content failed")
+
+        try:
+            ax.verify_param(None, notNone=True, content=bad_content)
+        except HTTPBadRequest as exc:
+            utils.check_val_is_in("content failed", exc.json[u"content_error"])
+        else:
+            self.fail("verification expected to fail")
+        fallback = mock.Mock()
+        try:
+            ax.evaluate_call(lambda: int("x"), fallback=lambda: fallback(), httpError=HTTPForbidden,
+                             content=bad_content)
+        except HTTPForbidden as exc:
+            utils.check_val_is_in("content failed", exc.json[u"call"][u"content"])
+        else:
+            self.fail("call expected to fail")
+        utils.check_val_equal(fallback.call_count, 1)
+
+    def test_verify_param_non_bool_flags(self):
+        utils.check_raises(lambda: ax.verify_param("x", notNone=1), HTTPInternalServerError)
+        utils.check_raises(lambda: ax.verify_param("x", paramCompare=["x"], isIn=1), HTTPInternalServerError)
+
     def test_enum_values_listing(self):
         utils.check_all_equal(DummyEnum.values(), ["value-1", "value-2"], any_order=True)
 
@@ -206,6 +263,10 @@ class TestUtils(unittest.TestCase):
         utils.check_val_equal(DummyEnum.get("VALUE1"), DummyEnum.VALUE1)
         utils.check_val_equal(DummyEnum.get("random"), None)
         utils.check_val_equal(DummyEnum.get("random", "something"), "something")
+        utils.check_val_equal(DummyEnum.get("Value-1"), None)
+        utils.check_val_equal(DummyEnum.get("Value-1", case_insensitive=True), DummyEnum.VALUE1)
+        utils.check_val_equal(DummyEnum.get("value1", case_insensitive=True), DummyEnum.VALUE1)
+        utils.check_val_equal(DummyEnum.get(["unhashable"]), None)
 
     def test_format_permissions(self):
         usr_perm = models.UserPermission()
@@ -226,3 +287,343 @@ class TestUtils(unittest.TestCase):
             Permission.WRITE_MATCH.value,
         ]
         utils.check_all_equal(format_perms, expect_perms, any_order=False)
+
+    def test_permission_set_operations(self):
+        perms = PermissionSet([Permission.WRITE, Permission.READ.value, Permission.GET_MAP, "random"])
+        utils.check_val_equal(len(perms), 3)
+        utils.check_val_equal(list(perms), [Permission.GET_MAP, Permission.READ, Permission.WRITE])
+        utils.check_val_equal(perms[0], Permission.GET_MAP)
+        utils.check_val_is_in(Permission.READ.value, perms)
+        utils.check_val_not_in(Permission.EXECUTE, perms)
+        utils.check_val_equal(perms | [Permission.EXECUTE], PermissionSet(list(perms) + [Permission.EXECUTE]))
+        utils.check_val_equal(perms & PermissionSet([Permission.READ, Permission.EXECUTE]),
+                              PermissionSet([Permission.READ]))
+        utils.check_val_equal(perms - [Permission.READ], PermissionSet([Permission.GET_MAP, Permission.WRITE]))
+        utils.check_val_equal(PermissionSet.from_mask(perms.mask), perms)
+        utils.check_val_equal(format_permissions(perms), [Permission.GET_MAP.value, Permission.READ.value,
+                                                          Permission.WRITE.value])
+        utils.check_val_equal(bool(PermissionSet()), False)
+
+    def test_acl_cache_eviction_and_invalidation(self):
+        cache = ACLCache(max_size=2)
+        key_usr1_res1 = ACLCacheKey(1, False, 10, (10, 11), Permission.READ.value)
+        key_usr1_res2 = ACLCacheKey(1, False, 10, (10, 12), Permission.READ.value)
+        key_usr2_res1 = ACLCacheKey(2, False, 10, (10, 11), Permission.READ.value)
+        cache.set(key_usr1_res1, [["acl-1"], []])
+        cache.set(key_usr1_res2, [["acl-2"], []])
+        utils.check_val_equal(cache.get(key_usr1_res1), [["acl-1"], []])
+        cache.set(key_usr2_res1, [["acl-3"], []])  # evicts least recently used 'key_usr1_res2'
+        utils.check_val_equal(cache.get(key_usr1_res2), None)
+        utils.check_val_equal(cache.get(key_usr2_res1), [["acl-3"], []])
+        utils.check_val_equal(cache.stats()["evictions"], 1)
+
+        cache.invalidate(user_id=1, resource_id=12)
+        utils.check_val_equal(len(cache), 2)
+        cache.invalidate(resource_id=11)
+        utils.check_val_equal(len(cache), 0)
+        utils.check_val_equal(cache.stats()["hits"], 2)
+        utils.check_val_equal(cache.stats()["misses"], 1)
+
+        # entry computed before an invalidation must not be stored
+        generation = cache.generation
+        cache.invalidate(user_id=2)
+        cache.set(key_usr2_res1, [["acl-4"], []], generation=generation)
+        utils.check_val_equal(cache.get(key_usr2_res1), None)
+
+    def test_anonymous_cache_invalidation(self):
+        cache = AnonymousCache()
+        cache._principal = PrincipalUser(1, "anonymous", tuple())
+        cache._resources_acl = {10: (None, ["acl-10"]), 11: (None, ["acl-11"])}
+        resources = [mock.Mock(resource_id=10), mock.Mock(resource_id=11)]
+        utils.check_val_equal(cache.get_resources_acl(resources, db_session=None), [["acl-10"], ["acl-11"]])
+
+        cache.invalidate(user_id=2)  # other user than anonymous, nothing to do
+        utils.check_val_equal(len(cache._resources_acl), 2)
+        cache.invalidate(resource_id=11)
+        utils.check_val_equal(list(cache._resources_acl), [10])
+        utils.check_val_not_equal(cache._principal, None)
+        cache.invalidate(user_id=1)
+        utils.check_val_equal(len(cache._resources_acl), 0)
+        utils.check_val_equal(cache._principal, None)
+
+        # missing anonymous user must fail explicitly as when computing its ACL without cache
+        with mock.patch.object(cache, "get_principal", return_value=None):
+            exc = utils.check_raises(lambda: cache.get_resources_acl(resources, db_session=None), Exception)
+            utils.check_val_equal(str(exc), "No Anonymous user in the database")
+
+    def test_principal_cache_expire_and_invalidate(self):
+        from magpie.acl_cache import PrincipalCache, PrincipalGroup
+
+        principal = PrincipalUser(1, "user", (PrincipalGroup(2, "group"), ))
+        cache = PrincipalCache(expire=60)
+        with mock.patch("magpie.acl_cache.load_principal", return_value=principal) as load:
+            utils.check_val_equal(cache.get_principal(1, db_session=None), principal)
+            utils.check_val_equal(cache.get_principal(1, db_session=None), principal)
+            utils.check_val_equal(load.call_count, 2)  # not kept while disabled
+
+            cache.enabled = True
+            cache.get_principal(1, db_session=None)
+            utils.check_val_equal(cache.get_principal(1, db_session=None), principal)
+            utils.check_val_equal(load.call_count, 3)
+            cache.invalidate(user_id=2)  # other user, nothing to do
+            cache.get_principal(1, db_session=None)
+            utils.check_val_equal(load.call_count, 3)
+            cache.invalidate(user_id=1)  # group membership modified
+            cache.get_principal(1, db_session=None)
+            utils.check_val_equal(load.call_count, 4)
+
+            cache.expire = -1  # expired when stored
+            cache.invalidate()
+            cache.get_principal(1, db_session=None)
+            cache.get_principal(1, db_session=None)
+            utils.check_val_equal(load.call_count, 6)
+
+    def test_decision_engine_inherit_and_match(self):
+        service = CompiledResource(1)
+        route = service.children["route"] = CompiledResource(2)
+        sub_route = route.children["sub"] = CompiledResource(3)
+        engine = DecisionEngine()
+        engine._services[1] = (engine._generation(), service)
+        service.permissions[10] = Permission.READ_MATCH.bit
+        route.permissions["group:20"] = Permission.WRITE_MATCH.bit
+        sub_route.owners.add(30)
+
+        def permits(path, principal, permission):
+            return engine.permits(1, path, [principal], permission, None, match=True)
+
+        utils.check_val_equal(permits([], 10, Permission.READ), True)
+        utils.check_val_equal(permits(["route"], 10, Permission.READ), False)      # match not inherited
+        utils.check_val_equal(permits(["Route"], "group:20", Permission.WRITE), True)
+        utils.check_val_equal(permits(["route", "sub"], "group:20", Permission.WRITE), False)
+        utils.check_val_equal(permits(["route", "other"], "group:20", Permission.WRITE), False)  # not resolved
+        utils.check_val_equal(permits(["route", "sub"], 30, Permission.WRITE), True)
+        utils.check_val_equal(permits(["route", "sub", "child"], 30, Permission.WRITE), True)  # ownership inherited
+        utils.check_val_equal(permits(["route"], 30, Permission.WRITE), False)
+
+    def test_crop_tree_with_permission(self):
+        def node(**children):
+            return {u"node": None, u"children": dict((int(k[1:]), v) for k, v in children.items())}
+
+        tree = node(r1=node(r2=node(r3=node()), r4=node()), r5=node(r6=node()), r7=node())[u"children"]
+        cropped, remaining = crop_tree_with_permission(tree, [3, 7, 8, 3])
+        utils.check_val_equal(cropped, node(r1=node(r2=node(r3=node())), r7=node())[u"children"])
+        utils.check_val_equal(remaining, [8, 3])
+
+        # deep trees must not reach the recursion limit
+        deep_tree = node()
+        leaf = deep_tree
+        for res_id in range(1, 10000):
+            leaf[u"children"][res_id] = leaf = node()
+        cropped, remaining = crop_tree_with_permission(deep_tree[u"children"], [9999])
+        utils.check_val_equal(list(cropped), [1])
+        utils.check_val_equal(remaining, [])
+
+    def test_iter_json(self):
+        def content():
+            stream = ax.JSONStream(iter([(u"c", ax.JSONStream([])), (u"d", None)]))
+            return {u"a": [1, u"x"], u"b": {}, 1: stream, u"é": {u"e": True}}
+
+        expected = json.dumps({u"a": [1, u"x"], u"b": {}, 1: {u"c": {}, u"d": None}, u"é": {u"e": True}})
+        for chunk_size in [1, 10, 1000]:
+            chunks = list(ax.iter_json(content(), chunk_size=chunk_size))
+            utils.check_val_equal(b"".join(chunks).decode("utf-8"), expected)
+        utils.check_val_equal(list(ax.iter_json(u"x")), [b'"x"'])
+
+        # deeply nested objects must not reach the recursion limit, and are only generated while written
+        def nested(depth):
+            if depth:
+                yield u"r", ax.JSONStream(nested(depth - 1))
+
+        body = b"".join(ax.iter_json(ax.JSONStream(nested(5000)))).decode("utf-8")
+        utils.check_val_equal(body, u'{"r": ' * 5000 + u"{}" + u"}" * 5000)
+
+    def test_format_resource_tree_service_types(self):
+        from magpie.api.management.resource.resource_formats import format_resource_tree
+        from magpie.services import ServiceAPI
+        from collections import namedtuple
+
+        fields = ["resource_id", "parent_id", "root_service_id", "resource_name", "resource_display_name",
+                  "resource_type"]
+        FakeResource = namedtuple("FakeResource", fields)  # noqa: N806
+
+        def node(res_id, parent_id, **children):
+            res = FakeResource(res_id, parent_id, 1, "r{}".format(res_id), None, "route")
+            return {u"node": res, u"children": dict((int(k[1:]), v) for k, v in children.items())}
+
+        tree = {2: node(2, 1, r3=node(3, 2)), 4: node(4, 1)}
+        route_perms = format_permissions(ServiceAPI.get_resource_permissions("route"))
+        # known service types must not require any db session to resolve allowed permissions
+        fmt_tree = format_resource_tree(tree, db_session=None, service_types={1: ServiceAPI.service_type})
+        utils.check_val_equal(list(fmt_tree), [2, 4])
+        utils.check_val_equal(fmt_tree[2][u"permission_names"], route_perms)
+        utils.check_val_equal(fmt_tree[2][u"children"][3][u"permission_names"], route_perms)
+        utils.check_val_equal(fmt_tree[2][u"children"][3][u"resource_display_name"], u"r3")
+        utils.check_val_equal(fmt_tree[4][u"children"], {})
+
+        fmt_tree = format_resource_tree(tree, db_session=None, resources_perms_dict={3: [Permission.READ]})
+        utils.check_val_equal(fmt_tree[2][u"permission_names"], [])
+        utils.check_val_equal(fmt_tree[2][u"children"][3][u"permission_names"], [Permission.READ.value])
+
+        # errors of any resource are reported once for the whole tree
+        tree[4][u"node"] = None
+        utils.check_raises(lambda: format_resource_tree(tree, db_session=None, service_types={1: ServiceAPI.service_type}),
+                           HTTPInternalServerError)
+
+    def test_magpie_client_pool(self):
+        from magpie.adapter.magpieclient import MagpieClient
+        from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+        from six.moves.socketserver import ThreadingMixIn
+        import threading
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # noqa: N802
+                body = json.dumps({u"cookie": self.headers.get("Cookie")}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE_JSON)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Set-Cookie", "auth_tkt=secret; Path=/")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass
+
+        server = Server(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        client = MagpieClient()
+        try:
+            url = "http://127.0.0.1:{}/session".format(server.server_port)
+            for _ in range(3):
+                resp = client.get(url)
+                utils.check_val_equal(resp.status_code, 200)
+                utils.check_val_equal(resp.cookies.get("auth_tkt"), "secret")
+                # received cookies must never be sent along following requests (possibly of other users)
+                utils.check_val_equal(resp.json()[u"cookie"], None)
+            utils.check_val_equal(client.get(url, cookies={"auth_tkt": "other"}).json()[u"cookie"], "auth_tkt=other")
+            pools = client.stats()["pools"]
+            utils.check_val_equal(list(pools), ["http://127.0.0.1:{}".format(server.server_port)])
+            stats = list(pools.values())[0]
+            utils.check_val_equal(stats["requests"], 4)
+            utils.check_val_equal(stats["connections"], 1)  # kept alive and reused
+            utils.check_val_equal(stats["idle"] >= 1, True)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+        utils.check_val_equal(client.stats()["pools"], {})
+
+    def test_service_store_cached_services(self):
+        from magpie.adapter.magpieservice import MagpieServiceStore
+        from magpie.definitions.twitcher_definitions import ServiceNotFound
+        from pyramid.registry import Registry
+        from collections import namedtuple
+
+        ServiceInfo = namedtuple("ServiceInfo", ["resource_id", "resource_name", "type", "url", "sync_type"])  # noqa
+        rows = [ServiceInfo(1, "wps", "wps", "http://localhost/wps", None),
+                ServiceInfo(2, "thredds", "thredds", "http://localhost/thredds", None)]
+        request = Request.blank("/")
+        request.registry = Registry()
+        request.registry.settings = {"magpie.service_store_expire": "60"}
+        request.registry["dbsession_factory"] = mock.MagicMock()
+        store = MagpieServiceStore(request)
+        with mock.patch("magpie.adapter.magpieservice.get_services_info", return_value=rows) as get_services:
+            utils.check_val_equal(sorted(svc.name for svc in store.list_services()), ["thredds", "wps"])
+            service = store.fetch_by_url("http://localhost/thredds")
+            utils.check_val_equal((service.name, service.type), ("thredds", "thredds"))
+            utils.check_raises(lambda: store.fetch_by_url("http://localhost/unknown"), ServiceNotFound)
+            utils.check_val_equal(get_services.call_count, 1)  # loaded once for all listings and lookups
+
+            # returned services can be modified without affecting following lookups
+            service["url"] = "http://other"
+            utils.check_val_equal(store.fetch_by_url("http://localhost/thredds").url, "http://localhost/thredds")
+
+            store.expire = 0
+            store.clear_cache()
+            store.list_services()
+            store.list_services()
+            utils.check_val_equal(get_services.call_count, 3)  # reloaded when expired
+
+    def test_service_cache_by_name(self):
+        from magpie.adapter.magpieservice import MagpieServiceStore
+        from magpie.definitions.pyramid_definitions import ALLOW, ALL_PERMISSIONS
+        from magpie.definitions.twitcher_definitions import ServiceNotFound
+        from magpie.resource_index import RESOURCE_TREE_INDEX
+        from magpie.service_cache import SERVICE_CACHE, ServiceNode, find_service_by_name, setup_service_cache
+        from pyramid.registry import Registry
+        from collections import namedtuple
+
+        ServiceInfo = namedtuple("ServiceInfo", ["resource_id", "resource_name", "type", "url", "sync_type",  # noqa
+                                                 "owner_user_id", "owner_group_id"])
+        rows = [ServiceInfo(1, "wps", "wps", "http://localhost/wps", None, 3, None),
+                ServiceInfo(2, "thredds", "thredds", "http://localhost/thredds", None, None, None)]
+        request = Request.blank("/")
+        request.registry = Registry()
+        request.registry.settings = {"magpie.service_cache": "true"}
+        request.registry["dbsession_factory"] = mock.MagicMock()
+        store = MagpieServiceStore(request)
+        setup_service_cache(request.registry.settings)
+        try:
+            with mock.patch("magpie.service_cache.models.get_services_info", return_value=rows) as get_services:
+                service = find_service_by_name("wps", db_session=None)
+                utils.check_val_type(service, ServiceNode)
+                utils.check_val_equal((service.resource_id, service.type, service.url), (1, "wps", rows[0].url))
+                utils.check_val_equal(service.__acl__, [(ALLOW, 3, ALL_PERMISSIONS)])
+                utils.check_val_equal(store.fetch_by_name("thredds").url, "http://localhost/thredds")
+                utils.check_raises(lambda: store.fetch_by_name("unknown"), ServiceNotFound)
+                utils.check_val_equal(get_services.call_count, 1)  # loaded once for all lookups
+
+                # registered, updated or unregistered services invalidate the resource tree
+                RESOURCE_TREE_INDEX.invalidate()
+                utils.check_val_equal(find_service_by_name("thredds", db_session=None).resource_id, 2)
+                utils.check_val_equal(get_services.call_count, 2)
+        finally:
+            setup_service_cache({})
+        utils.check_val_equal(SERVICE_CACHE.enabled, False)
+
+    def test_token_cache_coalesced_exchange(self):
+        from magpie.adapter.magpietoken import TokenCache
+        import threading
+
+        cache = TokenCache(max_size=2, expire=60)
+        key = cache.key("WSO2", "Bearer secret-token")
+        utils.check_val_not_in("secret-token", key)
+        release = threading.Event()
+        calls = []
+
+        def exchange():
+            calls.append(1)
+            release.wait(5)
+            return "ticket"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_ticket(key, exchange))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        utils.check_val_equal(results, ["ticket"] * 5)
+        utils.check_val_equal(len(calls), 1)  # concurrent misses coalesced into a single exchange
+        utils.check_val_equal(cache.get_ticket(key, exchange), "ticket")
+        utils.check_val_equal(len(calls), 1)
+
+        def failed_exchange():
+            raise ValueError("login failed")
+
+        other_key = cache.key("WSO2", "Bearer other-token")
+        utils.check_raises(lambda: cache.get_ticket(other_key, failed_exchange), ValueError)
+        utils.check_val_equal(len(cache), 1)  # failures are not cached
+
+        cache.expire = -1  # tickets already expired when stored
+        cache.get_ticket(other_key, lambda: "other")
+        utils.check_val_equal(cache.get_ticket(other_key, lambda: "renewed"), "renewed")
+        cache.get_ticket(cache.key("WSO2", "Bearer third-token"), lambda: "third")
+        utils.check_val_equal(len(cache), 2)
+        utils.check_val_equal(cache.stats()["evictions"], 1)